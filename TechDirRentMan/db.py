@@ -3,7 +3,8 @@
     Слой доступа к данным (SQLite) и схема базы приложения TechDirRentMan.
 
 Принцип работы (кратко):
-    - Подключение к SQLite (WAL + foreign_keys).
+    - Подключение к SQLite (WAL + foreign_keys, synchronous=NORMAL, кэш и
+      mmap для уменьшения дисковых операций).
     - Безопасная инициализация/миграция схемы: CREATE TABLE → ensure_column
       (ALTER) → ensure_index.
     - Таблицы:
@@ -33,9 +34,14 @@ import sqlite3
 import datetime
 import csv
 import logging
+from contextlib import closing
 import unicodedata
 from pathlib import Path
-from typing import Iterable, Any, Optional, Dict, List, Tuple
+from typing import Iterable, Any, Optional, Dict, List, Tuple, Callable, Sequence
+
+# Ключ сортировки, совпадающий с COLLATE NOCASE SQLite: регистр сворачивается
+# только у ASCII, остальные символы сравниваются по кодам
+_ASCII_LOWER = str.maketrans("ABCDEFGHIJKLMNOPQRSTUVWXYZ", "abcdefghijklmnopqrstuvwxyz")
 
 # 2. Класс DB — основной интерфейс работы с базой
 if True:
@@ -50,6 +56,29 @@ if True:
             # Включаем журналирование WAL и внешние ключи
             self._conn.execute("PRAGMA journal_mode=WAL;")
             self._conn.execute("PRAGMA foreign_keys=ON;")
+            # В режиме WAL synchronous=NORMAL безопасен для целостности и
+            # убирает fsync на каждом коммите; остальные параметры уменьшают
+            # обращения к диску и ожидание блокировок при фоновых операциях.
+            self._conn.execute("PRAGMA synchronous=NORMAL;")
+            self._conn.execute("PRAGMA temp_store=MEMORY;")
+            self._conn.execute("PRAGMA cache_size=-65536;")
+            self._conn.execute("PRAGMA busy_timeout=5000;")
+            self._conn.execute("PRAGMA mmap_size=268435456;")
+            # Поколение каталога: увеличивается при каждом изменении таблицы
+            # catalog и сбрасывает кэш списков уникальных значений
+            self._catalog_generation = 0
+            self._catalog_distinct_cache: Dict[str, Tuple[int, List[str]]] = {}
+            # Тексты запроса catalog_list по набору активных фильтров
+            self._catalog_list_sql: Dict[Tuple[bool, ...], str] = {}
+            # Первые строки catalog_list по фильтрам: (поколение каталога, строка)
+            self._catalog_first_cache: Dict[Tuple[Any, ...], Tuple[int, Any]] = {}
+            # Итог project_total: {"key": (project_id, версия данных), "total": сумма}
+            self._project_total_cache: Dict[str, Any] = {}
+            # Триграммный FTS-индекс наименований каталога (см. 2.2.5); если
+            # он уже создан в файле БД, поиск по подстроке использует его
+            self._catalog_fts = self._conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type='table' AND name='catalog_fts'"
+            ).fetchone() is not None
 
         # 2.2 Инициализация схемы (безопасный порядок)
         def init_schema(self):
@@ -102,6 +131,10 @@ if True:
                 CREATE INDEX IF NOT EXISTS idx_catalog_class ON catalog(class);
                 CREATE INDEX IF NOT EXISTS idx_catalog_vendor ON catalog(vendor);
                 CREATE INDEX IF NOT EXISTS idx_catalog_department ON catalog(department);
+                -- Порядок выдачи catalog_list: позволяет читать строки уже
+                -- отсортированными и останавливаться на первой (catalog_first)
+                CREATE INDEX IF NOT EXISTS idx_catalog_name_nocase_price
+                    ON catalog(name COLLATE NOCASE, unit_price);
                 """
             )
             self._conn.commit()
@@ -146,6 +179,27 @@ if True:
             self._ensure_index("idx_items_department", "CREATE INDEX IF NOT EXISTS idx_items_department ON items(department);")
             self._ensure_index("idx_items_zone",       "CREATE INDEX IF NOT EXISTS idx_items_zone ON items(zone);")
             self._ensure_index("idx_items_type",       "CREATE INDEX IF NOT EXISTS idx_items_type ON items(type);")
+            # Составные индексы по выражениям под типовые выборки сводной сметы:
+            # точное совпадение зоны (удаление/перенос зоны) и регистронезависимые
+            # фильтры list_items_filtered/sum_items_filtered с сортировкой по имени.
+            self._ensure_index(
+                "idx_items_proj_zone",
+                "CREATE INDEX IF NOT EXISTS idx_items_proj_zone ON items(project_id, COALESCE(zone,''));",
+            )
+            self._ensure_index(
+                "idx_items_proj_zone_type_name",
+                "CREATE INDEX IF NOT EXISTS idx_items_proj_zone_type_name "
+                "ON items(project_id, LOWER(COALESCE(zone,'')), type, name COLLATE NOCASE);",
+            )
+            # Покрывающий индекс для суммы оборудования зоны (расчёт коммутации):
+            # SUM(amount) считается по B-дереву индекса без чтения строк items.
+            # Хвостовой столбец zone нужен, чтобы SQLite признал индекс покрывающим
+            # для выражения COALESCE(zone,'').
+            self._ensure_index(
+                "idx_items_proj_zone_type_amount",
+                "CREATE INDEX IF NOT EXISTS idx_items_proj_zone_type_amount "
+                "ON items(project_id, COALESCE(zone,''), type, amount, zone);",
+            )
 
             # 2.2.4 Расширение глобального каталога: колонка stock_qty для учёта складских остатков
             self._ensure_column(
@@ -155,6 +209,9 @@ if True:
             )
             self._conn.commit()
 
+            # 2.2.5 Триграммный индекс наименований каталога для поиска по подстроке
+            self._ensure_catalog_fts()
+
         # 2.3 Вспомогательные: обеспечение столбцов и индексов
         def _ensure_column(self, table: str, column: str, ddl: str):
             cur = self._conn.cursor()
@@ -164,6 +221,41 @@ if True:
                 cur.execute(ddl)
                 self._conn.commit()
 
+        def _ensure_catalog_fts(self) -> None:
+            """
+            Создаёт FTS5-таблицу catalog_fts (токенизатор trigram) поверх
+            catalog.name и триггеры, поддерживающие её в актуальном состоянии.
+
+            Индекс позволяет искать подстроку LIKE '%текст%' без полного
+            просмотра каталога. Если SQLite собран без FTS5 или без trigram
+            (версии до 3.34), поиск продолжает работать без индекса.
+            """
+            if self._catalog_fts:
+                return
+            try:
+                with self._conn:
+                    self._conn.executescript(
+                        """
+                        CREATE VIRTUAL TABLE IF NOT EXISTS catalog_fts USING fts5(
+                            name, content='catalog', content_rowid='id', tokenize='trigram'
+                        );
+                        CREATE TRIGGER IF NOT EXISTS catalog_fts_ai AFTER INSERT ON catalog BEGIN
+                            INSERT INTO catalog_fts(rowid, name) VALUES (new.id, new.name);
+                        END;
+                        CREATE TRIGGER IF NOT EXISTS catalog_fts_ad AFTER DELETE ON catalog BEGIN
+                            INSERT INTO catalog_fts(catalog_fts, rowid, name) VALUES ('delete', old.id, old.name);
+                        END;
+                        CREATE TRIGGER IF NOT EXISTS catalog_fts_au AFTER UPDATE OF name ON catalog BEGIN
+                            INSERT INTO catalog_fts(catalog_fts, rowid, name) VALUES ('delete', old.id, old.name);
+                            INSERT INTO catalog_fts(rowid, name) VALUES (new.id, new.name);
+                        END;
+                        INSERT INTO catalog_fts(catalog_fts) VALUES ('rebuild');
+                        """
+                    )
+                self._catalog_fts = True
+            except sqlite3.Error as ex:
+                logging.getLogger(__name__).warning("Индекс поиска по каталогу недоступен: %s", ex)
+
         def _ensure_index(self, name: str, ddl: str):
             cur = self._conn.cursor()
             cur.execute("PRAGMA index_list(items)")
@@ -279,10 +371,18 @@ if True:
             self._conn.commit()
 
         # 2.4.x Добавление позиций (bulk insert)
-        def add_items_bulk(self, items: Iterable[dict]):
+        def add_items_bulk(self, items: Iterable[dict], commit: bool = True,
+                           return_ids: bool = False) -> Optional[List[int]]:
             """
             Массовая вставка позиций в таблицу items.
 
+            При commit=False транзакция не фиксируется: это позволяет включить
+            вставку в более крупную транзакцию вызывающего метода.
+
+            При return_ids=True строки вставляются по одной с INSERT ... RETURNING id
+            и метод возвращает список id новых позиций в порядке items. Иначе
+            используется executemany и возвращается None.
+
             Ожидаемые ключи в словаре item:
                 project_id, type, group_name, name, qty, coeff, amount, unit_price,
                 source_file, vendor, department, zone, power_watts, import_batch
@@ -297,15 +397,14 @@ if True:
             """
             cur = self._conn.cursor()
             now = datetime.datetime.utcnow().isoformat()
-            try:
-                cur.executemany(
-                    """
+            sql = """
                     INSERT INTO items(project_id, type, group_name, name, qty, coeff, amount, unit_price,
                                       source_file, created_at, vendor, department, zone, power_watts, import_batch)
                     VALUES(:project_id, :type, :group_name, :name, :qty, :coeff, :amount, :unit_price,
                            :source_file, :created_at, :vendor, :department, :zone, :power_watts, :import_batch)
-                    """,
-                    [
+                    """
+            try:
+                params = [
                         {
                             "project_id": it["project_id"],
                             "type": it.get("type", "equipment"),
@@ -343,13 +442,104 @@ if True:
                             "import_batch": it.get("import_batch"),
                         }
                         for it in items
-                    ],
-                )
-                self._conn.commit()
+                    ]
+                new_ids: Optional[List[int]] = None
+                if return_ids:
+                    sql_ret = sql.rstrip() + " RETURNING id"
+                    new_ids = [int(cur.execute(sql_ret, row).fetchone()[0]) for row in params]
+                else:
+                    cur.executemany(sql, params)
+                if commit:
+                    self._conn.commit()
+                return new_ids
             except Exception as ex:
                 logging.getLogger(__name__).error("add_items_bulk: ошибка массовой вставки: %s", ex, exc_info=True)
                 raise
 
+        # 2.4.5b Позиции мастера вместе с пополнением каталога
+        def add_items_with_catalog(self, items: Iterable[dict], catalog_rows: Iterable[dict],
+                                   return_ids: bool = False) -> Optional[List[int]]:
+            """
+            Вставляет позиции проекта (как add_items_bulk) и строки каталога
+            (как catalog_add_or_ignore) одной транзакцией с одним коммитом;
+            при ошибке откатывается всё. Возвращает id позиций при return_ids=True.
+
+            После фиксации кэш уникальных значений каталога дополняется
+            значениями реально вставленных строк catalog_rows (см. _write_with_catalog).
+            """
+            return self._write_with_catalog(
+                lambda: self.add_items_bulk(items, commit=False, return_ids=return_ids),
+                catalog_rows,
+            )
+
+        def _write_with_catalog(self, write: Callable[[], Any], catalog_rows: Iterable[dict]) -> Any:
+            """
+            Выполняет write() и вставку строк каталога одной транзакцией с одним
+            коммитом; при ошибке откатывается всё. Возвращает результат write().
+            После фиксации кэш уникальных значений каталога обновляется
+            _catalog_distinct_merge (подрядчики дополняются, class/department
+            перечитываются).
+            """
+            catalog_params = self._catalog_params(catalog_rows)
+            prev_generation = self._catalog_generation
+            changed = False
+            with self._conn:
+                result = write()
+                if catalog_params:
+                    changed = self._catalog_insert(catalog_params)
+            if changed:
+                self._catalog_distinct_merge(catalog_params, prev_generation)
+            return result
+
+        # Колонки items, которые можно передавать в add_items_bulk_tuples
+        _ITEM_INSERTABLE = frozenset({
+            "project_id", "type", "group_name", "name", "qty", "coeff", "amount", "unit_price",
+            "source_file", "created_at", "vendor", "department", "zone", "power_watts", "import_batch",
+        })
+
+        def add_items_bulk_tuples(self, columns: Sequence[str], rows: Iterable[Sequence[Any]],
+                                  commit: bool = True) -> int:
+            """
+            Массовая вставка уже подготовленных строк (кортежей) в items.
+
+            В отличие от add_items_bulk значения не нормализуются и не
+            перекладываются из словарей: кортежи передаются в executemany
+            как есть, в порядке columns. Предназначено для восстановления
+            строк, ранее прочитанных из этой же таблицы (UNDO удаления), и для
+            мастеров, которые сами очищают значения (_clean_item_value).
+
+            :return: число вставленных строк
+            """
+            cols = list(columns)
+            bad = [c for c in cols if c not in self._ITEM_INSERTABLE]
+            if bad:
+                raise ValueError(f"Недопустимые колонки для вставки: {bad}")
+            sql = f"INSERT INTO items({', '.join(cols)}) VALUES({', '.join('?' * len(cols))})"
+            try:
+                cur = self._conn.executemany(sql, rows)
+                if commit:
+                    self._conn.commit()
+                return cur.rowcount
+            except Exception as ex:
+                logging.getLogger(__name__).error("add_items_bulk_tuples: ошибка массовой вставки: %s", ex, exc_info=True)
+                raise
+
+        # 2.4.5c Готовые строки-кортежи вместе с пополнением каталога
+        def add_item_rows_with_catalog(self, columns: Sequence[str], rows: Iterable[Sequence[Any]],
+                                       catalog_rows: Iterable[dict]) -> int:
+            """
+            Вставляет строки-кортежи (как add_items_bulk_tuples, без
+            нормализации) и строки каталога одной транзакцией с одним коммитом
+            (см. _write_with_catalog). Строковые значения строк вызывающий код
+            должен предварительно очистить _clean_item_value.
+
+            :return: число вставленных позиций
+            """
+            return self._write_with_catalog(
+                lambda: self.add_items_bulk_tuples(columns, rows, commit=False),
+                catalog_rows,
+            )
+
         # 2.4.6 Получение списка всех позиций проекта
         def list_items(self, project_id: int):
             cur = self._conn.cursor()
@@ -357,6 +547,33 @@ if True:
             return cur.fetchall()
 
         # 2.4.7 Выборка позиций с фильтрами
+        @staticmethod
+        def _items_filter_sql(
+            vendor: Optional[str],
+            department: Optional[str],
+            zone: Optional[str],
+            class_en: Optional[str],
+        ) -> Tuple[str, List[Any]]:
+            """
+            Формирует общую часть WHERE (после project_id=?) для фильтров
+            подрядчика, отдела, зоны и класса. Значение "<ALL>" отключает фильтр.
+            """
+            sql = ""
+            args: List[Any] = []
+            # Фильтр подрядчика
+            if vendor and vendor != "<ALL>":
+                sql += " AND LOWER(COALESCE(vendor,'')) = LOWER(?)"; args.append(vendor)
+            # Фильтр отдела
+            if department and department != "<ALL>":
+                sql += " AND LOWER(COALESCE(department,'')) = LOWER(?)"; args.append(department)
+            if zone is not None:
+                # если zone == "<ALL>" — без фильтра; иначе сравниваем без учёта регистра
+                if zone != "<ALL>":
+                    sql += " AND LOWER(COALESCE(zone,'')) = LOWER(?)"; args.append(zone)
+            if class_en and class_en != "<ALL>":
+                sql += " AND type = ?"; args.append(class_en)
+            return sql, args
+
         def list_items_filtered(
             self,
             project_id: int,
@@ -371,21 +588,23 @@ if True:
             Пустая строка в zone означает 'Без зоны'.
             Фильтры по vendor/department/zone выполняются без учёта регистра.
             Поиск по наименованию использует LIKE с COLLATE NOCASE.
+            Числовые столбцы возвращаются через COALESCE(..., 0.0), чтобы
+            вызывающему коду не приходилось обрабатывать NULL в горячих циклах.
             """
-            sql = "SELECT * FROM items WHERE project_id=?"
+            sql = (
+                "SELECT id, project_id, type, group_name, name,"
+                " COALESCE(qty, 0.0) AS qty,"
+                " COALESCE(coeff, 0.0) AS coeff,"
+                " COALESCE(amount, 0.0) AS amount,"
+                " COALESCE(unit_price, 0.0) AS unit_price,"
+                " source_file, created_at, vendor, department, zone,"
+                " COALESCE(power_watts, 0.0) AS power_watts,"
+                " import_batch"
+                " FROM items WHERE project_id=?"
+            )
             args: List[Any] = [project_id]
-            # Фильтр подрядчика
-            if vendor and vendor != "<ALL>":
-                sql += " AND LOWER(COALESCE(vendor,'')) = LOWER(?)"; args.append(vendor)
-            # Фильтр отдела
-            if department and department != "<ALL>":
-                sql += " AND LOWER(COALESCE(department,'')) = LOWER(?)"; args.append(department)
-            if zone is not None:
-                # если zone == "<ALL>" — без фильтра; иначе сравниваем без учёта регистра
-                if zone != "<ALL>":
-                    sql += " AND LOWER(COALESCE(zone,'')) = LOWER(?)"; args.append(zone)
-            if class_en and class_en != "<ALL>":
-                sql += " AND type = ?"; args.append(class_en)
+            where_sql, where_args = self._items_filter_sql(vendor, department, zone, class_en)
+            sql += where_sql; args.extend(where_args)
             # Поиск по наименованию
             if name_like:
                 sql += " AND name LIKE ? COLLATE NOCASE"; args.append(f"%{name_like}%")
@@ -394,9 +613,156 @@ if True:
             cur.execute(sql, args)
             return cur.fetchall()
 
+        def _register_sql_function(self, name: str, n_args: int, key: Any, impl: Callable[..., Any]) -> None:
+            """
+            Регистрирует Python-функцию в соединении SQLite под именем name.
+            Повторная регистрация выполняется только если сменился key
+            (исходная функция вызывающего кода).
+            """
+            registered = self.__dict__.setdefault("_sql_functions", {})
+            if registered.get(name) is key:
+                return
+            self._conn.create_function(name, n_args, impl, deterministic=True)
+            registered[name] = key
+
+        # 2.4.7a Сумма позиций с фильтрами и поиском
+        def sum_items_filtered(
+            self,
+            project_id: int,
+            vendor: Optional[str] = None,
+            department: Optional[str] = None,
+            zone: Optional[str] = None,
+            class_en: Optional[str] = None,
+            search: Optional[str] = None,
+            search_fn: Optional[Callable[[Any, Any], bool]] = None,
+        ) -> float:
+            """
+            Возвращает SUM(amount) по позициям проекта с теми же фильтрами, что и
+            list_items_filtered, без передачи строк в Python.
+
+            Строка search ищется в name/vendor/department/zone. Если задан
+            search_fn(haystack, needle), он регистрируется как SQL-функция
+            search_match и используется для сравнения (например, поиск с учётом
+            хомоглифов из UI). Иначе применяется LIKE с COLLATE NOCASE.
+            """
+            sql = "SELECT COALESCE(SUM(amount), 0) AS total FROM items WHERE project_id=?"
+            args: List[Any] = [project_id]
+            where_sql, where_args = self._items_filter_sql(vendor, department, zone, class_en)
+            sql += where_sql; args.extend(where_args)
+            if search:
+                if search_fn is not None:
+                    self._register_sql_function(
+                        "search_match", 2, search_fn,
+                        lambda h, n: 1 if search_fn(h or "", n) else 0,
+                    )
+                    sql += (
+                        " AND (search_match(name, ?) OR search_match(vendor, ?)"
+                        " OR search_match(department, ?) OR search_match(zone, ?))"
+                    )
+                    args.extend([search] * 4)
+                else:
+                    sql += (
+                        " AND (name LIKE ? COLLATE NOCASE OR vendor LIKE ? COLLATE NOCASE"
+                        " OR department LIKE ? COLLATE NOCASE OR zone LIKE ? COLLATE NOCASE)"
+                    )
+                    args.extend([f"%{search}%"] * 4)
+            cur = self._conn.cursor()
+            cur.execute(sql, args)
+            row = cur.fetchone()
+            return float(row["total"] or 0)
+
+        # 2.4.7b Поиск дубликата позиции при добавлении в смету (вручную или из каталога)
+        def find_duplicate_item(
+            self,
+            project_id: int,
+            zone: str,
+            class_en: str,
+            name: str,
+            vendor: str,
+            department: str,
+            unit_price: float,
+            coeff: float,
+            normalize_fn: Optional[Callable[[Any], str]] = None,
+        ) -> Optional[sqlite3.Row]:
+            """
+            Возвращает первую позицию проекта в зоне zone с тем же классом,
+            наименованием, подрядчиком, отделом, ценой и коэффициентом, либо None.
+
+            Строки name/vendor/department должны быть уже нормализованы. Если
+            задан normalize_fn, значения из БД приводятся к тому же виду через
+            SQL-функцию norm_case (LOWER в SQLite работает только с ASCII).
+            """
+            # Предикаты project_id/зона/type совпадают с ключом индекса
+            # idx_items_proj_zone_type_name (type объявлен NOT NULL, поэтому
+            # сравнивается без COALESCE), и кандидаты выбираются поиском по
+            # B-дереву; остальные условия проверяются только для них.
+            sql = (
+                "SELECT * FROM items WHERE project_id=?"
+                " AND LOWER(COALESCE(zone,'')) = LOWER(?)"
+                " AND type = ?"
+                " AND name LIKE ? COLLATE NOCASE"
+                " AND ABS(COALESCE(unit_price,0) - ?) < 1e-6"
+                " AND ABS(COALESCE(coeff,0) - ?) < 1e-6"
+            )
+            args: List[Any] = [project_id, zone or "", class_en, f"%{name}%", unit_price, coeff]
+            if normalize_fn is not None:
+                self._register_sql_function(
+                    "norm_case", 1, normalize_fn,
+                    lambda v: normalize_fn(str(v) if v is not None else ""),
+                )
+                sql += (
+                    " AND norm_case(name) = ?"
+                    " AND norm_case(vendor) = ?"
+                    " AND norm_case(department) = ?"
+                )
+            else:
+                sql += (
+                    " AND LOWER(TRIM(name)) = LOWER(?)"
+                    " AND LOWER(TRIM(COALESCE(vendor,''))) = LOWER(?)"
+                    " AND LOWER(TRIM(COALESCE(department,''))) = LOWER(?)"
+                )
+            args.extend([name, vendor, department])
+            sql += " LIMIT 1"
+            cur = self._conn.cursor()
+            cur.execute(sql, args)
+            return cur.fetchone()
+
+        # 2.4.7c Общие правила обновления полей позиций
+        # Поля items, которые разрешено изменять через update_item_field(s)
+        _ITEM_UPDATABLE = frozenset({
+            "type", "group_name", "name", "qty", "coeff", "amount", "unit_price",
+            "vendor", "department", "zone", "power_watts",
+        })
+
+        @staticmethod
+        def _clean_item_value(val: Any) -> Any:
+            """
+            Нормализует строковое значение поля позиции: заменяет неразрывные/тонкие
+            пробелы и табы на обычный пробел, удаляет управляющие и форматирующие
+            символы (Unicode category 'C*') и обрезает пробелы по краям.
+            Нестроковые значения возвращаются без изменений.
+            """
+            if not isinstance(val, str):
+                return val
+            # Заменяем неразрывные/тонкие пробелы и табы на обычный пробел
+            val = (
+                val.replace("\u00A0", " ")
+                   .replace("\u202F", " ")
+                   .replace("\u2007", " ")
+                   .replace("\t", " ")
+            )
+            # Удаляем управляющие и форматирующие символы, чтобы исключить
+            # невидимые отступы (нулевой ширины пробелы, управляющие символы, BOM)
+            try:
+                val = "".join(ch for ch in val if unicodedata.category(ch)[0] != 'C')
+            except Exception:
+                pass
+            # Обрезаем пробелы по краям для всех строковых полей
+            return val.strip()
+
         # 2.4.8 Обновление одного поля позиции
         def update_item_field(self, item_id: int, field: str, value: Any):
-            assert field in {"type", "group_name", "name", "qty", "coeff", "amount", "unit_price", "vendor", "department", "zone", "power_watts"}
+            assert field in self._ITEM_UPDATABLE
             # Нормализуем строковые значения перед обновлением, чтобы в базе не было лидирующих пробелов
             if isinstance(value, str):
                 # Нормализация строкового значения: заменяем неразрывные/тонкие пробелы
@@ -434,30 +800,9 @@ if True:
             а name — очищается только слева. Это предотвращает накопление невидимых пробелов
             и обеспечивает консистентность данных.
             """
-            allowed = {"type", "group_name", "name", "qty", "coeff", "amount", "unit_price", "vendor", "department", "zone", "power_watts"}
-            pairs: List[Tuple[str, Any]] = []
-            for k, v in fields.items():
-                if k not in allowed:
-                    continue
-                val = v
-                if isinstance(val, str):
-                    # Заменяем неразрывные/тонкие пробелы и табы на обычный пробел
-                    val = (
-                        val.replace("\u00A0", " ")
-                           .replace("\u202F", " ")
-                           .replace("\u2007", " ")
-                           .replace("\t", " ")
-                    )
-                    # Удаляем управляющие и форматирующие символы (Unicode category 'C*'),
-                    # чтобы исключить невидимые отступы (например, нулевой ширины
-                    # пробелы, управляющие символы, BOM)
-                    try:
-                        val = "".join(ch for ch in val if unicodedata.category(ch)[0] != 'C')
-                    except Exception:
-                        pass
-                    # Обрезаем пробелы по краям для всех строковых полей
-                    val = val.strip()
-                pairs.append((k, val))
+            pairs: List[Tuple[str, Any]] = [
+                (k, self._clean_item_value(v)) for k, v in fields.items() if k in self._ITEM_UPDATABLE
+            ]
             if not pairs:
                 return
             set_sql = ", ".join([f"{k}=?" for k, _ in pairs])
@@ -469,17 +814,176 @@ if True:
                 logging.getLogger(__name__).error("update_item_fields: ошибка массового обновления id=%s: %s", item_id, ex, exc_info=True)
                 raise
 
+        # 2.4.9a Перенос позиций в зону одной транзакцией
+        def move_items_to_zone(
+            self,
+            zone: str,
+            full_ids: Iterable[int],
+            partial_updates: Iterable[Tuple[float, float, int]],
+            new_items: Iterable[dict],
+        ) -> None:
+            """
+            Применяет перенос позиций в зону zone за одну транзакцию.
+
+            full_ids        — id позиций, переносимых целиком (меняется только zone);
+            partial_updates — кортежи (qty, amount, id) для остатков частично
+                              перенесённых позиций;
+            new_items       — новые позиции в целевой зоне (формат add_items_bulk).
+            При ошибке все изменения откатываются.
+            """
+            zone_val = self._clean_item_value(str(zone or ""))
+            new_items = list(new_items)
+            try:
+                with self._conn:
+                    self._conn.executemany(
+                        "UPDATE items SET zone=? WHERE id=?",
+                        [(zone_val, item_id) for item_id in full_ids],
+                    )
+                    self._conn.executemany(
+                        "UPDATE items SET qty=?, amount=? WHERE id=?",
+                        list(partial_updates),
+                    )
+                    if new_items:
+                        self.add_items_bulk(new_items, commit=False)
+            except Exception as ex:
+                logging.getLogger(__name__).error("move_items_to_zone: ошибка переноса в зону '%s': %s", zone_val, ex, exc_info=True)
+                raise
+
+        # 2.4.9b Множественное обновление одинакового набора полей
+        def update_items_fields_bulk(self, fields: List[str], rows: Iterable[Tuple[Any, ...]]) -> int:
+            """
+            Обновляет поля fields у многих позиций одним executemany и одним
+            коммитом. Каждая строка rows — значения полей в порядке fields,
+            последним элементом идёт id позиции. Строковые значения
+            нормализуются так же, как в update_item_fields.
+            Возвращает число обработанных строк.
+            """
+            bad = [f for f in fields if f not in self._ITEM_UPDATABLE]
+            if bad or not fields:
+                raise ValueError(f"update_items_fields_bulk: недопустимые поля {bad or fields}")
+            set_sql = ", ".join(f"{f}=?" for f in fields)
+            params = [
+                tuple(self._clean_item_value(v) for v in row[:-1]) + (row[-1],)
+                for row in rows
+            ]
+            if not params:
+                return 0
+            try:
+                with self._conn:
+                    self._conn.executemany(f"UPDATE items SET {set_sql} WHERE id=?", params)
+                return len(params)
+            except Exception as ex:
+                logging.getLogger(__name__).error("update_items_fields_bulk: ошибка обновления %s: %s", fields, ex, exc_info=True)
+                raise
+
+        # 2.4.9c Отмена переноса по зонам одной транзакцией
+        def revert_zone_move(
+            self,
+            project_id: int,
+            batch: Optional[str],
+            originals: Iterable[Tuple[float, float, int]],
+        ) -> None:
+            """
+            Отменяет перенос позиций в зону за одну транзакцию: удаляет
+            позиции, созданные переносом (import_batch = batch), и
+            восстанавливает qty/amount исходных позиций по кортежам
+            (qty, amount, id). При ошибке все изменения откатываются.
+            """
+            try:
+                with self._conn:
+                    if batch:
+                        self._conn.execute(
+                            "DELETE FROM items WHERE project_id=? AND import_batch=?",
+                            (project_id, batch),
+                        )
+                    self._conn.executemany(
+                        "UPDATE items SET qty=?, amount=? WHERE id=?",
+                        list(originals),
+                    )
+            except Exception as ex:
+                logging.getLogger(__name__).error("revert_zone_move: ошибка отмены переноса: %s", ex, exc_info=True)
+                raise
+
+        # 2.4.9d Обновление набора полей у позиций с заданными id
+        def update_items_fields_by_ids(self, item_ids: Iterable[int], fields: Dict[str, Any]) -> int:
+            """
+            Задаёт одинаковые значения fields всем позициям из item_ids
+            (например, записям, только что добавленным мастером) запросами
+            UPDATE ... WHERE id IN (...) пачками по 500 id в одной транзакции.
+            Строковые значения нормализуются так же, как в update_item_fields.
+            Возвращает число обновлённых позиций.
+            """
+            pairs: List[Tuple[str, Any]] = [
+                (k, self._clean_item_value(v)) for k, v in fields.items() if k in self._ITEM_UPDATABLE
+            ]
+            ids = list(dict.fromkeys(int(i) for i in item_ids))
+            if not pairs or not ids:
+                return 0
+            set_sql = ", ".join(f"{k}=?" for k, _ in pairs)
+            values = [v for _, v in pairs]
+            updated = 0
+            try:
+                with self._conn:
+                    for start in range(0, len(ids), 500):
+                        chunk = ids[start:start + 500]
+                        placeholders = ",".join("?" * len(chunk))
+                        cur = self._conn.execute(
+                            f"UPDATE items SET {set_sql} WHERE id IN ({placeholders})",
+                            values + chunk,
+                        )
+                        updated += cur.rowcount
+                return updated
+            except Exception as ex:
+                logging.getLogger(__name__).error("update_items_fields_by_ids: ошибка обновления %s: %s", list(fields), ex, exc_info=True)
+                raise
+
         # 2.4.10 Получение строки по id
         def get_item_by_id(self, item_id: int) -> Optional[sqlite3.Row]:
             cur = self._conn.cursor()
             cur.execute("SELECT * FROM items WHERE id=?", (item_id,))
             return cur.fetchone()
 
+        # 2.4.10a Получение нескольких строк по id одним запросом
+        def get_items_by_ids(self, item_ids: Iterable[int]) -> Dict[int, sqlite3.Row]:
+            """
+            Возвращает словарь {id: строка} для переданных id. Отсутствующие id
+            в результат не попадают. Запросы выполняются пачками по 500 id,
+            чтобы не превышать лимит параметров SQLite.
+            """
+            ids = list(dict.fromkeys(int(i) for i in item_ids))
+            result: Dict[int, sqlite3.Row] = {}
+            cur = self._conn.cursor()
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                cur.execute(f"SELECT * FROM items WHERE id IN ({placeholders})", chunk)
+                for row in cur.fetchall():
+                    result[int(row["id"])] = row
+            return result
+
         # 2.4.11 Массовое удаление по id
         def delete_items(self, item_ids: Iterable[int]):
             self._conn.executemany("DELETE FROM items WHERE id=?", [(i,) for i in item_ids])
             self._conn.commit()
 
+        # 2.4.11a Удаление всех позиций зоны
+        def delete_items_by_zone(self, project_id: int, zone: str) -> int:
+            """
+            Удаляет все позиции проекта с точным ключом зоны одним DELETE.
+            Пустая строка означает 'Без зоны' (NULL или ''). Возвращает число
+            удалённых строк.
+            """
+            try:
+                with self._conn:
+                    cur = self._conn.execute(
+                        "DELETE FROM items WHERE project_id=? AND COALESCE(zone,'')=?",
+                        (project_id, zone or ""),
+                    )
+                return cur.rowcount
+            except Exception as ex:
+                logging.getLogger(__name__).error("delete_items_by_zone: ошибка удаления зоны '%s': %s", zone, ex, exc_info=True)
+                raise
+
         # 2.4.12 Удаление по batch-идентификатору импорта
         def delete_items_by_import_batch(self, project_id: int, batch: str) -> int:
             cur = self._conn.cursor()
@@ -489,10 +993,25 @@ if True:
 
         # 2.4.13 Суммарная стоимость проекта
         def project_total(self, project_id: int) -> float:
+            """
+            Сумма amount по всем позициям проекта.
+
+            Результат кэшируется по паре (project_id, _data_version): версия
+            данных растёт при любом изменении через соединение (включая прямые
+            запросы из UI), поэтому повторный вызов без изменений данных не
+            выполняет SUM по таблице.
+            """
+            key = (project_id, self._data_version)
+            cache = self._project_total_cache
+            if cache.get("key") == key:
+                return cache["total"]
             cur = self._conn.cursor()
             cur.execute("SELECT COALESCE(SUM(amount),0) as total FROM items WHERE project_id=?", (project_id,))
             row = cur.fetchone()
-            return float(row["total"] or 0)
+            total = float(row["total"] or 0)
+            cache["key"] = key
+            cache["total"] = total
+            return total
 
         # 2.4.14 Уникальные значения vendor/department/zone в проекте
         def project_distinct_values(self, project_id: int, field: str) -> List[str]:
@@ -579,39 +1098,92 @@ if True:
             cur.execute("SELECT DISTINCT name FROM items WHERE project_id=? ORDER BY name COLLATE NOCASE", (project_id,))
             return [r[0] for r in cur.fetchall()]
 
+        # 2.4.16 Максимальный номер в наименованиях с заданным префиксом
+        def project_max_name_number(self, project_id: int, prefix: str,
+                                    zone: Optional[str] = None) -> int:
+            """
+            Возвращает наибольшее целое число, стоящее сразу после prefix (с
+            возможными пробелами) в наименованиях позиций проекта, либо 0.
+            Если задан zone, учитываются только позиции этой зоны ('' — без зоны).
+
+            Префикс сравнивается через GLOB (с учётом регистра), число
+            извлекается и агрегируется в SQLite без передачи строк в Python.
+            Символы шаблона GLOB в prefix экранируются.
+            """
+            glob_prefix = "".join(f"[{ch}]" if ch in "*?[" else ch for ch in prefix)
+            sql = (
+                "SELECT MAX(CAST(LTRIM(substr(name, ?)) AS INTEGER)) FROM items"
+                " WHERE project_id=? AND name GLOB ?"
+            )
+            args: List[Any] = [len(prefix) + 1, project_id, glob_prefix + "*"]
+            if zone is not None:
+                sql += " AND COALESCE(zone,'')=?"
+                args.append(zone)
+            cur = self._conn.cursor()
+            cur.execute(sql, args)
+            row = cur.fetchone()
+            return int(row[0] or 0) if row else 0
+
         # 2.5 ------- Методы КАТАЛОГА -------
-        def catalog_add_or_ignore(self, rows: Iterable[dict]):
+        def catalog_add_or_ignore(self, rows: Iterable[dict], commit: bool = True):
             """
             Пачечная вставка в глобальную базу с игнорированием дублей по (name, vendor, unit_price).
             Перед вставкой обрезаются пробелы по краям у текстовых полей.
+
+            При commit=False транзакция не фиксируется (как в add_items_bulk).
+            Если строк с наименованием нет, запрос и коммит не выполняются.
             """
-            cur = self._conn.cursor()
-            now = datetime.datetime.utcnow().isoformat()
             try:
-                cur.executemany(
-                    """
-                    INSERT OR IGNORE INTO catalog(name, unit_price, class, vendor, power_watts, created_at, department)
-                    VALUES(:name, :unit_price, :class, :vendor, :power_watts, :created_at, :department)
-                    """,
-                    [
-                        {
-                            "name": (r.get("name") or "").strip(),
-                            "unit_price": float((r.get("unit_price", 0) or 0)),
-                            "class": (r.get("class") or "equipment").strip(),
-                            "vendor": (r.get("vendor") or "").strip(),
-                            "power_watts": float((r.get("power_watts", 0) or 0)),
-                            "created_at": r.get("created_at") or now,
-                            "department": (r.get("department") or "").strip(),
-                        }
-                        for r in rows
-                        if r.get("name")
-                    ],
-                )
-                self._conn.commit()
+                params = self._catalog_params(rows)
+                if not params:
+                    return
+                prev_generation = self._catalog_generation
+                changed = self._catalog_insert(params)
+                if commit:
+                    self._conn.commit()
+                    if changed:
+                        self._catalog_distinct_merge(params, prev_generation)
             except Exception as ex:
                 logging.getLogger(__name__).error("catalog_add_or_ignore: ошибка вставки: %s", ex, exc_info=True)
                 raise
 
+        _CATALOG_INSERT_SQL = """
+                    INSERT OR IGNORE INTO catalog(name, unit_price, class, vendor, power_watts, created_at, department)
+                    VALUES(:name, :unit_price, :class, :vendor, :power_watts, :created_at, :department)
+                    """
+
+        def _catalog_insert(self, params: List[Dict[str, Any]]) -> bool:
+            """
+            INSERT OR IGNORE подготовленных строк каталога одним executemany без
+            коммита. Если каталог изменился, увеличивает его поколение и
+            возвращает True.
+            """
+            cur = self._conn.cursor()
+            cur.executemany(self._CATALOG_INSERT_SQL, params)
+            # Если все строки оказались дублями, каталог не изменился
+            if cur.rowcount != 0:
+                self._catalog_changed()
+                return True
+            return False
+
+        @staticmethod
+        def _catalog_params(rows: Iterable[dict]) -> List[Dict[str, Any]]:
+            """Нормализованные параметры вставки в каталог (строки без name пропускаются)."""
+            now = datetime.datetime.utcnow().isoformat()
+            return [
+                {
+                    "name": (r.get("name") or "").strip(),
+                    "unit_price": float((r.get("unit_price", 0) or 0)),
+                    "class": (r.get("class") or "equipment").strip(),
+                    "vendor": (r.get("vendor") or "").strip(),
+                    "power_watts": float((r.get("power_watts", 0) or 0)),
+                    "created_at": r.get("created_at") or now,
+                    "department": (r.get("department") or "").strip(),
+                }
+                for r in rows
+                if r.get("name")
+            ]
+
         def catalog_import_csv(self, csv_path: Path) -> int:
             """
             Импортирует данные из CSV-файла в каталог. Пробелы по краям у текстовых
@@ -648,11 +1220,48 @@ if True:
                     w.writerow([r["name"], r["unit_price"], r["class"], r["vendor"] or "", r["power_watts"] or 0, r["department"] or "", r["created_at"]])
             return len(rows)
 
+        def _catalog_changed(self) -> None:
+            """Отмечает изменение каталога: кэш уникальных значений устаревает."""
+            self._catalog_generation += 1
+
+        def _catalog_distinct_merge(self, rows: List[Dict[str, Any]], prev_generation: int) -> None:
+            """
+            Дополняет актуальный (на поколении prev_generation) список
+            подрядчиков catalog_distinct_values значениями из rows пачки,
+            записанной INSERT OR IGNORE, и переносит его на текущее поколение
+            каталога. Порядок соответствует ORDER BY ... COLLATE NOCASE.
+
+            Подрядчик входит в ключ уникальности (name, vendor, unit_price),
+            поэтому после фиксации каждый vendor пачки есть в каталоге (строка
+            вставлена или совпала с существующей). Для class/department это
+            не так: пропущенный дубль может нести другое значение, поэтому их
+            списки не дополняются и устаревают вместе с поколением.
+            """
+            for field, (gen, values) in list(self._catalog_distinct_cache.items()):
+                if gen != prev_generation or field != "vendor":
+                    continue
+                known = set(values)
+                new_values = {r[field] for r in rows if r.get(field)} - known
+                if new_values:
+                    values = sorted(known | new_values, key=lambda v: v.translate(_ASCII_LOWER))
+                self._catalog_distinct_cache[field] = (self._catalog_generation, values)
+
         def catalog_distinct_values(self, field: str) -> List[str]:
+            """
+            Уникальные непустые значения поля каталога (для фильтров диалогов).
+
+            Результат кэшируется до следующего изменения каталога, поэтому
+            повторное открытие диалогов не выполняет SELECT DISTINCT заново.
+            """
             assert field in {"class", "vendor", "department"}
+            cached = self._catalog_distinct_cache.get(field)
+            if cached is not None and cached[0] == self._catalog_generation:
+                return list(cached[1])
             cur = self._conn.cursor()
             cur.execute(f"SELECT DISTINCT {field} FROM catalog WHERE COALESCE({field},'')<>'' ORDER BY {field} COLLATE NOCASE")
-            return [r[0] for r in cur.fetchall()]
+            values = [r[0] for r in cur.fetchall()]
+            self._catalog_distinct_cache[field] = (self._catalog_generation, values)
+            return list(values)
 
         def catalog_list(self, filters: Dict[str, Any]) -> list[sqlite3.Row]:
             """
@@ -663,31 +1272,97 @@ if True:
             (не равный "<ALL>"), фильтр ``vendor`` или ``department``,
             то выборка ограничивается соответствующим значением.
             """
+            sql, args = self._catalog_list_query(filters)
+            cur = self._conn.cursor()
+            cur.execute(sql, args)
+            return cur.fetchall()
+
+        def catalog_first(self, filters: Dict[str, Any]) -> Optional[sqlite3.Row]:
+            """
+            Первая строка catalog_list(filters) (тот же порядок сортировки) или None.
+
+            Используется мастерами для поиска типовых позиций («витая пара»,
+            «процессор» и т.п.). Выборка ограничена LIMIT 1, а результат
+            кэшируется до следующего изменения каталога.
+            """
+            key = tuple(sorted((k, v) for k, v in filters.items() if v))
+            cache = self._catalog_first_cache
+            cached = cache.get(key)
+            if cached is not None and cached[0] == self._catalog_generation:
+                return cached[1]
+            sql, args = self._catalog_list_query(filters)
+            row = self._conn.execute(sql + " LIMIT 1", args).fetchone()
+            cache[key] = (self._catalog_generation, row)
+            return row
+
+        def _catalog_list_query(self, filters: Dict[str, Any]) -> Tuple[str, List[Any]]:
+            """Собирает текст запроса catalog_list и его параметры."""
             name_like = (filters.get("name") or "").strip()
             class_eq = filters.get("class") or None
             vendor_eq = filters.get("vendor") or None
             department_eq = filters.get("department") or None
 
-            sql = "SELECT * FROM catalog WHERE 1=1"
+            # Текст запроса зависит только от набора активных фильтров: он
+            # собирается один раз на набор, а меняются лишь параметры. Одинаковый
+            # текст позволяет sqlite3 брать готовый подготовленный оператор из
+            # своего кэша вместо повторной компиляции.
+            use_fts = bool(name_like) and self._catalog_fts and len(name_like) >= 3
+            use_class = bool(class_eq) and class_eq != "<ALL>"
+            use_vendor = bool(vendor_eq) and vendor_eq != "<ALL>"
+            use_department = bool(department_eq) and department_eq != "<ALL>"
+            key = (bool(name_like), use_fts, use_class, use_vendor, use_department)
+            sql_cache = self._catalog_list_sql
+            sql = sql_cache.get(key)
+            if sql is None:
+                sql = "SELECT * FROM catalog WHERE 1=1"
+                if name_like:
+                    # Для строк от трёх символов кандидаты берутся из триграммного
+                    # индекса; исходное условие LIKE сохраняет прежнюю семантику
+                    if use_fts:
+                        sql += " AND id IN (SELECT rowid FROM catalog_fts WHERE name LIKE ?)"
+                    sql += " AND name LIKE ? COLLATE NOCASE"
+                if use_class:
+                    sql += " AND class = ?"
+                if use_vendor:
+                    sql += " AND COALESCE(vendor,'') = ?"
+                if use_department:
+                    sql += " AND COALESCE(department,'') = ?"
+                sql += " ORDER BY name COLLATE NOCASE, unit_price"
+                sql_cache[key] = sql
             args: List[Any] = []
+            if use_fts:
+                args.append(f"%{name_like}%")
             if name_like:
-                sql += " AND name LIKE ? COLLATE NOCASE"; args.append(f"%{name_like}%")
-            if class_eq and class_eq != "<ALL>":
-                sql += " AND class = ?"; args.append(class_eq)
-            if vendor_eq and vendor_eq != "<ALL>":
-                sql += " AND COALESCE(vendor,'') = ?"; args.append(vendor_eq)
-            if department_eq and department_eq != "<ALL>":
-                sql += " AND COALESCE(department,'') = ?"; args.append(department_eq)
-            sql += " ORDER BY name COLLATE NOCASE, unit_price"
-            cur = self._conn.cursor()
-            cur.execute(sql, args)
-            return cur.fetchall()
+                args.append(f"%{name_like}%")
+            if use_class:
+                args.append(class_eq)
+            if use_vendor:
+                args.append(vendor_eq)
+            if use_department:
+                args.append(department_eq)
+            return sql, args
+
+        def catalog_list_readonly(self, filters: Dict[str, Any]) -> list[sqlite3.Row]:
+            """
+            То же, что catalog_list, но через отдельное соединение только для
+            чтения. Метод можно вызывать из фоновых потоков: соединение (mode=ro)
+            открывается на время запроса и сразу закрывается, поэтому основной
+            поток не блокируется и дескрипторы файла БД не накапливаются.
+            """
+            sql, args = self._catalog_list_query(filters)
+            with closing(sqlite3.connect(
+                f"{self.db_path.resolve().as_uri()}?mode=ro", uri=True, check_same_thread=False
+            )) as conn:
+                conn.row_factory = sqlite3.Row
+                conn.execute("PRAGMA busy_timeout=5000;")
+                return conn.execute(sql, args).fetchall()
 
         def catalog_update_field(self, row_id: int, field: str, value: Any):
             # Разрешаем менять класс и мощность
             assert field in {"class", "power_watts"}
             self._conn.execute(f"UPDATE catalog SET {field}=? WHERE id=?", (value, row_id))
             self._conn.commit()
+            self._catalog_changed()
 
         def catalog_bulk_update_class(self, ids: Iterable[int], new_class: str) -> int:
             """
@@ -696,6 +1371,7 @@ if True:
             cur = self._conn.cursor()
             cur.executemany("UPDATE catalog SET class=? WHERE id=?", [(new_class, i) for i in ids])
             self._conn.commit()
+            self._catalog_changed()
             return cur.rowcount
 
         def catalog_find_duplicates(self) -> Dict[Tuple[str, str, float], List[int]]:
@@ -718,6 +1394,7 @@ if True:
             cur = self._conn.cursor()
             cur.executemany("DELETE FROM catalog WHERE id=?", [(i,) for i in ids])
             self._conn.commit()
+            self._catalog_changed()
             return cur.rowcount
 
         def catalog_delete_duplicates(self) -> int:
@@ -781,6 +1458,7 @@ if True:
                 (float(new_power_w or 0), name.strip(), vendor.strip()),
             )
             self._conn.commit()
+            self._catalog_changed()
             return cur.rowcount
 
         def catalog_update_stock_by_name_vendor(self, name: str, vendor: str, stock_qty: float) -> int:
@@ -799,6 +1477,7 @@ if True:
                 (qty, name_s, vendor_s),
             )
             self._conn.commit()
+            self._catalog_changed()
             return cur.rowcount
 
         # 2.6 Синхронизация проекта с каталогом (класс/мощность)
@@ -904,6 +1583,16 @@ if True:
         def commit(self):
             self._conn.commit()
 
+        @property
+        def _data_version(self) -> int:
+            """
+            Версия данных соединения: число строк, изменённых с момента открытия
+            (sqlite3 total_changes). Растёт при любой вставке/обновлении/удалении,
+            в том числе выполненных напрямую через курсор ``_conn``. UI использует
+            значение, чтобы пропускать перерисовку, если данные не менялись.
+            """
+            return self._conn.total_changes
+
         def close(self):
             try:
                 self._conn.close()
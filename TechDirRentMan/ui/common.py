@@ -18,8 +18,15 @@
       слово к Title‑case и устраняет различия в регистре. Для диагностики
       функция записывает ошибки в лог через logging.
     - Предоставляет функции для генерации ключей поиска с учётом кириллических
-      хомоглифов и диакритических символов.
+      хомоглифов и диакритических символов (в том числе предикат
+      make_search_matcher с заранее вычисленным ключом поисковой строки).
     - Содержит утилиты настройки ширины колонок Qt таблиц.
+    - Предоставляет колоночное представление позиций снимка сметы
+      (параллельные массивы полей вместо словаря на каждую позицию) и
+      преобразование его из/в формат файла снимка, а также чтение и запись
+      файлов снимков (через orjson, если библиотека установлена). Имя
+      снимка встраивается в имя файла, чтобы список снимков строился без
+      чтения файлов.
 
 Стиль:
     - Код разбит на пронумерованные секции с краткими комментариями,
@@ -27,11 +34,24 @@
 """
 
 # 1. Импорт библиотек
+from array import array  # компактные числовые колонки снимков
+from collections import OrderedDict  # LRU-кэш имён снимков
 from pathlib import Path  # пути проекта
-from typing import Any    # типы для аннотаций
-from PySide6 import QtWidgets  # для настроек таблиц
+from typing import Any, Callable, Dict, Iterable, List, Tuple  # типы для аннотаций
+from PySide6 import QtWidgets, QtCore  # для настроек таблиц и списков
+import json  # запасной сериализатор файлов снимков
+from urllib.parse import unquote  # восстановление имени снимка из имени файла
 import logging  # для вывода информационных и ошибочных сообщений
 
+try:
+    import orjson  # type: ignore  # быстрый сериализатор JSON (необязательная зависимость)
+except ImportError:
+    orjson = None  # type: ignore
+try:
+    import zstandard  # type: ignore  # сжатие больших снимков (необязательная зависимость)
+except ImportError:
+    zstandard = None  # type: ignore
+
 # Создаём логгер для модуля. Основная конфигурация задаётся в utils.init_logging().
 logger = logging.getLogger(__name__)
 
@@ -99,6 +119,12 @@ def to_float(text: Any, default: float = 0.0) -> float:
     """
     if isinstance(text, (int, float)):
         return float(text)
+    # Быстрый путь: большинство строк уже в корректном виде («12», «3.5»)
+    if isinstance(text, str):
+        try:
+            return float(text)
+        except ValueError:
+            pass
     try:
         return float(str(text).strip().replace(" ", "").replace(",", "."))
     except Exception:
@@ -128,12 +154,14 @@ def normalize_case(text: Any) -> str:
         logger.error("normalize_case: не удалось привести к строке: %s", ex, exc_info=True)
         return ""
     # Заменяем особые пробелы на обычные, чтобы strip() и split() корректно
-    # обрабатывали строки с неразрывными пробелами
-    try:
-        s = s.replace("\u00A0", " ").replace("\u202F", " ").replace("\u2007", " ")
-    except Exception as ex:
-        logger.error("normalize_case: ошибка замены пробелов: %s", ex, exc_info=True)
-        # продолжаем с исходной строкой
+    # обрабатывали строки с неразрывными пробелами. В ASCII-строках таких
+    # символов нет — для них замены пропускаются.
+    if not s.isascii():
+        try:
+            s = s.replace("\u00A0", " ").replace("\u202F", " ").replace("\u2007", " ")
+        except Exception as ex:
+            logger.error("normalize_case: ошибка замены пробелов: %s", ex, exc_info=True)
+            # продолжаем с исходной строкой
     # Удаляем начальные и конечные пробелы
     s = s.strip()
     # Если строка пуста после обрезки — возвращаем пустую строку
@@ -278,6 +306,26 @@ def contains_search(haystack: Any, needle: Any) -> bool:
     return hk.find(nk) >= 0
 
 
+def make_search_matcher(needle: Any) -> Callable[[Any], bool]:
+    """Возвращает предикат ``match(haystack)``, эквивалентный
+    ``contains_search(haystack, needle)``.
+
+    Канон needle вычисляется один раз при создании предиката, поэтому при
+    проверке множества строк с одной поисковой строкой не пересчитывается.
+
+    :param needle: подстрока для поиска
+    :return: функция, принимающая строку и возвращающая True при совпадении
+    """
+    nk = make_search_key(needle)
+    if not nk:
+        return lambda haystack: True
+
+    def match(haystack: Any) -> bool:
+        return nk in make_search_key(haystack)
+
+    return match
+
+
 # 7. Автоширины столбцов и приоритет «Наименования»
 def setup_auto_col_resize(table: QtWidgets.QTableWidget) -> None:
     """Включить авто-подгон ширины столбцов по содержимому.
@@ -312,3 +360,255 @@ def apply_auto_col_resize(table: QtWidgets.QTableWidget) -> None:
     except Exception:
         # Игнорируем ошибки, например, если таблица пуста
         pass
+
+
+# 7.1 Пакетное заполнение выпадающих списков
+def fill_combo_batch(combo: QtWidgets.QComboBox, items: List[Tuple[str, Any]]) -> None:
+    """Заполняет выпадающий список одной вставкой строк в модель.
+
+    Вместо ``addItem`` в цикле (каждый вызов порождает ``rowsInserted`` и
+    пересчёт раскладки) строки вставляются в модель комбобокса за один
+    ``insertRows``, после чего заполняются отображаемый текст и данные.
+
+    :param combo: Комбобокс, содержимое которого нужно заменить
+    :param items: Пары (отображаемый текст, данные элемента)
+    """
+    combo.clear()
+    if not items:
+        return
+    model = combo.model()
+    model.insertRows(0, len(items))
+    for i, (display, data) in enumerate(items):
+        idx = model.index(i, 0)
+        model.setData(idx, display, QtCore.Qt.ItemDataRole.DisplayRole)
+        model.setData(idx, data, QtCore.Qt.ItemDataRole.UserRole)
+
+
+# 8. Колоночное представление позиций снимка сметы
+#
+# Позиции снимка хранятся не словарём «id → dict строки», а набором
+# параллельных колонок (Structure of Arrays): числовые поля — компактные
+# массивы ``array('d')``, идентификаторы — ``array('q')``, строковые поля —
+# списки. Словарь ``id_to_idx`` сопоставляет идентификатор позиции с
+# индексом в колонках.
+SNAPSHOT_NUM_FIELDS = ("qty", "coeff", "unit_price", "amount", "power_watts")
+SNAPSHOT_STR_FIELDS = ("name", "vendor", "department", "zone", "class")
+
+
+def snapshot_columns_from_rows(rows: Iterable[Any]) -> Dict[str, Any]:
+    """Строит колонки снимка по строкам таблицы ``items`` за один проход.
+
+    Для ``sqlite3.Row`` номера колонок определяются один раз по первой
+    строке, и значения читаются по позиции: доступ по имени у ``Row`` —
+    линейный поиск среди имён колонок.
+
+    :param rows: строки ``sqlite3.Row`` (или словари с теми же ключами)
+    :return: словарь колонок с индексом ``id_to_idx``
+    """
+    rows = list(rows)
+    n = len(rows)
+    fields = ("id", "qty", "coeff", "unit_price", "amount", "power_watts",
+              "name", "vendor", "department", "zone", "type")
+    if rows and not isinstance(rows[0], dict):
+        row_keys = list(rows[0].keys())
+        pos: Dict[str, Any] = {f: row_keys.index(f) for f in fields}
+    else:
+        pos = {f: f for f in fields}
+    (k_id, k_qty, k_coeff, k_price, k_amount, k_power,
+     k_name, k_vendor, k_dept, k_zone, k_type) = (pos[f] for f in fields)
+    ids = array("q", bytes(8 * n))
+    nums = {f: array("d", bytes(8 * n)) for f in SNAPSHOT_NUM_FIELDS}
+    strs: Dict[str, List[str]] = {f: [""] * n for f in SNAPSHOT_STR_FIELDS}
+    qty, coeff, price, amount, power = (nums[f] for f in SNAPSHOT_NUM_FIELDS)
+    name, vendor, department, zone, cls = (strs[f] for f in SNAPSHOT_STR_FIELDS)
+    for i, row in enumerate(rows):
+        ids[i] = int(row[k_id])
+        qty[i] = float(row[k_qty] or 0)
+        coeff[i] = float(row[k_coeff] or 0)
+        price[i] = float(row[k_price] or 0)
+        amount[i] = float(row[k_amount] or 0)
+        power[i] = float(row[k_power] or 0)
+        name[i] = row[k_name] or ""
+        vendor[i] = row[k_vendor] or ""
+        department[i] = row[k_dept] or ""
+        zone[i] = row[k_zone] or ""
+        cls[i] = row[k_type] or "equipment"
+    cols: Dict[str, Any] = {"id": ids, **nums, **strs}
+    cols["id_to_idx"] = dict(zip(ids, range(n)))
+    return cols
+
+
+def snapshot_columns(items: Any) -> Dict[str, Any]:
+    """Приводит позиции снимка из файла к колоночному представлению.
+
+    Поддерживает оба формата: колонки (``{"id": [...], "qty": [...], ...}``)
+    и устаревший словарь ``{item_id: {поле: значение}}``, где ключи после
+    загрузки JSON становятся строками. Некорректные записи пропускаются.
+
+    :param items: значение ключа ``items`` из файла снимка
+    :return: словарь колонок с индексом ``id_to_idx``
+    """
+    items = items or {}
+    if isinstance(items.get("id"), list):
+        # Идентификаторы из JSON уже целые — array принимает список целиком;
+        # поэлементное приведение нужно только для нестандартных файлов
+        try:
+            ids = array("q", items["id"])
+        except TypeError:
+            ids = array("q", (int(v) for v in items["id"]))
+        n = len(ids)
+        cols: Dict[str, Any] = {"id": ids}
+        for f in SNAPSHOT_NUM_FIELDS:
+            col = array("d", (float(v or 0) for v in items.get(f) or ()))
+            cols[f] = col if len(col) == n else array("d", bytes(8 * n))
+        for f in SNAPSHOT_STR_FIELDS:
+            col = [str(v or "") for v in items.get(f) or ()]
+            cols[f] = col if len(col) == n else [""] * n
+        cols["id_to_idx"] = dict(zip(ids, range(n)))
+        return cols
+    # Устаревший формат: ключи приводятся к int одним проходом; записи
+    # с некорректным ключом пропускаются
+    legacy = {int(k): v for k, v in items.items() if _is_int_key(k)}
+    rows: List[Dict[str, Any]] = [
+        {
+            "id": item_id,
+            **{f: v.get(f, 0) for f in SNAPSHOT_NUM_FIELDS},
+            "name": v.get("name", ""),
+            "vendor": v.get("vendor", ""),
+            "department": v.get("department", ""),
+            "zone": v.get("zone", ""),
+            "type": v.get("class", "equipment"),
+        }
+        for item_id, v in legacy.items()
+        if isinstance(v, dict)
+    ]
+    return snapshot_columns_from_rows(rows)
+
+
+def _is_int_key(key: Any) -> bool:
+    """Проверяет, что ключ устаревшего снимка приводится к int."""
+    try:
+        int(key)
+    except (TypeError, ValueError):
+        return False
+    return True
+
+
+def snapshot_columns_to_json(cols: Dict[str, Any]) -> Dict[str, List[Any]]:
+    """Возвращает колонки снимка в виде списков для записи в JSON.
+
+    Индекс ``id_to_idx`` не сохраняется — он восстанавливается при загрузке.
+    """
+    out: Dict[str, List[Any]] = {"id": list(cols.get("id", ()))}
+    for f in SNAPSHOT_NUM_FIELDS + SNAPSHOT_STR_FIELDS:
+        out[f] = list(cols.get(f, ()))
+    return out
+
+
+# Расширения файлов снимков: обычный JSON и JSON, сжатый zstd
+SNAPSHOT_SUFFIXES = (".json", ".json.zst")
+# Снимки с большим числом позиций сжимаются (если установлен zstandard)
+SNAPSHOT_COMPRESS_MIN_ITEMS = 1000
+
+
+def write_snapshot_file(path: Path, data: Dict[str, Any]) -> Path:
+    """Записывает снимок сметы в JSON-файл одним вызовом ``write_bytes``.
+
+    При наличии ``orjson`` сериализация выполняется им (в C, с отступами
+    для читаемости), иначе — стандартным модулем ``json`` без отступов.
+    Если позиций не меньше ``SNAPSHOT_COMPRESS_MIN_ITEMS`` и установлен
+    ``zstandard``, JSON сжимается (уровень 3) и пишется в файл с
+    дополнительным расширением ``.zst``. Колонки позиций должны быть
+    предварительно преобразованы ``snapshot_columns_to_json``.
+
+    :return: фактический путь записанного файла
+    """
+    path = Path(path)
+    items = data.get("items") or {}
+    compress = zstandard is not None and len(items.get("id") or ()) >= SNAPSHOT_COMPRESS_MIN_ITEMS
+    if orjson is not None:
+        payload = orjson.dumps(data, option=0 if compress else orjson.OPT_INDENT_2)
+    else:
+        payload = json.dumps(data, ensure_ascii=False).encode("utf-8")
+    if compress:
+        path = path.with_name(path.name + ".zst")
+        payload = zstandard.ZstdCompressor(level=3).compress(payload)
+    path.write_bytes(payload)
+    return path
+
+
+def read_snapshot_file(path: Path) -> Any:
+    """Читает файл снимка сметы (через ``orjson``, если он доступен).
+
+    Файлы ``.json.zst`` предварительно распаковываются; без установленного
+    ``zstandard`` чтение такого файла завершается ``RuntimeError``.
+    """
+    path = Path(path)
+    raw = path.read_bytes()
+    if path.name.endswith(".zst"):
+        if zstandard is None:
+            raise RuntimeError("Для чтения сжатого снимка нужна библиотека zstandard")
+        raw = zstandard.ZstdDecompressor().decompress(raw)
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw.decode("utf-8"))
+
+
+def _snapshot_base_name(path: Path) -> str:
+    """Имя файла снимка без расширения ``.json``/``.json.zst``."""
+    name = Path(path).name
+    for suffix in sorted(SNAPSHOT_SUFFIXES, key=len, reverse=True):
+        if name.endswith(suffix):
+            return name[: -len(suffix)]
+    return Path(path).stem
+
+
+# 8.1 Имя снимка в имени файла
+#
+# Файл снимка называется ``project_<id>_<timestamp>__<имя>.json[.zst]``. Символы,
+# недопустимые в именах файлов, а также «%» экранируются как ``%XX``, поэтому
+# имя восстанавливается без чтения файла. Для файлов без суффикса (старый
+# формат или слишком длинное имя) имя читается из JSON и кэшируется по
+# времени изменения файла.
+_SNAP_NAME_SEP = "__"
+_SNAP_NAME_MAX = 100
+_SNAP_NAME_UNSAFE = set('<>:"/\\|?*%')
+_SNAP_NAME_CACHE: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+_SNAP_NAME_CACHE_SIZE = 256
+
+
+def snapshot_filename(project_id: Any, timestamp: str, name: str) -> str:
+    """Формирует имя файла снимка со встроенным отображаемым именем."""
+    escaped = "".join(
+        f"%{ord(ch):02X}" if ch in _SNAP_NAME_UNSAFE or ord(ch) < 32 else ch
+        for ch in name
+    )
+    if not escaped or len(escaped) > _SNAP_NAME_MAX:
+        return f"project_{project_id}_{timestamp}.json"
+    return f"project_{project_id}_{timestamp}{_SNAP_NAME_SEP}{escaped}.json"
+
+
+def snapshot_display_name(path: Path) -> str:
+    """Возвращает отображаемое имя снимка.
+
+    Имя берётся из суффикса имени файла; для файлов без суффикса — из поля
+    ``name`` JSON (с кэшем по ``mtime``). При ошибке чтения исключение
+    пробрасывается вызывающему коду.
+    """
+    path = Path(path)
+    base = _snapshot_base_name(path)
+    _, sep, escaped = base.partition(_SNAP_NAME_SEP)
+    if sep and escaped:
+        return unquote(escaped)
+    key = str(path)
+    mtime = path.stat().st_mtime
+    cached = _SNAP_NAME_CACHE.get(key)
+    if cached is not None and cached[0] == mtime:
+        _SNAP_NAME_CACHE.move_to_end(key)
+        return cached[1]
+    data = read_snapshot_file(path)
+    name = (data.get("name") if isinstance(data, dict) else None) or base
+    _SNAP_NAME_CACHE[key] = (mtime, name)
+    if len(_SNAP_NAME_CACHE) > _SNAP_NAME_CACHE_SIZE:
+        _SNAP_NAME_CACHE.popitem(last=False)
+    return name
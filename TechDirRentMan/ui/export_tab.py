@@ -61,7 +61,7 @@ from typing import Dict, Any, Optional, Tuple, List, Set
 from PySide6 import QtWidgets, QtCore, QtGui
 
 # Дополнительные утилиты из проекта
-from .common import CLASS_EN2RU, DATA_DIR, normalize_case, fmt_num, fmt_sign  # для перевода классов, путей, нормализации и форматирования
+from .common import CLASS_EN2RU, DATA_DIR, normalize_case, fmt_num, fmt_sign, snapshot_columns, read_snapshot_file, snapshot_display_name, SNAPSHOT_SUFFIXES  # для перевода классов, путей, нормализации и форматирования
 
 import textwrap  # для переноса длинных строк
 
@@ -597,11 +597,14 @@ def build_export_tab(page: Any, tab: QtWidgets.QWidget) -> None:
                 from .common import ASSETS_DIR  # импорт здесь, чтобы избежать циклов
                 snap_dir = Path(ASSETS_DIR) / f"project_{proj_id}" / "snapshots"
                 if snap_dir.exists():
-                    for f in sorted(snap_dir.glob(f"project_{proj_id}_*.json")):
+                    prefix = f"project_{proj_id}_"
+                    snap_files = (
+                        f for f in snap_dir.iterdir()
+                        if f.name.startswith(prefix) and f.name.endswith(SNAPSHOT_SUFFIXES)
+                    )
+                    for f in sorted(snap_files):
                         try:
-                            with open(f, "r", encoding="utf-8") as fh:
-                                snap_data = json.load(fh)
-                            name = snap_data.get("name") or f.stem
+                            name = snapshot_display_name(f)
                             cmb_snap.addItem(name, str(f))
                         except Exception:
                             continue
@@ -1137,30 +1140,24 @@ def generate_pdf(
             snap_path: Optional[str] = common_opts.get("snapshot")
             try:
                 if snap_path and os.path.exists(snap_path):
-                    with open(snap_path, "r", encoding="utf-8") as f:
-                        snap_data = json.load(f)
+                    snap_data = read_snapshot_file(snap_path)
                     # Извлекаем снимок финансового отчёта, если он есть
                     fin_snapshot_data = snap_data.get("fin_snapshot") if isinstance(snap_data, dict) else None
-                    # Считываем элементы снимка. Ключи могут быть строковыми, приводим к int
-                    items_raw: Dict[Any, Any] = snap_data.get("items", {}) or {}
-                    snap_items: Dict[int, Any] = {}
-                    for k, v in items_raw.items():
-                        try:
-                            snap_items[int(k)] = v
-                        except Exception:
-                            continue
+                    # Считываем элементы снимка колонками (поддерживается и старый
+                    # формат — словарь по строковым id)
+                    snap_cols = snapshot_columns(snap_data.get("items"))
                     # Строим карту snap_map по ключу (подрядчик, наименование, отдел, зона)
-                    for itm in snap_items.values():
+                    for j in range(len(snap_cols["id"])):
                         try:
-                            v_key = normalize_case(itm.get("vendor", ""))
-                            n_key = normalize_case(itm.get("name", ""))
-                            d_key = normalize_case(itm.get("department", ""))
-                            z_key = normalize_case(itm.get("zone", ""))
-                            qty_s = float(itm.get("qty", 0.0))
-                            coeff_s = float(itm.get("coeff", 0.0))
-                            price_s = float(itm.get("unit_price", 0.0))
+                            v_key = normalize_case(snap_cols["vendor"][j])
+                            n_key = normalize_case(snap_cols["name"][j])
+                            d_key = normalize_case(snap_cols["department"][j])
+                            z_key = normalize_case(snap_cols["zone"][j])
+                            qty_s = snap_cols["qty"][j]
+                            coeff_s = snap_cols["coeff"][j]
+                            price_s = snap_cols["unit_price"][j]
                             amount_s = qty_s * coeff_s * price_s
-                            cls_s = itm.get("class", "equipment")
+                            cls_s = snap_cols["class"][j]
                             snap_map[(v_key, n_key, d_key, z_key)] = (
                                 qty_s, coeff_s, price_s, amount_s, cls_s
                             )
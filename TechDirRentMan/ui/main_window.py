@@ -16,13 +16,14 @@
 from PySide6 import QtWidgets, QtGui, QtCore  # Qt
 from typing import Optional, Callable          # типы
 from pathlib import Path                       # для путей при копировании файлов
-import shutil, json                            # для копирования и обработки файлов
+import shutil                                  # для копирования файлов
 
 from .project_page import ProjectPage         # страница проекта
 from .db_window import DatabaseWindow         # окно каталога
 from .widgets import LogDock                  # док-панель лога
 from db import DB                             # база данных
 from .common import ASSETS_DIR, DATA_DIR      # директории ассетов и данных
+from .common import SNAPSHOT_SUFFIXES, read_snapshot_file, write_snapshot_file  # файлы снимков
 
 # 2. Класс MainWindow
 class MainWindow(QtWidgets.QMainWindow):
@@ -249,17 +250,23 @@ class MainWindow(QtWidgets.QMainWindow):
                 snap_dir = dst_assets / "snapshots"
                 if snap_dir.exists():
                     pattern = f"project_{src_pid}_"
-                    for snap_file in list(snap_dir.glob(f"project_{src_pid}_*.json")):
+                    # Снимки бывают обычными (.json) и сжатыми (.json.zst);
+                    # сжатие при записи выбирается так же, как при создании снимка
+                    snap_files = [
+                        f for f in snap_dir.iterdir()
+                        if f.name.startswith(pattern) and f.name.endswith(SNAPSHOT_SUFFIXES)
+                    ]
+                    for snap_file in snap_files:
                         try:
-                            with open(snap_file, "r", encoding="utf-8") as fh:
-                                snap_data = json.load(fh)
+                            snap_data = read_snapshot_file(snap_file)
                             # обновляем идентификатор проекта в содержимом
                             snap_data["project_id"] = new_pid
-                            # формируем новое имя файла с новым project_id
-                            new_name_part = snap_file.name.replace(pattern, f"project_{new_pid}_")
-                            new_path = snap_file.parent / new_name_part
-                            with open(new_path, "w", encoding="utf-8") as fh:
-                                json.dump(snap_data, fh, ensure_ascii=False, indent=2)
+                            # формируем новое имя файла с новым project_id (без .zst:
+                            # write_snapshot_file добавит его сам, если снимок сжимается)
+                            new_name_part = snap_file.name.replace(pattern, f"project_{new_pid}_", 1)
+                            if new_name_part.endswith(".zst"):
+                                new_name_part = new_name_part[: -len(".zst")]
+                            new_path = write_snapshot_file(snap_file.parent / new_name_part, snap_data)
                             # удаляем старый файл, если имя изменилось
                             if new_path != snap_file:
                                 snap_file.unlink()
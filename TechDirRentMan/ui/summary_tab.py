@@ -58,7 +58,10 @@
 from __future__ import annotations
 
 from typing import List, Dict, Any, Tuple, Set, Optional
-from datetime import datetime
+from contextlib import suppress
+from datetime import datetime, timezone
+from functools import lru_cache
+import uuid
 
 from PySide6 import QtWidgets, QtCore, QtGui
 import unicodedata
@@ -67,13 +70,20 @@ from .common import (
     CLASS_RU2EN, CLASS_EN2RU, WRAP_THRESHOLD, fmt_num, fmt_sign, to_float,
     apply_auto_col_resize, setup_priority_name, normalize_case, DATA_DIR,
     # Импортируем функции для канонического поиска
-    make_search_key, contains_search
+    make_search_key, contains_search, make_search_matcher,
+    # Колоночное представление позиций снимка
+    snapshot_columns, snapshot_columns_from_rows, snapshot_columns_to_json,
+    read_snapshot_file, write_snapshot_file, snapshot_filename, snapshot_display_name,
+    SNAPSHOT_SUFFIXES, fill_combo_batch
 )
 from .delegates import WrapTextDelegate
-from .widgets import SmartDoubleSpinBox
+from .widgets import SmartDoubleSpinBox, LazyComboBox
 from .unreal_import_tab import CatalogSelectDialog  # реиспользуем диалог выбора позиции из базы
 
 import json
+import math
+import re
+import time
 from pathlib import Path
 import logging
 
@@ -97,6 +107,53 @@ GROUP_COLOR_PALETTE: List[QtGui.QColor] = [
     QtGui.QColor(255, 102, 178),   # розовый
 ]
 
+# Служебные имена групп (в нижнем регистре), которые не окрашиваются и не
+# добавляются префиксом к наименованию. frozenset обеспечивает O(1) проверку
+# вхождения в построчных циклах reload_zone_tabs.
+_TRIVIAL_GROUPS: frozenset[str] = frozenset(("", "аренда оборудования"))
+
+# Мемоизированная нормализация строк для горячих циклов (подсказки каталога
+# перестраиваются на каждый ввод). normalize_case детерминирована, поэтому
+# кэш безопасен; исходную функцию не подменяем. Аргумент — только str.
+_norm_cached = lru_cache(maxsize=16384)(normalize_case)
+
+# Нормализованные служебные значения мастеров (вычисляются один раз)
+_DEPT_SOUND = normalize_case("звук")
+_VENDOR_TECHDIR = normalize_case("техдиректор")
+
+# Разбор наименования LED-экрана, созданного мастером экрана:
+# размеры, число кабинетов и разрешение (компилируется один раз)
+_SCREEN_NAME_RE = re.compile(
+    r"LED экран ([0-9]+(?:\.[0-9]+)?)×([0-9]+(?:\.[0-9]+)?) м \((\d+) кабинетов, (\d+)×(\d+) пикселей\)"
+)
+
+
+def _row_get(row: Any, key: str, cast: Any = str, default: Any = "") -> Any:
+    """
+    Значение поля key строки каталога (sqlite3.Row/dict), приведённое через cast.
+
+    Отсутствующее поле, пустое значение или ошибка приведения дают default
+    (как выражение ``cast(row[key] or default)`` с перехватом исключений).
+    """
+    try:
+        v = row[key]
+    except (KeyError, IndexError):
+        return default
+    if not v:
+        return default
+    try:
+        return cast(v)
+    except (TypeError, ValueError):
+        return default
+
+
+# Порядок значений в кортежах снимка удалённых строк (UNDO удаления);
+# в том же порядке строки позиций формирует мастер подиума
+_DELETE_UNDO_COLUMNS: Tuple[str, ...] = (
+    "project_id", "type", "group_name", "name", "qty", "coeff", "amount", "unit_price",
+    "source_file", "created_at", "vendor", "department", "zone", "power_watts", "import_batch",
+)
+
 # --------------- Дополнительные утилиты ---------------
 
 def _fix_vertical_header_width(table: QtWidgets.QTableWidget, width: int = 40) -> None:
@@ -120,6 +177,92 @@ def _fix_vertical_header_width(table: QtWidgets.QTableWidget, width: int = 40) -
         # В случае ошибки silently fail
         pass
 
+
+def snapshot_diff(
+    snap_cols: Dict[str, Any], rows: List[Any], zone_key: str
+) -> Tuple[List[Optional[Tuple[float, float, float]]], List[int]]:
+    """Сопоставляет строки зоны со снимком за один проход по колонкам.
+
+    :param snap_cols: колонки снимка (см. ``snapshot_columns``)
+    :param rows: текущие строки зоны (числовые поля уже без NULL)
+    :param zone_key: ключ зоны, для которой ищутся удалённые позиции
+    :return: список разниц ``(qty, unit_price, amount)`` для каждой строки
+        (``None`` — позиции нет в снимке) и индексы строк снимка этой зоны,
+        отсутствующих среди ``rows``
+    """
+    snap_index = snap_cols["id_to_idx"]
+    snap_qty = snap_cols["qty"]
+    snap_price = snap_cols["unit_price"]
+    snap_amount = snap_cols["amount"]
+    diffs: List[Optional[Tuple[float, float, float]]] = []
+    present: Set[int] = set()
+    for r in rows:
+        j = snap_index.get(int(r["id"]))
+        if j is None:
+            diffs.append(None)
+            continue
+        present.add(j)
+        diffs.append((
+            r["qty"] - snap_qty[j],
+            r["unit_price"] - snap_price[j],
+            r["amount"] - snap_amount[j],
+        ))
+    removed = [
+        j for j, z in enumerate(snap_cols["zone"])
+        if z == zone_key and j not in present
+    ]
+    return diffs, removed
+
+
+def _summary_filters(page: Any, refresh: bool = False) -> Tuple[str, str, str]:
+    """Возвращает активные фильтры сводной сметы (подрядчик, отдел, класс).
+
+    Служебные пункты «Все ...» преобразуются в ``"<ALL>"``, класс переводится
+    в английский ключ, как того ожидают методы выборки БД. Результат
+    кэшируется в ``page._filter_vendor``/``_filter_department``/
+    ``_filter_class_en`` и пересчитывается при ``refresh=True`` — при смене
+    фильтров и в начале ``reload_zone_tabs``.
+    """
+    if not refresh and getattr(page, "_filter_class_en", None) is not None:
+        return page._filter_vendor, page._filter_department, page._filter_class_en
+    vendor = page.cmb_f_vendor.currentText()
+    if vendor == "<Все подрядчики>":
+        vendor = "<ALL>"
+    department = page.cmb_f_department.currentText()
+    if department == "<Все отделы>":
+        department = "<ALL>"
+    class_ru = page.cmb_f_class.currentText()
+    class_en = CLASS_RU2EN.get(class_ru) if class_ru and class_ru != "<Все классы>" else "<ALL>"
+    page._filter_vendor, page._filter_department, page._filter_class_en = vendor, department, class_en
+    return vendor, department, class_en
+
+
+def _zone_filtered_sum(page: Any, zone_key: str) -> float:
+    """Считает сумму позиций зоны с учётом фильтров и строки поиска.
+
+    Суммирование и поиск выполняются в SQLite (``DB.sum_items_filtered``),
+    поэтому строки позиций не передаются в Python. Для поиска используется
+    тот же ``contains_search``, что и при построении таблиц. Результат
+    запоминается в ``page._zone_sum_cache``, чтобы правка ячейки могла
+    обновить итог на разницу сумм без повторного запроса.
+    """
+    vendor, department, class_en = _summary_filters(page)
+    search_raw = page.ed_search.text() if hasattr(page, "ed_search") else ""
+    total = page.db.sum_items_filtered(
+        project_id=page.project_id,
+        vendor=vendor,
+        department=department,
+        zone=zone_key,
+        class_en=class_en,
+        search=search_raw or None,
+        search_fn=contains_search,
+    )
+    if not isinstance(getattr(page, "_zone_sum_cache", None), dict):
+        page._zone_sum_cache = {}
+    page._zone_sum_cache[zone_key] = total
+    return total
+
+
 def _get_group_color(page: Any, group_name: str) -> QtGui.QColor:
     """Возвращает цвет для указанной группы.
 
@@ -143,7 +286,7 @@ def _get_group_color(page: Any, group_name: str) -> QtGui.QColor:
         gkey_lower = str(gkey).strip().lower()
     except Exception:
         gkey_lower = ""
-    if not gkey_lower or gkey_lower in ("", "аренда оборудования"):
+    if gkey_lower in _TRIVIAL_GROUPS:
         return QtGui.QColor(0, 0, 0, 0)
     # Инициализируем карту при первом использовании
     if not hasattr(page, "_group_colors") or not isinstance(page._group_colors, dict):
@@ -354,6 +497,46 @@ def _canon_zone(name: str) -> str:
         return ""
     return str(name).strip()
 
+def _zone_display(page: Any, zone_key: str) -> str:
+    """Возвращает отображаемое имя зоны (``normalize_case``) с кэшированием.
+
+    Карта ``page._zone_display`` хранит уже вычисленные формы ключей зон,
+    поэтому при перестроении выпадающих списков нормализация не повторяется.
+    """
+    cache = getattr(page, "_zone_display", None)
+    if cache is None:
+        cache = page._zone_display = {}
+    disp = cache.get(zone_key)
+    if disp is None:
+        disp = cache[zone_key] = normalize_case(zone_key)
+    return disp
+
+def _current_zone_key(page: Any) -> Optional[str]:
+    """Возвращает ключ ``page.zone_tables`` для активной вкладки зоны.
+
+    Ключ выводится из текста вкладки через ``_canon_zone`` — так он не
+    зависит от порядка ключей в словаре после переименований и переносов.
+    ``None`` означает, что активной вкладки нет.
+    """
+    zone_tabs = getattr(page, "zone_tabs", None)
+    if zone_tabs is None:
+        return None
+    cur_idx = zone_tabs.currentIndex()
+    if cur_idx < 0:
+        return None
+    return _canon_zone(zone_tabs.tabText(cur_idx))
+
+def _zone_key_index(page: Any) -> Set[str]:
+    """Возвращает множество ключей ``page.zone_tables`` в нижнем регистре.
+
+    Индекс ``page._zone_keys_lower`` поддерживается инкрементально при
+    создании, переименовании и удалении зон; при отсутствии строится заново.
+    """
+    keys = getattr(page, "_zone_keys_lower", None)
+    if keys is None:
+        keys = page._zone_keys_lower = {str(k).lower() for k in page.zone_tables}
+    return keys
+
 def _canonize_list(zones: List[str]) -> List[str]:
     """Очищает список зон: убирает пустые и 'Без зоны', удаляет дубликаты (case-insensitive)."""
     out: List[str] = []
@@ -376,8 +559,14 @@ def _load_persisted_zones(page: Any) -> List[str]:
     Загружает список сохранённых зон из JSON-файла и нормализует их.
     Возвращает список БЕЗ пустой зоны и без строки "Без зоны".
     В случае наличия лишних значений выполняется авто-санитизация файла.
+
+    Прочитанный список кэшируется в ``page._persisted_zones_cache`` вместе с
+    путём файла: повторные вызовы для того же проекта не обращаются к диску.
     """
     p = _zones_json_path(page)
+    cache = getattr(page, "_persisted_zones_cache", None)
+    if cache is not None and cache[0] == p:
+        return list(cache[1])
     try:
         raw: List[str] = []
         if p.exists():
@@ -385,6 +574,7 @@ def _load_persisted_zones(page: Any) -> List[str]:
             if isinstance(data, list):
                 raw = [str(z) for z in data]
         cleaned = _canonize_list(raw)
+        page._persisted_zones_cache = (p, list(cleaned))
         # Автоматически санитизируем файл при расхождении
         try:
             if cleaned != raw:
@@ -398,20 +588,58 @@ def _load_persisted_zones(page: Any) -> List[str]:
 
 
 
+def _write_persisted_zones(p: Path, zones: List[str]) -> None:
+    """Записывает уже очищенный список зон в JSON-файл ``p``."""
+    try:
+        p.parent.mkdir(parents=True, exist_ok=True)
+        with open(p, "w", encoding="utf-8") as f:
+            json.dump(zones, f, ensure_ascii=False, indent=2)
+    except Exception as ex:
+        logging.getLogger(__name__).error("Не удалось сохранить файл зон %s: %s", p, ex, exc_info=True)
+
+
+def _flush_persisted_zones(page: Any) -> None:
+    """Немедленно записывает отложенное сохранение зон, если оно есть."""
+    pending = getattr(page, "_persisted_zones_pending", None)
+    page._persisted_zones_pending = None
+    if pending is not None:
+        _write_persisted_zones(*pending)
+
+
 def _save_persisted_zones(page: Any, zones: List[str]) -> None:
     """
     Сохраняет список зон в JSON-файл.
     Храним только НЕпустые зоны, без строки "Без зоны".
     Дубликаты убираем без учёта регистра.
+
+    Кэш ``page._persisted_zones_cache`` обновляется сразу, а запись на диск
+    откладывается на 200 мс: несколько сохранений подряд (например, при
+    переименовании зоны) дают одну запись. Отложенная запись выполняется
+    также при смене проекта (init_zone_tabs и следующее сохранение для
+    другого файла) и при выходе из приложения.
     """
     p = _zones_json_path(page)
-    try:
-        z = _canonize_list(zones)
-        p.parent.mkdir(parents=True, exist_ok=True)
-        with open(p, "w", encoding="utf-8") as f:
-            json.dump(z, f, ensure_ascii=False, indent=2)
-    except Exception as ex:
-        logging.getLogger(__name__).error("Не удалось сохранить файл зон %s: %s", p, ex, exc_info=True)
+    z = _canonize_list(zones)
+    # Если ожидает запись для другого проекта — сохраняем её сразу
+    pending = getattr(page, "_persisted_zones_pending", None)
+    if pending is not None and pending[0] != p:
+        _flush_persisted_zones(page)
+    page._persisted_zones_cache = (p, list(z))
+    if not isinstance(page, QtCore.QObject):
+        _write_persisted_zones(p, z)
+        return
+    page._persisted_zones_pending = (p, z)
+    timer = getattr(page, "_persisted_zones_timer", None)
+    if timer is None:
+        timer = QtCore.QTimer(page)
+        timer.setSingleShot(True)
+        timer.setInterval(200)
+        timer.timeout.connect(lambda: _flush_persisted_zones(page))
+        page._persisted_zones_timer = timer
+        app = QtCore.QCoreApplication.instance()
+        if app is not None:
+            app.aboutToQuit.connect(lambda: _flush_persisted_zones(page))
+    timer.start()
 
 try:
     # Диалог переноса зон. PowerMismatchDialog здесь не используется
@@ -576,10 +804,8 @@ def build_summary_tab(page: Any, tab: QtWidgets.QWidget) -> None:
     page.ed_add_vendor.setPlaceholderText("Подрядчик")
     page.cmb_add_department = QtWidgets.QComboBox()
     page.cmb_add_department.setEditable(True)
-    try:
+    with suppress(Exception):
         le = page.cmb_add_department.lineEdit(); le.setPlaceholderText("Отдел")
-    except Exception:
-        pass
     # Фильтры подрядчика и отдела (использовались в режиме базы) удалены
 
     page.cmb_add_zone = QtWidgets.QComboBox()
@@ -640,74 +866,24 @@ def build_summary_tab(page: Any, tab: QtWidgets.QWidget) -> None:
     # исключения, они игнорируются.
     def _update_total_on_zone_change(idx: int) -> None:
         try:
-            # Получаем индекс выбранной зоны и соответствующий ключ
-            cur_idx = page.zone_tabs.currentIndex() if hasattr(page, "zone_tabs") else -1
+            # Получаем ключ выбранной зоны по тексту вкладки
+            cur_zone_key = _current_zone_key(page)
         except Exception:
-            cur_idx = -1
-        if cur_idx < 0:
+            cur_zone_key = None
+        if cur_zone_key is None:
             return
         cur_sum_val = 0.0
         try:
-            keys = list(page.zone_tables.keys())
-            if 0 <= cur_idx < len(keys):
-                cur_zone_key = keys[cur_idx]
-                # Получаем активные фильтры
-                vendor_f = page.cmb_f_vendor.currentText()
-                if vendor_f == "<Все подрядчики>":
-                    vendor_f = "<ALL>"
-                department_f = page.cmb_f_department.currentText()
-                if department_f == "<Все отделы>":
-                    department_f = "<ALL>"
-                class_ru_f = page.cmb_f_class.currentText()
-                class_en_f = CLASS_RU2EN.get(class_ru_f) if class_ru_f and class_ru_f != "<Все классы>" else "<ALL>"
-                # Запрашиваем строки для текущей зоны и фильтров
-                rows_cur = page.db.list_items_filtered(
-                    project_id=page.project_id,
-                    vendor=vendor_f,
-                    department=department_f,
-                    zone=cur_zone_key,
-                    class_en=class_en_f,
-                    name_like=None,
-                ) or []
-                # Применяем поисковую строку, если есть
-                search_raw_f = page.ed_search.text() if hasattr(page, "ed_search") else ""
-                if search_raw_f:
-                    tmp_rows = []
-                    for r in rows_cur:
-                        try:
-                            nm = r.get("name", "") if isinstance(r, dict) else (r["name"] if r else "")
-                            ven = r.get("vendor", "") if isinstance(r, dict) else (r["vendor"] if r else "")
-                            dep = r.get("department", "") if isinstance(r, dict) else (r["department"] if r else "")
-                            zn = r.get("zone", "") if isinstance(r, dict) else (r["zone"] if r else "")
-                            if (
-                                contains_search(nm, search_raw_f)
-                                or contains_search(ven, search_raw_f)
-                                or contains_search(dep, search_raw_f)
-                                or contains_search(zn, search_raw_f)
-                            ):
-                                tmp_rows.append(r)
-                        except Exception:
-                            continue
-                    rows_cur = tmp_rows
-                # Суммируем amount
-                cur_sum_val = 0.0
-                for r in rows_cur:
-                    try:
-                        amt = r.get("amount") if isinstance(r, dict) else r["amount"]
-                        cur_sum_val += float(amt or 0.0)
-                    except Exception:
-                        continue
+            if cur_zone_key in page.zone_tables:
+                # Сумма текущей зоны с учётом фильтров и поиска считается в SQL
+                cur_sum_val = _zone_filtered_sum(page, cur_zone_key)
         except Exception:
             cur_sum_val = 0.0
         # Обновляем текст в лейбле. Используем fmt_num для форматирования.
-        try:
+        with suppress(Exception):
             page.label_total.setText(f"Итого: {fmt_num(cur_sum_val, 2)}")
-        except Exception:
-            pass
-    try:
+    with suppress(Exception):
         page.zone_tabs.currentChanged.connect(_update_total_on_zone_change)
-    except Exception:
-        pass
 
     # 1.5 Компоновка
     v.addLayout(filt)
@@ -740,6 +916,9 @@ def build_summary_tab(page: Any, tab: QtWidgets.QWidget) -> None:
     v.addLayout(master_bar)
 
     # 1.6 Сигналы: делегируем на методы ProjectPage
+    # Кэш фильтров обновляем до перезагрузки таблиц (соединения выполняются по порядку)
+    for cmb_filter in (page.cmb_f_vendor, page.cmb_f_department, page.cmb_f_class):
+        cmb_filter.currentTextChanged.connect(lambda _text: _summary_filters(page, refresh=True))
     page.ed_search.textChanged.connect(page._reload_zone_tabs)
     page.cmb_f_vendor.currentTextChanged.connect(page._reload_zone_tabs)
     page.cmb_f_department.currentTextChanged.connect(page._reload_zone_tabs)
@@ -815,6 +994,13 @@ def init_zone_tabs(page: Any) -> None:
     существующую зону в качестве зоны по умолчанию. Также вычисляет
     ``page.default_zone`` для использования при добавлении новых позиций.
     """
+    # Смена проекта: отложенное сохранение зон прежнего проекта записываем сразу
+    pending = getattr(page, "_persisted_zones_pending", None)
+    if pending is not None and (page.project_id is None or pending[0] != _zones_json_path(page)):
+        _flush_persisted_zones(page)
+    # Новые таблицы пусты — сбрасываем сигнатуру, чтобы reload их заполнил
+    page._last_reload_sig = None
+    page._zone_sum_cache = {}
     # Удаляем старые вкладки
     while page.zone_tabs.count() > 0:
         w = page.zone_tabs.widget(0)
@@ -834,10 +1020,8 @@ def init_zone_tabs(page: Any) -> None:
     except Exception:
         zones = []
     # 3.2 Подмешиваем сохранённые зоны, чтобы отображать вкладки без позиций
-    try:
+    with suppress(Exception):
         zones += _load_persisted_zones(page)
-    except Exception:
-        pass
     # 3.3 Определяем наличие позиций без зоны (``None`` или пустая строка)
     no_zone_exists = False
     for z in zones:
@@ -879,16 +1063,14 @@ def init_zone_tabs(page: Any) -> None:
         table.customContextMenuRequested.connect(lambda pos, z_key=z: on_zone_table_context_menu(page, z_key, pos))
         page.zone_tabs.addTab(table, label)
         page.zone_tables[z] = table
+    page._zone_keys_lower = {str(k).lower() for k in page.zone_tables}
 
     # 3.7 Обновляем список зон для переноса
-    page.cmb_move_zone.blockSignals(True)
-    page.cmb_move_zone.clear()
-    if no_zone_exists:
-        page.cmb_move_zone.addItem("Без зоны", "")
-    for z in unique_zones:
-        # для комбобокса используем нормализованное отображение
-        page.cmb_move_zone.addItem(normalize_case(z), z)
-    page.cmb_move_zone.blockSignals(False)
+    # для комбобокса используем нормализованное отображение
+    move_items: List[Tuple[str, Any]] = [("Без зоны", "")] if no_zone_exists else []
+    move_items.extend((_zone_display(page, z), z) for z in unique_zones)
+    with QtCore.QSignalBlocker(page.cmb_move_zone):
+        fill_combo_batch(page.cmb_move_zone, move_items)
 
     # 3.8 Обновляем список зон для ручного добавления
     fill_manual_zone_combo(page, unique_zones)
@@ -903,17 +1085,12 @@ def fill_manual_zone_combo(page: Any, zones: List[str]) -> None:
     только существующие зоны, чтобы пользователь по умолчанию добавлял
     позиции в первую зону из списка.
     """
-    page.cmb_add_zone.blockSignals(True)
-    page.cmb_add_zone.clear()
     # Включаем вариант "Без зоны" только если зона по умолчанию действительно пустая
-    if getattr(page, "default_zone", "") == "":
-        page.cmb_add_zone.addItem("Без зоны", "")
-    # Добавляем остальные зоны
-    for z in zones:
-        if z:
-            # Показываем нормализованный вариант, но храним исходный ключ
-            page.cmb_add_zone.addItem(normalize_case(z), z)
-    page.cmb_add_zone.blockSignals(False)
+    items: List[Tuple[str, Any]] = [("Без зоны", "")] if getattr(page, "default_zone", "") == "" else []
+    # Добавляем остальные зоны: показываем нормализованный вариант, но храним исходный ключ
+    items.extend((_zone_display(page, z), z) for z in zones if z)
+    with QtCore.QSignalBlocker(page.cmb_add_zone):
+        fill_combo_batch(page.cmb_add_zone, items)
 
 
 # 4.a Контекстное меню таблицы зон: группирование и разъединение
@@ -1042,7 +1219,8 @@ def group_selected_items(page: Any, zone_key: str) -> None:
         new_id = 1
     group_name_value = f"{new_id}|{display_name}"
     updated_count = 0
-    # Обновляем поле group_name для всех выбранных элементов
+    # Собираем id выбранных элементов и обновляем group_name одним запросом
+    update_rows: List[Tuple[str, int]] = []
     for r in selected_rows:
         itm = table.item(r, 0)
         if itm is None:
@@ -1052,21 +1230,20 @@ def group_selected_items(page: Any, zone_key: str) -> None:
             item_id = int(item_id_data)
         except Exception:
             continue
-        try:
-            page.db.update_item_fields(item_id, {"group_name": group_name_value})
-            updated_count += 1
-        except Exception:
-            continue
+        update_rows.append((group_name_value, item_id))
+    try:
+        updated_count = page.db.update_items_fields_bulk(["group_name"], update_rows)
+    except Exception as ex:
+        with suppress(Exception):
+            page._log(f"Ошибка группирования позиций: {ex}", "error")
     # Логируем и перезагружаем данные
     try:
         if updated_count > 0 and hasattr(page, "_log"):
             page._log(f"Группирование: {updated_count} позиций объединены в группу «{group_name}».")
     except Exception:
         pass
-    try:
+    with suppress(Exception):
         page._reload_zone_tabs()
-    except Exception:
-        pass
 
 
 def ungroup_selected_items(page: Any, zone_key: str) -> None:
@@ -1093,7 +1270,9 @@ def ungroup_selected_items(page: Any, zone_key: str) -> None:
     if not selected_rows:
         return
     updated_count = 0
-    # Проходим по каждой выбранной строке и сбрасываем group_name
+    # Собираем id выбранных строк; group_name сбрасывается в служебное
+    # значение «Аренда оборудования», которое обозначает отсутствие группы
+    update_rows: List[Tuple[str, int]] = []
     for r in selected_rows:
         itm = table.item(r, 0)
         if itm is None:
@@ -1105,19 +1284,13 @@ def ungroup_selected_items(page: Any, zone_key: str) -> None:
         except Exception:
             # пропускаем некорректный id
             continue
-        # Сбрасываем group_name в служебное значение «Аренда оборудования»,
-        # которое обозначает отсутствие группы
-        try:
-            page.db.update_item_fields(item_id, {"group_name": "Аренда оборудования"})
-            updated_count += 1
-        except Exception:
-            # логируем ошибку обновления, но продолжаем обработку остальных строк
-            try:
-                if hasattr(page, "_log"):
-                    page._log(f"Ошибка разъединения позиции id={item_id}")
-            except Exception:
-                pass
-            continue
+        update_rows.append(("Аренда оборудования", item_id))
+    # Обновляем все строки одним executemany и одним коммитом
+    try:
+        updated_count = page.db.update_items_fields_bulk(["group_name"], update_rows)
+    except Exception as ex:
+        with suppress(Exception):
+            page._log(f"Ошибка разъединения позиций: {ex}", "error")
     # Записываем информационное сообщение в лог о количестве разъединённых позиций
     try:
         if updated_count > 0 and hasattr(page, "_log"):
@@ -1125,10 +1298,8 @@ def ungroup_selected_items(page: Any, zone_key: str) -> None:
     except Exception:
         pass
     # Перезагружаем таблицы зон, чтобы отобразить обновлённые данные
-    try:
+    with suppress(Exception):
         page._reload_zone_tabs()
-    except Exception:
-        pass
 
 
 # 4.1 Комбо отделов для ручного добавления
@@ -1142,16 +1313,14 @@ def fill_manual_dept_combo(page: Any, departments: List[str]) -> None:
     """
     # Текущий текст до перезаполнения
     current = page.cmb_add_department.currentText() if hasattr(page, 'cmb_add_department') else ""
-    page.cmb_add_department.blockSignals(True)
-    page.cmb_add_department.clear()
-    page.cmb_add_department.setEditable(True)
-    # Заполняем список существующих отделов
-    for d in departments:
-        if d:
-            page.cmb_add_department.addItem(d)
-    # Восстанавливаем введённый текст
-    page.cmb_add_department.setEditText(current)
-    page.cmb_add_department.blockSignals(False)
+    # QSignalBlocker снимает блокировку сигналов даже при исключении
+    with QtCore.QSignalBlocker(page.cmb_add_department):
+        page.cmb_add_department.clear()
+        page.cmb_add_department.setEditable(True)
+        # Заполняем список существующих отделов
+        page.cmb_add_department.addItems([d for d in departments if d])
+        # Восстанавливаем введённый текст
+        page.cmb_add_department.setEditText(current)
 
 
 # 5. Обновление таблиц по фильтрам
@@ -1175,14 +1344,9 @@ def reload_zone_tabs(page: Any) -> None:
     # Получаем текущие фильтры
     # Текст поиска (сырой) для дальнейшей фильтрации по канону
     search_raw = page.ed_search.text() if hasattr(page, "ed_search") else ""
-    vendor = page.cmb_f_vendor.currentText()
-    if vendor == "<Все подрядчики>":
-        vendor = "<ALL>"
-    department = page.cmb_f_department.currentText()
-    if department == "<Все отделы>":
-        department = "<ALL>"
-    class_ru = page.cmb_f_class.currentText()
-    class_en = CLASS_RU2EN.get(class_ru) if class_ru and class_ru != "<Все классы>" else "<ALL>"
+    # Читаем фильтры из комбобоксов заново (они могли быть перезаполнены
+    # с заблокированными сигналами) и обновляем их кэш
+    vendor, department, class_en = _summary_filters(page, refresh=True)
 
     # Общая сумма по всем зонам (не отображается пользователю),
     # мы будем отдельно рассчитывать сумму для активной зоны.
@@ -1191,6 +1355,26 @@ def reload_zone_tabs(page: Any) -> None:
     # Проверяем, активирован ли режим сравнения
     snap_mode = getattr(page, "_snapshot_compare_enabled", False) and hasattr(page, "_snapshot_data")
 
+    # Сигнатура перезагрузки: если фильтры, набор зон, активная вкладка,
+    # выбранный снимок и версия данных БД не изменились, таблицы уже
+    # актуальны — пропускаем SQL-запросы и перестройку виджетов.
+    try:
+        cur_tab_idx = page.zone_tabs.currentIndex() if hasattr(page, "zone_tabs") else -1
+    except Exception:
+        cur_tab_idx = -1
+    reload_sig = (
+        page.project_id, vendor, department, class_en, search_raw, bool(snap_mode),
+        id(getattr(page, "_snapshot_data", None)) if snap_mode else 0,
+        tuple(page.zone_tables.keys()), cur_tab_idx,
+        getattr(page.db, "_data_version", 0),
+    )
+    if getattr(page, "_last_reload_sig", None) == reload_sig:
+        return
+    # Фильтры или данные изменились — кэш сумм зон больше не актуален
+    page._zone_sum_cache = {}
+    # Канон строки поиска вычисляем один раз для всех зон и строк
+    search_match = make_search_matcher(search_raw)
+
     for zone_key, table in page.zone_tables.items():
         # Получаем строки по фильтрам для текущей зоны. Поиск по наименованию
         # выполняем позже в Python, чтобы игнорировать регистр и учитывать хомоглифы.
@@ -1212,20 +1396,13 @@ def reload_zone_tabs(page: Any) -> None:
                     ven = r["vendor"] if r["vendor"] is not None else ""
                     dep = r["department"] if r["department"] is not None else ""
                     zn = r["zone"] if r["zone"] is not None else ""
-                    if (
-                        contains_search(nm, search_raw)
-                        or contains_search(ven, search_raw)
-                        or contains_search(dep, search_raw)
-                        or contains_search(zn, search_raw)
-                    ):
+                    if search_match(nm) or search_match(ven) or search_match(dep) or search_match(zn):
                         filtered.append(r)
                 except Exception:
                     continue
             rows = filtered
-            try:
+            with suppress(Exception):
                 page._log(f"Сводная смета: поиск '{search_raw}' отфильтровал {len(rows)} элементов (зона {zone_key}).")
-            except Exception:
-                pass
 
         table.blockSignals(True)
         table.setRowCount(0)
@@ -1255,15 +1432,17 @@ def reload_zone_tabs(page: Any) -> None:
                 table.setHorizontalHeaderLabels(headers)
 
         if snap_mode:
-            # Словарь snapshot для быстрого доступа
-            snap_items = page._snapshot_data.get("items", {})
-            used_snapshot_ids = set()
+            # Колонки снимка; разницы с ним считаются заранее одним проходом
+            snap_cols = page._snapshot_data.get("items") or snapshot_columns({})
+            snap_qty_col = snap_cols["qty"]
+            snap_price_col = snap_cols["unit_price"]
+            snap_amount_col = snap_cols["amount"]
+            snap_diffs, snap_removed = snapshot_diff(snap_cols, rows, zone_key)
             # Заполняем текущие строки со сравнением
-            for r in rows:
+            for r, snap_diff in zip(rows, snap_diffs):
                 i = table.rowCount()
                 table.insertRow(i)
                 item_id = int(r["id"])
-                snap = snap_items.get(item_id)
                 # Текущие значения
                 cur_qty = float(r["qty"] or 0)
                 cur_coeff = float(r["coeff"] or 0)
@@ -1277,12 +1456,9 @@ def reload_zone_tabs(page: Any) -> None:
                 state = "добавлено"
                 # Цвет текста для добавленных строк (тёмно‑зелёный)
                 color = QtGui.QColor(0, 150, 0)
-                if snap:
-                    used_snapshot_ids.add(item_id)
-                    # Расчёт разницы
-                    diff_qty = cur_qty - snap["qty"]
-                    diff_price = cur_price - snap["unit_price"]
-                    diff_amount = cur_amount - snap["amount"]
+                if snap_diff is not None:
+                    # Разница уже посчитана в snapshot_diff
+                    diff_qty, diff_price, diff_amount = snap_diff
                     # Определяем состояние и цвет
                     if abs(diff_qty) < 1e-6 and abs(diff_price) < 1e-6:
                         state = "не изменилось"
@@ -1321,14 +1497,15 @@ def reload_zone_tabs(page: Any) -> None:
                 except Exception:
                     gname_raw_snap = ""
                 disp_snap = ""
-                if gname_raw_snap and normalize_case(gname_raw_snap).lower() != "аренда оборудования":
+                name_lower_snap = name_norm.lower()
+                if gname_raw_snap and normalize_case(gname_raw_snap).lower() not in _TRIVIAL_GROUPS:
                     if "|" in gname_raw_snap:
                         disp_snap = gname_raw_snap.split("|", 1)[1].strip()
                     else:
                         disp_snap = gname_raw_snap.strip()
                 display_name_snap = name_norm
                 # Добавляем префикс только если он задан и не совпадает с базовым именем
-                if disp_snap and normalize_case(disp_snap).lower() != name_norm.lower():
+                if disp_snap and normalize_case(disp_snap).lower() != name_lower_snap:
                     display_name_snap = f"{normalize_case(disp_snap)}: {name_norm}"
                 vals = [
                     display_name_snap,
@@ -1359,32 +1536,29 @@ def reload_zone_tabs(page: Any) -> None:
                     table.setItem(i, c, item)
                 total_amount += cur_amount
             # Добавляем удалённые строки
-            for sid, snap in snap_items.items():
-                if snap.get("zone", "") != zone_key:
-                    continue
-                if sid in used_snapshot_ids:
-                    continue
+            snap_zone_col = snap_cols["zone"]
+            for j in snap_removed:
                 i = table.rowCount()
                 table.insertRow(i)
                 # Значения из снимка
-                snap_qty = float(snap.get("qty", 0))
-                snap_price = float(snap.get("unit_price", 0))
-                snap_amount = float(snap.get("amount", 0))
-                cur_class = CLASS_EN2RU.get((snap.get("class") or "equipment"), "Оборудование")
+                snap_qty = snap_qty_col[j]
+                snap_price = snap_price_col[j]
+                snap_amount = snap_amount_col[j]
+                cur_class = CLASS_EN2RU.get((snap_cols["class"][j] or "equipment"), "Оборудование")
                 diff_qty = -snap_qty
                 diff_price = -snap_price
                 diff_amount = -snap_amount
                 # Нормализуем поля из снимка для отображения
-                name_norm = normalize_case(snap.get("name", ""))
-                vendor_norm = normalize_case(snap.get("vendor", ""))
-                department_norm = normalize_case(snap.get("department", ""))
-                zone_norm = normalize_case(snap.get("zone", ""))
+                name_norm = normalize_case(snap_cols["name"][j])
+                vendor_norm = normalize_case(snap_cols["vendor"][j])
+                department_norm = normalize_case(snap_cols["department"][j])
+                zone_norm = normalize_case(snap_zone_col[j])
                 vals = [
                     name_norm,
                     "удалено",
                     fmt_num(0, 3),
                     fmt_sign(diff_qty, 3),
-                    fmt_num(float(snap.get("coeff", 0)), 3),
+                    fmt_num(snap_cols["coeff"][j], 3),
                     fmt_num(0, 2),
                     fmt_sign(diff_price, 2),
                     fmt_num(0, 2),
@@ -1393,7 +1567,7 @@ def reload_zone_tabs(page: Any) -> None:
                     department_norm,
                     zone_norm,
                     cur_class,
-                    fmt_num(float(snap.get("power_watts", 0)), 0),
+                    fmt_num(snap_cols["power_watts"][j], 0),
                 ]
                 for c, v in enumerate(vals):
                     item = QtWidgets.QTableWidgetItem(str(v))
@@ -1448,26 +1622,13 @@ def reload_zone_tabs(page: Any) -> None:
                     except Exception:
                         item_id_key = None
                 key = (item_id_key,)
-                try:
-                    qty = float(r["qty"] or 0)
-                except Exception:
-                    qty = 0.0
-                try:
-                    coeff = float(r["coeff"] or 0)
-                except Exception:
-                    coeff = 0.0
-                try:
-                    amount = float(r["amount"] or 0)
-                except Exception:
-                    amount = 0.0
-                try:
-                    unit_price = float(r["unit_price"] or 0)
-                except Exception:
-                    unit_price = 0.0
-                try:
-                    power = float(r["power_watts"] or 0)
-                except Exception:
-                    power = 0.0
+                # Числовые поля приходят из list_items_filtered уже без NULL
+                # (COALESCE в SQL), поэтому используем их напрямую.
+                qty = r["qty"]
+                coeff = r["coeff"]
+                amount = r["amount"]
+                unit_price = r["unit_price"]
+                power = r["power_watts"]
                 if key not in agg:
                     # Инициализируем запись агрегата. Сохраняем group_name для отображения.
                     agg[key] = {
@@ -1513,7 +1674,7 @@ def reload_zone_tabs(page: Any) -> None:
                     gnorm = ""
                 # Чтобы пустые и служебные группы отображались после
                 # пользовательских, добавляем префикс '~' к пустым ключам.
-                if not gnorm or gnorm in ("", "аренда оборудования"):
+                if gnorm in _TRIVIAL_GROUPS:
                     gnorm_key = "~"  # тильда в ASCII следует после цифр/букв
                 else:
                     gnorm_key = gnorm
@@ -1647,7 +1808,7 @@ def reload_zone_tabs(page: Any) -> None:
                 except Exception:
                     prefix_norm = prefix_candidate or ""
                 # Если group_name не задан или равен "аренда оборудования", используем префикс.
-                if not gname_norm or gname_norm.lower() == "аренда оборудования":
+                if gname_norm.lower() in _TRIVIAL_GROUPS:
                     gname_stripped = prefix_norm
                 else:
                     gname_stripped = gname_norm
@@ -1656,7 +1817,7 @@ def reload_zone_tabs(page: Any) -> None:
                 except Exception:
                     gname_lower = ""
                 # Определяем цвет для группы: если группа непустая и не служебная, используем локальную карту
-                if gname_lower and gname_lower not in ("", "аренда оборудования"):
+                if gname_lower not in _TRIVIAL_GROUPS:
                     # Назначаем цвет из локальной карты, при необходимости выбираем следующий
                     col = local_group_colors.get(gname_lower)
                     if col is None:
@@ -1730,7 +1891,7 @@ def reload_zone_tabs(page: Any) -> None:
                     gval = "".join(tmp_chars2)
                 id_key2: str = ""
                 disp2: str = ""
-                if gval and normalize_case(gval).lower() != "аренда оборудования":
+                if gval and normalize_case(gval).lower() not in _TRIVIAL_GROUPS:
                     if "|" in gval:
                         parts2 = gval.split("|", 1)
                         id_part2 = parts2[0].strip()
@@ -1767,7 +1928,7 @@ def reload_zone_tabs(page: Any) -> None:
                     key_lower2 = id_key2.lower()
                 except Exception:
                     key_lower2 = id_key2 or ""
-                if key_lower2 and key_lower2 not in ("", "аренда оборудования"):
+                if key_lower2 not in _TRIVIAL_GROUPS:
                     col2 = local_group_colors.get(key_lower2)
                     if col2 is None:
                         col2 = GROUP_COLOR_PALETTE[next_color_index % len(GROUP_COLOR_PALETTE)]
@@ -1829,63 +1990,16 @@ def reload_zone_tabs(page: Any) -> None:
         # Зафиксируем ширину вертикального заголовка, чтобы предотвратить визуальные смещения
         _fix_vertical_header_width(table)
     # Сумма зависит не только от фильтров, но и от выбранной зоны.
-    # Определяем активную зону: индекс вкладки и соответствующий ключ.
+    # Определяем активную зону по тексту текущей вкладки.
     try:
-        cur_idx = page.zone_tabs.currentIndex() if hasattr(page, "zone_tabs") else -1
+        cur_zone_key = _current_zone_key(page)
     except Exception:
-        cur_idx = -1
+        cur_zone_key = None
     cur_sum = 0.0
-    if cur_idx >= 0:
-        # Получаем ключ зоны по порядку из zone_tables (порядок соответствует вкладкам)
+    if cur_zone_key is not None:
         try:
-            keys = list(page.zone_tables.keys())
-            if 0 <= cur_idx < len(keys):
-                cur_zone_key = keys[cur_idx]
-                # Получаем те же фильтры, что и в начале функции
-                vendor_f = page.cmb_f_vendor.currentText()
-                if vendor_f == "<Все подрядчики>":
-                    vendor_f = "<ALL>"
-                department_f = page.cmb_f_department.currentText()
-                if department_f == "<Все отделы>":
-                    department_f = "<ALL>"
-                class_ru_f = page.cmb_f_class.currentText()
-                class_en_f = CLASS_RU2EN.get(class_ru_f) if class_ru_f and class_ru_f != "<Все классы>" else "<ALL>"
-                # Запрашиваем позиции только для выбранной зоны и фильтров
-                rows_cur = page.db.list_items_filtered(
-                    project_id=page.project_id,
-                    vendor=vendor_f,
-                    department=department_f,
-                    zone=cur_zone_key,
-                    class_en=class_en_f,
-                    name_like=None,
-                )
-                # Если есть строка поиска, применяем её
-                search_raw_f = page.ed_search.text() if hasattr(page, "ed_search") else ""
-                if search_raw_f:
-                    filtered_cur = []
-                    for r in rows_cur:
-                        try:
-                            nm = r["name"] or ""
-                            ven = r["vendor"] or ""
-                            dep = r["department"] or ""
-                            zn = r["zone"] or ""
-                            if (
-                                contains_search(nm, search_raw_f)
-                                or contains_search(ven, search_raw_f)
-                                or contains_search(dep, search_raw_f)
-                                or contains_search(zn, search_raw_f)
-                            ):
-                                filtered_cur.append(r)
-                        except Exception:
-                            continue
-                    rows_cur = filtered_cur
-                # Суммируем amount
-                for r in rows_cur:
-                    try:
-                        amt = float(r["amount"] or 0.0)
-                        cur_sum += amt
-                    except Exception:
-                        continue
+            if cur_zone_key in page.zone_tables:
+                cur_sum = _zone_filtered_sum(page, cur_zone_key)
         except Exception:
             cur_sum = 0.0
     # Устанавливаем сумму выбранной зоны
@@ -1896,6 +2010,27 @@ def reload_zone_tabs(page: Any) -> None:
             page.recalc_finance()
     except Exception:
         pass
+    # Запоминаем сигнатуру; версия данных берётся заново, так как
+    # recalc_finance мог записать изменения в БД.
+    page._last_reload_sig = reload_sig[:-1] + (getattr(page.db, "_data_version", 0),)
+
+
+def _schedule_zone_reload(page: Any) -> None:
+    """Планирует перезагрузку таблиц зон на ближайшую итерацию цикла событий.
+
+    Повторные вызовы до срабатывания не ставят новую перезагрузку, поэтому
+    мастер, вызванный из другого мастера, перестраивает таблицы один раз.
+    """
+    if getattr(page, "_zone_reload_pending", False):
+        return
+    page._zone_reload_pending = True
+
+    def _run() -> None:
+        page._zone_reload_pending = False
+        with suppress(Exception):
+            page._reload_zone_tabs()
+
+    QtCore.QTimer.singleShot(0, page, _run)
 
 
 # 6. Создание новой зоны
@@ -1913,6 +2048,7 @@ def create_zone(page: Any) -> None:
 
     table = build_zone_table(page)
     page.zone_tables[name] = table
+    _zone_key_index(page).add(name.lower())
     page.zone_tabs.addTab(table, name)
     page.cmb_move_zone.addItem(name, name)
 
@@ -1993,8 +2129,8 @@ def rename_zone(page: Any) -> None:
         )
         return
     # Проверяем дубликат (с учётом регистра) среди уже созданных зон.
-    existing_lower = {str(k).lower() for k in page.zone_tables.keys()}
-    if new_zone.lower() in existing_lower:
+    new_zone_lower = new_zone.lower()
+    if new_zone_lower in _zone_key_index(page):
         QtWidgets.QMessageBox.information(
             page, "Информация", "Зона с таким названием уже существует."
         )
@@ -2025,20 +2161,25 @@ def rename_zone(page: Any) -> None:
     # Удаляем старый ключ и присваиваем новый каноничный ключ.
     page.zone_tables.pop(old_zone, None)
     page.zone_tables[new_zone] = table
+    zone_keys = _zone_key_index(page)
+    zone_keys.discard(old_zone.lower())
+    zone_keys.add(new_zone_lower)
     # Обновляем название вкладки: для пустой зоны отображаем "Без зоны",
     # иначе используем нормализованную форму для отображения.
-    new_label = "Без зоны" if new_zone == "" else normalize_case(new_name_norm)
+    # new_name_norm уже нормализован, повторный normalize_case не нужен
+    new_label = "Без зоны" if new_zone == "" else new_name_norm
+    if new_zone:
+        # Запоминаем отображаемую форму нового ключа для выпадающих списков
+        if getattr(page, "_zone_display", None) is None:
+            page._zone_display = {}
+        page._zone_display[new_zone] = new_label
     page.zone_tabs.setTabText(cur_index, new_label)
     # Обновляем выпадающий список зон для переноса
-    page.cmb_move_zone.blockSignals(True)
-    page.cmb_move_zone.clear()
-    page.cmb_move_zone.addItem("Без зоны", "")
-    for z_key in page.zone_tables.keys():
-        if z_key:
-            # Отображаем пользователю нормализованное название,
-            # но сохраняем канон как данные.
-            page.cmb_move_zone.addItem(normalize_case(z_key), z_key)
-    page.cmb_move_zone.blockSignals(False)
+    # Отображаем пользователю нормализованное название, но сохраняем канон как данные.
+    move_items: List[Tuple[str, Any]] = [("Без зоны", "")]
+    move_items.extend((_zone_display(page, z_key), z_key) for z_key in page.zone_tables.keys() if z_key)
+    with QtCore.QSignalBlocker(page.cmb_move_zone):
+        fill_combo_batch(page.cmb_move_zone, move_items)
     # Обновляем комбобокс для ручного добавления
     # Получаем зоны из БД (не учитывая пустую строку)
     zones_db: List[str] = []
@@ -2054,9 +2195,10 @@ def rename_zone(page: Any) -> None:
         persisted = []
     # Обновляем список: удаляем старую зону и добавляем новую
     updated_persisted: List[str] = []
+    old_zone_lower = old_zone.lower()
     for z in persisted:
         zn = z.strip()
-        if not _is_no_zone(zn) and zn.strip().lower() != old_zone.lower():
+        if not _is_no_zone(zn) and zn.lower() != old_zone_lower:
             updated_persisted.append(z)
     if new_zone:
         updated_persisted.append(new_zone)
@@ -2068,25 +2210,19 @@ def rename_zone(page: Any) -> None:
         )
     # Формируем список для заполнения комбобокса ручного добавления
     combined_zones: List[str] = []
+    seen_zones: Set[str] = set()
     # Добавляем зоны из БД и из persist (без пустой строки) с учётом регистра
-    for z in zones_db:
-        c = _canon_zone(z)
-        if c:
-            disp = normalize_case(c)
-            if disp not in combined_zones:
-                combined_zones.append(disp)
-    for z in updated_persisted:
+    for z in (*zones_db, *updated_persisted):
         c = _canon_zone(z)
         if c:
             disp = normalize_case(c)
-            if disp not in combined_zones:
+            if disp not in seen_zones:
+                seen_zones.add(disp)
                 combined_zones.append(disp)
     fill_manual_zone_combo(page, combined_zones)
     # Логируем переименование
-    try:
+    with suppress(Exception):
         page._log(f"Зона «{old_label}» переименована в «{new_label}»")
-    except Exception:
-        pass
     logging.getLogger(__name__).info(
         "Зона '%s' переименована в '%s'",
         old_label or "<Без зоны>", new_label,
@@ -2128,25 +2264,12 @@ def delete_zone(page: Any) -> None:
     if reply != QtWidgets.QMessageBox.Yes:
         return
     # Удаляем позиции из базы
+    deleted_count = 0
     try:
-        ids: List[int] = []
         if page.project_id is not None:
-            # Используем канонический ключ зоны для выборки элементов.
-            cur = page.db._conn.cursor()
-            if not zone_key:
-                # Для пустой зоны выбираем NULL или ''.
-                cur.execute(
-                    "SELECT id FROM items WHERE project_id=? AND COALESCE(zone,'')=''",
-                    (page.project_id,),
-                )
-            else:
-                cur.execute(
-                    "SELECT id FROM items WHERE project_id=? AND COALESCE(zone,'')=?",
-                    (page.project_id, zone_key),
-                )
-            ids = [int(r[0]) for r in cur.fetchall()]
-        if ids:
-            page.db.delete_items(ids)
+            # Удаляем по каноническому ключу зоны одним запросом.
+            # Для пустой зоны zone_key == '' и удаляются позиции с NULL и ''.
+            deleted_count = page.db.delete_items_by_zone(page.project_id, zone_key)
     except Exception as ex:
         logging.getLogger(__name__).error(
             "Ошибка удаления зоны '%s': %s", zone_label, ex, exc_info=True
@@ -2165,22 +2288,24 @@ def delete_zone(page: Any) -> None:
         logging.getLogger(__name__).error(
             "Не удалось обновить файл зон при удалении", exc_info=True
         )
+    # Убираем вкладку удалённой зоны и её ключ из индекса зон
+    table = page.zone_tables.pop(zone_key, None)
+    if table is not None:
+        page.zone_tabs.removeTab(cur_index)
+        table.deleteLater()
+        _zone_key_index(page).discard(zone_key.lower())
     # Перестраиваем вкладки
-    try:
+    with suppress(Exception):
         page._reload_zone_tabs()
-    except Exception:
-        pass
     # Лог
-    try:
+    with suppress(Exception):
         page._log(
             f"Смета: удалена зона «{zone_label or 'Без зоны'}» "
-            f"(удалено позиций: {len(ids) if 'ids' in locals() else 0})."
+            f"(удалено позиций: {deleted_count})."
         )
-    except Exception:
-        pass
     logging.getLogger(__name__).info(
         "Удалена зона '%s' (canon=%s), удалено позиций: %d",
-        zone_label or "<Без зоны>", zone_key or "<без зоны>", len(ids) if 'ids' in locals() else 0
+        zone_label or "<Без зоны>", zone_key or "<без зоны>", deleted_count
     )
 # 7. Перенос выделенных строк в другую зону
 def move_selected_to_zone(page: Any) -> None:
@@ -2202,6 +2327,7 @@ def move_selected_to_zone(page: Any) -> None:
     if target and target not in page.zone_tables:
         table = build_zone_table(page)
         page.zone_tables[target] = table
+        _zone_key_index(page).add(target.lower())
         page.zone_tabs.addTab(table, target)
         page.cmb_move_zone.addItem(target, target)
         zones = page.db.project_distinct_values(page.project_id, "zone") if page.project_id else []
@@ -2234,16 +2360,20 @@ def move_selected_to_zone(page: Any) -> None:
     if not moves:
         return
 
-    undo_batch = f"__undo_move__{datetime.utcnow().isoformat()}"
+    undo_batch = f"__undo_move__{uuid.uuid4().hex}"
     originals: List[Tuple[int, float, float]] = []  # (item_id, old_qty, old_amount)
 
-    created = 0
-    updated = 0
+    # Собираем изменения и применяем их одной транзакцией
+    full_ids: List[int] = []
+    partial_updates: List[Tuple[float, float, int]] = []  # (qty, amount, item_id)
+    new_rows: List[Dict[str, Any]] = []
 
+    # Читаем все переносимые строки одним запросом
+    rows_by_id = page.db.get_items_by_ids(i for i, q in moves.items() if q > 0)
     for item_id, move_qty in moves.items():
         if move_qty <= 0:
             continue
-        row = page.db.get_item_by_id(item_id)
+        row = rows_by_id.get(int(item_id))
         if not row:
             continue
 
@@ -2252,18 +2382,16 @@ def move_selected_to_zone(page: Any) -> None:
         coeff = float(row["coeff"] or 1.0)
 
         if move_qty >= qty_old - 1e-9:
-            page.db.update_item_fields(item_id, {"zone": target})
-            updated += 1
+            full_ids.append(item_id)
         else:
             qty_left = qty_old - move_qty
             amount_left = unit_price * qty_left * coeff
 
             originals.append((item_id, qty_old, float(row["amount"] or 0)))
-
-            page.db.update_item_fields(item_id, {"qty": qty_left, "amount": amount_left})
+            partial_updates.append((qty_left, amount_left, item_id))
 
             amount_new = unit_price * move_qty * coeff
-            page.db.add_items_bulk([
+            new_rows.append(
                 {
                     "project_id": row["project_id"],
                     "type": row["type"],
@@ -2280,8 +2408,15 @@ def move_selected_to_zone(page: Any) -> None:
                     "power_watts": row["power_watts"] or 0,
                     "import_batch": undo_batch,
                 }
-            ])
-            created += 1
+            )
+
+    try:
+        page.db.move_items_to_zone(target, full_ids, partial_updates, new_rows)
+    except Exception as ex:
+        page._log(f"Ошибка переноса позиций в зону «{target or 'Без зоны'}»: {ex}", "error")
+        return
+    updated = len(full_ids)
+    created = len(new_rows)
 
     # Сохраняем информацию для UNDO
     page._last_action = {
@@ -2341,31 +2476,22 @@ def add_manual_item(page: Any) -> None:
     if power_w <= 0:
         power_w = page.db.catalog_max_power_by_name(name) or 0
 
-    undo_batch = f"__undo_manual_add__{datetime.utcnow().isoformat()}"
+    undo_batch = f"__undo_manual_add__{uuid.uuid4().hex}"
 
-    # Проверяем наличие дубликата среди существующих позиций.
+    # Проверяем наличие дубликата среди существующих позиций одним запросом.
     duplicate_manual = None
     try:
-        existing_rows = page.db.list_items_filtered(
+        duplicate_manual = page.db.find_duplicate_item(
             project_id=page.project_id,
-            vendor="<ALL>",
-            department="<ALL>",
             zone=zone,
             class_en=class_en,
-            name_like=name
+            name=name,
+            vendor=vendor,
+            department=department,
+            unit_price=price,
+            coeff=coeff,
+            normalize_fn=_norm_cached,
         )
-        for r in existing_rows:
-            try:
-                if normalize_case(r["name"] or "") == name \
-                   and normalize_case(r["vendor"] or "") == vendor \
-                   and normalize_case(r["department"] or "") == department \
-                   and (r["type"] or "equipment") == class_en \
-                   and abs(float(r["unit_price"] or 0) - price) < 1e-6 \
-                   and abs(float(r["coeff"] or 0) - coeff) < 1e-6:
-                    duplicate_manual = r
-                    break
-            except Exception:
-                continue
     except Exception as ex:
         page._log(f"Ошибка поиска дубликатов при ручном добавлении: {ex}", "error")
 
@@ -2472,6 +2598,51 @@ def add_manual_item(page: Any) -> None:
 
 
 # 9. Изменение ячейки (qty/coeff/price)
+def _schedule_summary_recompute(page: Any, delay_ms: int = 80) -> None:
+    """Планирует отложенный пересчёт итога зоны и бухгалтерии.
+
+    Используется однократный ``QTimer``: повторный вызов до срабатывания
+    перезапускает таймер, поэтому серия быстрых правок даёт один пересчёт.
+    """
+    timer = getattr(page, "_recompute_timer", None)
+    if timer is None:
+        timer = QtCore.QTimer(page)
+        timer.setSingleShot(True)
+        timer.timeout.connect(lambda: _run_summary_recompute(page))
+        page._recompute_timer = timer
+    timer.setInterval(delay_ms)
+    timer.start()
+
+
+def _run_summary_recompute(page: Any) -> None:
+    """Обновляет итог активной зоны и пересчитывает бухгалтерию.
+
+    Итог берётся из ``page._zone_sum_cache``, если он там есть, иначе
+    считается запросом с текущими фильтрами.
+    """
+    if page.project_id is None:
+        return
+    cur_sum = 0.0
+    try:
+        cur_zone_key = _current_zone_key(page)
+        if cur_zone_key is not None and cur_zone_key in page.zone_tables:
+            sum_cache = getattr(page, "_zone_sum_cache", None) or {}
+            if cur_zone_key in sum_cache:
+                cur_sum = sum_cache[cur_zone_key]
+            else:
+                # Фильтры идентичны применяемым в reload_zone_tabs
+                cur_sum = _zone_filtered_sum(page, cur_zone_key)
+    except Exception:
+        cur_sum = 0.0
+    page.label_total.setText(f"Итого: {fmt_num(cur_sum, 2)}")
+    # Обновляем бухгалтерию при изменении позиций
+    try:
+        if hasattr(page, "recalc_finance"):
+            page.recalc_finance()
+    except Exception:
+        pass
+
+
 def on_summary_item_changed(page: Any, item: QtWidgets.QTableWidgetItem) -> None:
     """Обрабатывает изменение количества, коэффициента или цены в таблице зоны."""
     table = item.tableWidget()
@@ -2484,9 +2655,10 @@ def on_summary_item_changed(page: Any, item: QtWidgets.QTableWidgetItem) -> None
     item_id = int(name_item.data(QtCore.Qt.UserRole))
 
     try:
-        qty = to_float(table.item(row, 1).text(), 0.0)
-        coeff = to_float(table.item(row, 2).text(), 0.0)
-        price = to_float(table.item(row, 3).text(), 0.0)
+        cell = table.item
+        qty = to_float(cell(row, 1).text(), 0.0)
+        coeff = to_float(cell(row, 2).text(), 0.0)
+        price = to_float(cell(row, 3).text(), 0.0)
         amount = price * qty * coeff
     except Exception:
         return
@@ -2507,69 +2679,29 @@ def on_summary_item_changed(page: Any, item: QtWidgets.QTableWidgetItem) -> None
 
     try:
         page.db.update_item_fields(item_id, fields)
-        table.blockSignals(True)
-        table.item(row, 4).setText(fmt_num(amount, 2))
-        table.blockSignals(False)
-
-        # После изменения строки пересчитываем сумму только для активной зоны с учётом текущих фильтров
-        try:
-            cur_idx = page.zone_tabs.currentIndex() if hasattr(page, "zone_tabs") else -1
-        except Exception:
-            cur_idx = -1
-        cur_sum = 0.0
-        if cur_idx >= 0:
-            try:
-                keys = list(page.zone_tables.keys())
-                if 0 <= cur_idx < len(keys):
-                    cur_zone_key = keys[cur_idx]
-                    # Фильтры идентичны применяемым в reload_zone_tabs
-                    vendor_f = page.cmb_f_vendor.currentText()
-                    if vendor_f == "<Все подрядчики>": vendor_f = "<ALL>"
-                    department_f = page.cmb_f_department.currentText()
-                    if department_f == "<Все отделы>": department_f = "<ALL>"
-                    class_ru_f = page.cmb_f_class.currentText()
-                    class_en_f = CLASS_RU2EN.get(class_ru_f) if class_ru_f and class_ru_f != "<Все классы>" else "<ALL>"
-                    rows_cur = page.db.list_items_filtered(
-                        project_id=page.project_id,
-                        vendor=vendor_f,
-                        department=department_f,
-                        zone=cur_zone_key,
-                        class_en=class_en_f,
-                        name_like=None,
-                    )
-                    search_raw_f = page.ed_search.text() if hasattr(page, "ed_search") else ""
-                    if search_raw_f:
-                        tmp = []
-                        for r in rows_cur:
-                            try:
-                                nm = r["name"] or ""
-                                ven = r["vendor"] or ""
-                                dep = r["department"] or ""
-                                zn = r["zone"] or ""
-                                if (
-                                    contains_search(nm, search_raw_f)
-                                    or contains_search(ven, search_raw_f)
-                                    or contains_search(dep, search_raw_f)
-                                    or contains_search(zn, search_raw_f)
-                                ):
-                                    tmp.append(r)
-                            except Exception:
-                                continue
-                        rows_cur = tmp
-                    for r in rows_cur:
-                        try:
-                            cur_sum += float(r["amount"] or 0.0)
-                        except Exception:
-                            continue
-            except Exception:
-                cur_sum = 0.0
-        page.label_total.setText(f"Итого: {fmt_num(cur_sum, 2)}")
-        # Обновляем бухгалтерию при изменении позиции
-        try:
-            if hasattr(page, "recalc_finance"):
-                page.recalc_finance()
-        except Exception:
-            pass
+        with QtCore.QSignalBlocker(table):
+            cell(row, 4).setText(fmt_num(amount, 2))
+
+        # Итог активной зоны: если правка в ней и сумма закэширована, сразу
+        # сдвигаем итог на разницу. Иначе кэш сбрасывается, и сумма будет
+        # пересчитана отложенно вместе с бухгалтерией.
+        with suppress(Exception):
+            cur_zone_key = _current_zone_key(page)
+            if cur_zone_key is not None:
+                sum_cache = getattr(page, "_zone_sum_cache", None) or {}
+                if (
+                    page.zone_tables.get(cur_zone_key) is table
+                    and cur_zone_key in sum_cache
+                    and "amount" in old_fields
+                ):
+                    cur_sum = sum_cache[cur_zone_key] + (amount - old_fields["amount"])
+                    sum_cache[cur_zone_key] = cur_sum
+                    page.label_total.setText(f"Итого: {fmt_num(cur_sum, 2)}")
+                else:
+                    sum_cache.pop(cur_zone_key, None)
+        # Пересчёт итога и бухгалтерии откладываем: серия правок (например,
+        # вставка нескольких ячеек) приводит к одному пересчёту.
+        _schedule_summary_recompute(page)
 
         page._last_action = {
             "type": "edit",
@@ -2618,36 +2750,41 @@ def delete_selected(page: Any) -> None:
     ) != QtWidgets.QMessageBox.Yes:
         return
 
-    snapshot: List[Dict[str, Any]] = []
+    # Снимок для UNDO: кортежи значений в порядке _DELETE_UNDO_COLUMNS, готовые
+    # для executemany при восстановлении. Строки читаем одним запросом (пакетами).
+    snapshot: List[Tuple[Any, ...]] = []
+    rows_by_id = page.db.get_items_by_ids(ids)
     for _id in ids:
-        row = page.db.get_item_by_id(int(_id))
+        row = rows_by_id.get(_id)
         if row:
             # sqlite3.Row не поддерживает метод get(); используем доступ по ключу и проверяем наличие
-            created_at = row["created_at"] if "created_at" in row.keys() else None
-            import_batch = row["import_batch"] if "import_batch" in row.keys() else None
-            snapshot.append({
-                "project_id": row["project_id"],
-                "type": row["type"],
-                "group_name": row["group_name"],
-                "name": row["name"],
-                "qty": float(row["qty"] or 0),
-                "coeff": float(row["coeff"] or 1),
-                "amount": float(row["amount"] or 0),
-                "unit_price": float(row["unit_price"] or 0),
-                "source_file": row["source_file"],
-                "created_at": created_at,
-                "vendor": row["vendor"] or "",
-                "department": row["department"] or "",
-                "zone": row["zone"] or "",
-                "power_watts": float(row["power_watts"] or 0),
-                "import_batch": import_batch,
-            })
+            keys = row.keys()
+            created_at = row["created_at"] if "created_at" in keys else None
+            import_batch = row["import_batch"] if "import_batch" in keys else None
+            snapshot.append((
+                row["project_id"],
+                row["type"],
+                row["group_name"],
+                row["name"],
+                float(row["qty"] or 0),
+                float(row["coeff"] or 1),
+                float(row["amount"] or 0),
+                float(row["unit_price"] or 0),
+                row["source_file"],
+                created_at,
+                row["vendor"] or "",
+                row["department"] or "",
+                row["zone"] or "",
+                float(row["power_watts"] or 0),
+                import_batch,
+            ))
 
     try:
         page.db.delete_items(ids)
         page._last_action = {
             "type": "delete",
             "project_id": page.project_id,
+            "columns": _DELETE_UNDO_COLUMNS,
             "rows": snapshot,
         }
         page.btn_undo_summary.setEnabled(True)
@@ -2677,15 +2814,17 @@ def undo_last_summary(page: Any) -> None:
         elif act.get("type") == "delete":
             rows = act.get("rows", [])
             if rows:
-                page.db.add_items_bulk(rows)
+                # Кортежи вставляются как есть, без перекладывания через словари
+                page.db.add_items_bulk_tuples(act.get("columns", _DELETE_UNDO_COLUMNS), rows)
                 page._log(f"Отменено удаление: восстановлено {len(rows)} записей.")
 
         elif act.get("type") == "move":
-            batch = act.get("batch")
-            if batch:
-                page.db.delete_items_by_import_batch(act["project_id"], batch)
-            for item_id, qty, amount in act.get("original", []):
-                page.db.update_item_fields(item_id, {"qty": qty, "amount": amount})
+            # Удаление перенесённых строк и возврат остатков — одна транзакция
+            page.db.revert_zone_move(
+                act["project_id"],
+                act.get("batch"),
+                [(qty, amount, item_id) for item_id, qty, amount in act.get("original", [])],
+            )
             page._log("Отменён перенос по зонам.")
 
         elif act.get("type") == "edit":
@@ -2730,29 +2869,14 @@ def take_snapshot(page: Any) -> None:
         "project_id": page.project_id,
         "name": "",
         "zones": list(zones),
-        "items": {},  # item_id -> dict(row data)
+        # Все позиции проекта без фильтрации: колонки полей и индекс
+        # id -> номер строки (см. common, раздел 8)
+        "items": snapshot_columns_from_rows(page.db.list_items(page.project_id)),
     }
-    # Берём все позиции проекта без фильтрации
-    all_rows = page.db.list_items(page.project_id)
-    for row in all_rows:
-        page._snapshot_data["items"][row["id"]] = {
-            "id": row["id"],
-            "name": row["name"],
-            "qty": float(row["qty"] or 0),
-            "coeff": float(row["coeff"] or 0),
-            "unit_price": float(row["unit_price"] or 0),
-            "amount": float(row["amount"] or 0),
-            "vendor": row["vendor"] or "",
-            "department": row["department"] or "",
-            "zone": row["zone"] or "",
-            "class": row["type"] or "equipment",
-            "power_watts": float(row["power_watts"] or 0),
-        }
     # Сбрасываем состояние сравнения
     page._snapshot_compare_enabled = False
-    page.chk_snapshot_compare.blockSignals(True)
-    page.chk_snapshot_compare.setChecked(False)
-    page.chk_snapshot_compare.blockSignals(False)
+    with QtCore.QSignalBlocker(page.chk_snapshot_compare):
+        page.chk_snapshot_compare.setChecked(False)
     # Вычисляем снимок финансового отчёта и сохраняем его в структуру снимка
     try:
         fin_snap = compute_fin_snapshot_data(page)
@@ -2775,25 +2899,23 @@ def toggle_snapshot_compare(page: Any) -> None:
     has_snap = hasattr(page, "_snapshot_data") and bool(getattr(page, "_snapshot_data", None))
     if not has_snap:
         QtWidgets.QMessageBox.information(page, "Нет снимка", "Снимок для сравнения не создан.")
-        page.chk_snapshot_compare.blockSignals(True)
-        page.chk_snapshot_compare.setChecked(False)
-        page.chk_snapshot_compare.blockSignals(False)
+        with QtCore.QSignalBlocker(page.chk_snapshot_compare):
+            page.chk_snapshot_compare.setChecked(False)
         return
     if page.chk_snapshot_compare.isChecked():
-        # Сравниваем набор зон
-        snap_zones = set(page._snapshot_data.get("zones", []))
-        cur_zones = set(page.db.project_distinct_values(page.project_id, "zone") or [])
-        snap_zones = {z or "" for z in snap_zones}
-        cur_zones = {z or "" for z in cur_zones}
+        # Сравниваем набор зон (None и пустая строка считаются одной зоной)
+        snap_zones = frozenset(z or "" for z in page._snapshot_data.get("zones", []))
+        cur_zones = frozenset(
+            z or "" for z in page.db.project_distinct_values(page.project_id, "zone") or []
+        )
         if snap_zones != cur_zones:
             QtWidgets.QMessageBox.warning(
                 page,
                 "Несовместимые зоны",
                 "Режим сравнения для этого снимка недоступен, так как была другая компоновка зон."
             )
-            page.chk_snapshot_compare.blockSignals(True)
-            page.chk_snapshot_compare.setChecked(False)
-            page.chk_snapshot_compare.blockSignals(False)
+            with QtCore.QSignalBlocker(page.chk_snapshot_compare):
+                page.chk_snapshot_compare.setChecked(False)
             page._snapshot_compare_enabled = False
             return
         page._snapshot_compare_enabled = True
@@ -2814,19 +2936,26 @@ def snapshots_dir_for_project(page: Any) -> Path:
     привязку снимков к конкретному проекту и сохранение их вместе
     с другими ресурсами проекта (картинки, логотипы).
 
+    Путь запоминается в ``page._snap_dir_cache`` вместе с идентификатором
+    проекта, поэтому ``mkdir`` выполняется один раз на проект, а не при
+    каждом обновлении списка снимков.
+
     :param page: текущая страница ProjectPage
     :return: путь к каталогу снимков для проекта
     """
+    proj_id = getattr(page, "project_id", None)
+    cached = getattr(page, "_snap_dir_cache", None)
+    if cached is not None and cached[0] == proj_id:
+        return cached[1]
     from .common import ASSETS_DIR  # импорт здесь, чтобы избежать циклов при импорте
     # Если идентификатор проекта отсутствует, используем общий каталог в DATA_DIR/snapshots
-    if not getattr(page, "project_id", None):
+    if not proj_id:
         root = DATA_DIR / "snapshots"
-        root.mkdir(parents=True, exist_ok=True)
-        return root
-    proj_id = page.project_id
-    # Каталог вида assets/project_<id>/snapshots
-    root = ASSETS_DIR / f"project_{proj_id}" / "snapshots"
+    else:
+        # Каталог вида assets/project_<id>/snapshots
+        root = ASSETS_DIR / f"project_{proj_id}" / "snapshots"
     root.mkdir(parents=True, exist_ok=True)
+    page._snap_dir_cache = (proj_id, root)
     return root
 
 
@@ -2857,24 +2986,25 @@ def save_snapshot(page: Any) -> None:
         "project_id": snap.get("project_id", page.project_id),
         "name": name,
         "zones": snap.get("zones", []),
-        "items": snap.get("items", {}),
+        # Позиции записываются колонками (списки значений полей)
+        "items": snapshot_columns_to_json(snap.get("items") or {}),
         # Добавляем снимок финансового отчёта, если он присутствует в временной структуре
         "fin_snapshot": snap.get("fin_snapshot", {})
     }
     # Обновляем имя во временном снимке, чтобы последующее сравнение
     # использовало читаемое имя в логах и отладке.
-    try:
+    with suppress(Exception):
         page._snapshot_data["name"] = name
-    except Exception:
-        pass
-    # Формируем путь к файлу: project_<id>_<timestamp>.json
-    timestamp = datetime.utcnow().strftime("%Y%m%d%H%M%S")
-    filename = f"project_{page.project_id}_{timestamp}.json"
+    # Формируем путь к файлу: project_<id>_<timestamp>__<имя>.json — имя
+    # встраивается в файл, чтобы список снимков строился без чтения JSON
+    timestamp = datetime.now(timezone.utc).strftime("%Y%m%d%H%M%S")
+    filename = snapshot_filename(page.project_id, timestamp, name)
     path = snapshots_dir_for_project(page) / filename
     try:
-        # Сохраняем данные в файл JSON
-        with open(path, "w", encoding="utf-8") as f:
-            json.dump(snap_data, f, ensure_ascii=False, indent=2)
+        # Каталог мог быть удалён после кэширования пути — создаём при записи
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Сохраняем данные в файл JSON (большие снимки — со сжатием .zst)
+        path = write_snapshot_file(path, snap_data)
         # Информируем пользователя через лог
         page._log(f"Снимок «{name}» сохранён.")
         # После сохранения обновляем список снимков для проекта
@@ -2883,17 +3013,15 @@ def save_snapshot(page: Any) -> None:
         try:
             cmb = getattr(page, "cmb_snapshot", None)
             if cmb is not None:
-                # Ищем индекс элемента, чей userData совпадает с путём сохранённого файла
-                for i in range(cmb.count()):
-                    if str(cmb.itemData(i)) == str(path):
-                        # Устанавливаем индекс комбобокса на новый снимок
-                        cmb.setCurrentIndex(i)
-                        # Явно вызываем обработчик выбора снимка, чтобы загрузить данные
-                        try:
-                            on_snapshot_selected(page)
-                        except Exception:
-                            pass
-                        break
+                # Ищем элемент, чей userData совпадает с путём сохранённого файла
+                # (поиск выполняет модель Qt за один вызов)
+                i = cmb.findData(str(path))
+                if i >= 0:
+                    # Устанавливаем индекс комбобокса на новый снимок
+                    cmb.setCurrentIndex(i)
+                    # Явно вызываем обработчик выбора снимка, чтобы загрузить данные
+                    with suppress(Exception):
+                        on_snapshot_selected(page)
         except Exception:
             # Игнорируем ошибки выбора
             pass
@@ -2902,6 +3030,34 @@ def save_snapshot(page: Any) -> None:
         QtWidgets.QMessageBox.critical(page, "Ошибка", f"Не удалось сохранить снимок: {ex}")
 
 
+def _sync_snapshot_combo(cmb: QtWidgets.QComboBox, entries: List[Tuple[str, str]]) -> None:
+    """Приводит ``cmb_snapshot`` к списку ``entries`` (имя, путь) изменениями.
+
+    Первым элементом всегда идёт «<Выберите снимок>». Если существующие
+    элементы идут в том же порядке, что и в ``entries``, удаляются только
+    исчезнувшие снимки и вставляются новые — остальные элементы модели не
+    трогаются. Иначе список перестраивается целиком.
+    """
+    wanted = {path for _, path in entries}
+    current = [cmb.itemData(i) for i in range(cmb.count())]
+    kept = [d for d in current[1:] if d in wanted]
+    present = set(current[1:])
+    if not current or current[0] is not None or kept != [p for _, p in entries if p in present]:
+        fill_combo_batch(cmb, [("<Выберите снимок>", None), *entries])
+        return
+    # Удаляем исчезнувшие снимки (с конца, чтобы индексы не смещались)
+    for i in range(len(current) - 1, 0, -1):
+        if current[i] not in wanted:
+            cmb.removeItem(i)
+    # Вставляем новые снимки на их позиции, обновляем изменившиеся имена
+    for pos, (name, path) in enumerate(entries, start=1):
+        if pos < cmb.count() and cmb.itemData(pos) == path:
+            if cmb.itemText(pos) != name:
+                cmb.setItemText(pos, name)
+        else:
+            cmb.insertItem(pos, name, path)
+
+
 def load_snapshot_list(page: Any) -> None:
     """
     Загружает список снимков для текущего проекта и заполняет выпадающий
@@ -2911,21 +3067,23 @@ def load_snapshot_list(page: Any) -> None:
     # Если проект ещё не создан или комбобокса нет — ничего не делаем
     if page.project_id is None or not hasattr(page, "cmb_snapshot"):
         return
-    # Очищаем список
-    page.cmb_snapshot.blockSignals(True)
-    page.cmb_snapshot.clear()
-    # Добавляем элемент по умолчанию
-    page.cmb_snapshot.addItem("<Выберите снимок>", None)
     snap_dir = snapshots_dir_for_project(page)
     entries = []
-    # Находим все файлы этого проекта по маске project_<id>_*.json
-    pattern = f"project_{page.project_id}_*.json"
-    for f in snap_dir.glob(pattern):
+    # Находим все файлы этого проекта вида project_<id>_*.json[.zst]: простая
+    # проверка префикса и расширения вместо сопоставления glob-шаблона
+    prefix = f"project_{page.project_id}_"
+    try:
+        snap_files = list(snap_dir.iterdir())
+    except FileNotFoundError:
+        # Каталог удалён извне: снимков нет, при сохранении он будет создан заново
+        snap_files = []
+    for f in snap_files:
+        if not (f.name.startswith(prefix) and f.name.endswith(SNAPSHOT_SUFFIXES)):
+            continue
         try:
-            with open(f, "r", encoding="utf-8") as fh:
-                data = json.load(fh)
+            # Имя берётся из имени файла; старые файлы читаются один раз (кэш)
+            name = snapshot_display_name(f)
             # Сохраняем кортеж: отображаемое имя, путь
-            name = data.get("name") or f.stem
             entries.append((name, f))
         except Exception as ex:
             # Логируем ошибку чтения конкретного файла, но не прерываем сбор списка
@@ -2933,9 +3091,8 @@ def load_snapshot_list(page: Any) -> None:
             continue
     # Сортируем снимки по имени (можно изменить при необходимости)
     entries.sort(key=lambda t: t[0].lower())
-    for name, path in entries:
-        page.cmb_snapshot.addItem(name, str(path))
-    page.cmb_snapshot.blockSignals(False)
+    with QtCore.QSignalBlocker(page.cmb_snapshot):
+        _sync_snapshot_combo(page.cmb_snapshot, [(name, str(path)) for name, path in entries])
     # Сбрасываем текущий выбор
     page.cmb_snapshot.setCurrentIndex(0)
     # Информируем пользователя в логах, что список снимков обновлён
@@ -2957,9 +3114,8 @@ def on_snapshot_selected(page: Any) -> None:
         if hasattr(page, "_snapshot_data"):
             delattr(page, "_snapshot_data")
         page._snapshot_compare_enabled = False
-        page.chk_snapshot_compare.blockSignals(True)
-        page.chk_snapshot_compare.setChecked(False)
-        page.chk_snapshot_compare.blockSignals(False)
+        with QtCore.QSignalBlocker(page.chk_snapshot_compare):
+            page.chk_snapshot_compare.setChecked(False)
         reload_zone_tabs(page)
         # Логируем, что снимок не выбран
         page._log("Снимок не выбран, режим сравнения отключён.")
@@ -2967,30 +3123,19 @@ def on_snapshot_selected(page: Any) -> None:
     # Загружаем файл
     try:
         path = Path(data)
-        with open(path, "r", encoding="utf-8") as f:
-            snap_data = json.load(f)
+        snap_data = read_snapshot_file(path)
         # Проверяем, что снимок принадлежит текущему проекту
         if snap_data.get("project_id") != page.project_id:
             QtWidgets.QMessageBox.warning(page, "Несовместимый снимок", "Этот снимок относится к другому проекту.")
             return
-        # Приводим ключи словаря items к целочисленному типу, так как после
-        # загрузки из JSON ключи становятся строками. Без этого сравнение
-        # по идентификаторам элементов будет некорректно.
-        items_dict = snap_data.get("items", {}) or {}
-        converted: Dict[int, Any] = {}
-        for k, v in items_dict.items():
-            try:
-                converted[int(k)] = v
-            except Exception:
-                # Если ключ не преобразуется в int, пропускаем его
-                continue
-        snap_data["items"] = converted
+        # Восстанавливаем колонки позиций. Файлы старого формата
+        # (словарь по строковым id) преобразуются в колонки здесь же.
+        snap_data["items"] = snapshot_columns(snap_data.get("items"))
         # Устанавливаем данные и отключаем режим сравнения
         page._snapshot_data = snap_data
         page._snapshot_compare_enabled = False
-        page.chk_snapshot_compare.blockSignals(True)
-        page.chk_snapshot_compare.setChecked(False)
-        page.chk_snapshot_compare.blockSignals(False)
+        with QtCore.QSignalBlocker(page.chk_snapshot_compare):
+            page.chk_snapshot_compare.setChecked(False)
         # Записываем в лог имя снимка
         page._log(f"Снимок «{snap_data.get('name', '')}» загружен.")
         reload_zone_tabs(page)
@@ -3034,12 +3179,14 @@ def toggle_db_mode(page: Any) -> None:
     # Соединение сигналов выполняется один раз при построении вкладки.
     if state:
         load_catalog_filters(page)
-        update_catalog_suggestions(page)
+        # При включении режима подсказки нужны сразу, без задержки
+        page._catalog_suggest_key = None
+        _update_catalog_suggestions_impl(page)
     else:
         # При выходе из режима базы очищаем подсказки и восстанавливаем поля
-        page.cmb_search_name.blockSignals(True)
-        page.cmb_search_name.clear()
-        page.cmb_search_name.blockSignals(False)
+        with QtCore.QSignalBlocker(page.cmb_search_name):
+            page.cmb_search_name.clear()
+        page._catalog_suggest_key = None
         # Восстанавливаем возможность ввода цены, класса и потребления
         page.sp_add_price.setReadOnly(False)
         page.cmb_add_class.setEnabled(True)
@@ -3089,14 +3236,33 @@ def load_catalog_filters(page: Any) -> None:
 
 
 # 16. Обновление списка подсказок каталога
-def update_catalog_suggestions(page: Any) -> None:
+def update_catalog_suggestions(page: Any, delay_ms: int = 150) -> None:
+    """Планирует обновление подсказок каталога с задержкой ``delay_ms``.
+
+    Вызывается на каждое нажатие клавиши и смену фильтров; однократный
+    ``QTimer`` перезапускается при каждом вызове, поэтому при быстром вводе
+    запрос к каталогу и перестроение списка выполняются один раз — после
+    паузы. Само обновление выполняет ``_update_catalog_suggestions_impl``.
+    """
+    timer = getattr(page, "_suggest_timer", None)
+    if timer is None:
+        timer = QtCore.QTimer(page)
+        timer.setSingleShot(True)
+        timer.timeout.connect(lambda: _update_catalog_suggestions_impl(page))
+        page._suggest_timer = timer
+    timer.setInterval(delay_ms)
+    timer.start()
+
+
+def _update_catalog_suggestions_impl(page: Any) -> None:
     """Обновляет выпадающий список ``cmb_search_name`` в зависимости от текста
     поиска и выбранных фильтров подрядчика и отдела.
 
     Отображаемый текст включает наименование и текущую цену, чтобы
     пользователь видел ориентировочную стоимость. Для каждого элемента
     записываются данные каталога в ``itemData``, чтобы затем можно было
-    быстро заполнить поля при выборе.
+    быстро заполнить поля при выборе. Если текст и фильтры не изменились
+    с прошлого обновления, список не перестраивается.
     """
     # Если режим базы данных не активен или нужные виджеты отсутствуют, не обновляем подсказки.
     if not getattr(page, "_db_mode_enabled", False):
@@ -3105,10 +3271,8 @@ def update_catalog_suggestions(page: Any) -> None:
     if not (hasattr(page, "cmb_search_name") and hasattr(page, "cmb_filter_vendor") and hasattr(page, "cmb_filter_department")):
         return
     text = ""
-    try:
+    with suppress(Exception):
         text = page.cmb_search_name.lineEdit().text().strip()
-    except Exception:
-        pass
     vendor_filter = page.cmb_filter_vendor.currentData()
     dept_filter = page.cmb_filter_department.currentData()
     filters: Dict[str, Any] = {}
@@ -3119,6 +3283,12 @@ def update_catalog_suggestions(page: Any) -> None:
         filters["vendor"] = vendor_filter
     if dept_filter:
         filters["department"] = dept_filter
+    # Тот же запрос к неизменённому каталогу, что и в прошлый раз, — список
+    # уже актуален (поколение каталога растёт при вставке и правке)
+    suggest_key = (text, vendor_filter, dept_filter, getattr(page.db, "_catalog_generation", None))
+    if getattr(page, "_catalog_suggest_key", None) == suggest_key:
+        return
+    page._catalog_suggest_key = suggest_key
     # Получаем подходящие позиции каталога
     rows: List[Any] = []
     try:
@@ -3128,21 +3298,44 @@ def update_catalog_suggestions(page: Any) -> None:
     # Обновляем комбобокс подсказок
     # Сохраняем текущий текст, который ввёл пользователь, чтобы восстановить его
     current_text = ""
-    try:
+    with suppress(Exception):
         current_text = page.cmb_search_name.lineEdit().text()
-    except Exception:
-        pass
     page.cmb_search_name.blockSignals(True)
-    page.cmb_search_name.clear()
-    # Добавляем элементы подсказок: показываем имя и цену, записываем данные в itemData
+    # Добавляем элементы подсказок: показываем имя и цену. В itemData
+    # записывается индекс позиции в ``page._catalog_rows``, а список
+    # заполняется одной вставкой в модель. Наименование, подрядчик и отдел
+    # нормализуются здесь один раз, чтобы обработчики выбора и добавления
+    # не повторяли эту работу при каждом клике.
+    kept_rows: List[Dict[str, Any]] = []
+    suggestions: List[Tuple[str, Any]] = []
+    # Кэш отображаемых строк по (имя, цена): при повторных запросах строки
+    # каталога не нормализуются и не форматируются заново
+    display_cache = getattr(page, "_display_cache", None)
+    if display_cache is None or len(display_cache) > 50000:
+        display_cache = page._display_cache = {}
     for r in rows:
         try:
-            name_norm = normalize_case(r["name"] or "")
+            name_raw = str(r["name"] or "")
             price = float(r["unit_price"] or 0)
-            display = f"{name_norm} (цена: {fmt_num(price,2)})"
-            page.cmb_search_name.addItem(display, dict(r))
+            name_norm = _norm_cached(name_raw)
+            display = display_cache.get((name_raw, price))
+            if display is None:
+                display = f"{name_norm} (цена: {fmt_num(price,2)})"
+                display_cache[(name_raw, price)] = display
+            data = {
+                "name": name_norm,
+                "vendor": _norm_cached(str(r["vendor"] or "")),
+                "department": _norm_cached(str(r["department"] or "")),
+                "class": r["class"] or "equipment",
+                "unit_price": price,
+                "power_watts": float(r["power_watts"] or 0),
+            }
         except Exception:
             continue
+        suggestions.append((display, len(kept_rows)))
+        kept_rows.append(data)
+    page._catalog_rows = kept_rows
+    fill_combo_batch(page.cmb_search_name, suggestions)
     # Восстанавливаем текст, который вводил пользователь, и не выбираем ни один элемент
     try:
         # Восстанавливаем текст непосредственно через lineEdit, чтобы
@@ -3163,6 +3356,22 @@ def update_catalog_suggestions(page: Any) -> None:
         pass
 
 
+def _selected_catalog_row(page: Any) -> Optional[Dict[str, Any]]:
+    """Возвращает выбранную в ``cmb_search_name`` позицию каталога.
+
+    В ``itemData`` хранится индекс в ``page._catalog_rows``, где лежат уже
+    нормализованные данные позиции. ``None`` — если ничего не выбрано.
+    """
+    idx = page.cmb_search_name.currentIndex()
+    if idx < 0:
+        return None
+    row_idx = page.cmb_search_name.itemData(idx)
+    rows = getattr(page, "_catalog_rows", None) or []
+    if not isinstance(row_idx, int) or not 0 <= row_idx < len(rows):
+        return None
+    return rows[row_idx]
+
+
 # 17. Обработка выбора позиции из каталога
 def on_catalog_item_selected(page: Any) -> None:
     """Заполняет поля ручного добавления выбранной позицией из каталога.
@@ -3175,22 +3384,19 @@ def on_catalog_item_selected(page: Any) -> None:
     # Если режим базы данных не активен или комбобокс поиска отсутствует — игнорируем выбор
     if not getattr(page, "_db_mode_enabled", False) or not hasattr(page, "cmb_search_name"):
         return
-    idx = page.cmb_search_name.currentIndex()
-    if idx < 0:
-        return
-    data = page.cmb_search_name.itemData(idx)
-    if not data:
+    row = _selected_catalog_row(page)
+    if not row:
         return
-    row = data
     try:
         # Заполняем внутренние поля для последующего добавления
-        name_norm = normalize_case(row.get("name", ""))
-        vendor_norm = normalize_case(row.get("vendor", ""))
-        dept_norm = normalize_case(row.get("department", ""))
-        class_en = row.get("class", "equipment")
+        # (строки уже нормализованы при построении подсказок)
+        name_norm = row["name"]
+        vendor_norm = row["vendor"]
+        dept_norm = row["department"]
+        class_en = row["class"]
         class_ru = CLASS_EN2RU.get(class_en, "Оборудование")
-        price = float(row.get("unit_price", 0.0) or 0.0)
-        power = float(row.get("power_watts", 0.0) or 0.0)
+        price = row["unit_price"]
+        power = row["power_watts"]
         # Устанавливаем значения в скрытые поля
         page.ed_add_name.setText(name_norm)
         page.ed_add_vendor.setText(vendor_norm)
@@ -3217,58 +3423,43 @@ def add_catalog_item(page: Any) -> None:
         return
     if page.project_id is None:
         return
-    idx = page.cmb_search_name.currentIndex()
-    if idx < 0:
-        QtWidgets.QMessageBox.information(page, "Внимание", "Выберите позицию из каталога.")
-        return
-    data = page.cmb_search_name.itemData(idx)
-    if not data:
+    row = _selected_catalog_row(page)
+    if not row:
         QtWidgets.QMessageBox.information(page, "Внимание", "Выберите позицию из каталога.")
         return
-    row = data
-    # Собираем данные
-    name = normalize_case(row.get("name", ""))
+    # Собираем данные (наименование, подрядчик и отдел уже нормализованы)
+    name = row["name"]
     qty = float(page.sp_add_qty.value() or 1.0)
     coeff = float(page.sp_add_coeff.value() or 1.0)
-    price = float(row.get("unit_price", 0.0) or 0.0)
+    price = row["unit_price"]
     amount = qty * coeff * price
-    vendor = normalize_case(row.get("vendor", ""))
-    department = normalize_case(row.get("department", ""))
-    class_en = row.get("class", "equipment")
+    vendor = row["vendor"]
+    department = row["department"]
+    class_en = row["class"]
     zone_data = page.cmb_add_zone.currentData()
     zone_raw = zone_data if zone_data is not None else (page.cmb_add_zone.currentText() or "")
     zone = normalize_case(zone_raw)
     # Если пользователь выбрал «Без зоны», но зона по умолчанию задана, используем её
     if not zone and getattr(page, "default_zone", ""):
         zone = page.default_zone
-    power = float(row.get("power_watts", 0.0) or 0.0)
+    power = row["power_watts"]
     # Проверяем, существует ли уже в смете позиция с теми же параметрами (имя, подрядчик, отдел,
     # класс, цена, коэффициент и зона). Если такая найдена, увеличиваем её количество,
     # иначе создаём новую запись.
     duplicate = None
     try:
-        # Получаем все позиции в заданной зоне данного проекта
-        existing_rows = page.db.list_items_filtered(
+        # Ищем дубликат одним запросом (сравнение по нормализованным полям в SQL)
+        duplicate = page.db.find_duplicate_item(
             project_id=page.project_id,
-            vendor="<ALL>",
-            department="<ALL>",
             zone=zone,
             class_en=class_en,
-            name_like=name
+            name=name,
+            vendor=vendor,
+            department=department,
+            unit_price=price,
+            coeff=coeff,
+            normalize_fn=_norm_cached,
         )
-        for r in existing_rows:
-            try:
-                # Сравниваем по нормализованным полям
-                if normalize_case(r["name"] or "") == name \
-                   and normalize_case(r["vendor"] or "") == vendor \
-                   and normalize_case(r["department"] or "") == department \
-                   and (r["type"] or "equipment") == class_en \
-                   and abs(float(r["unit_price"] or 0) - price) < 1e-6 \
-                   and abs(float(r["coeff"] or 0) - coeff) < 1e-6:
-                    duplicate = r
-                    break
-            except Exception:
-                continue
     except Exception as ex:
         page._log(f"Ошибка поиска дубликатов при добавлении из каталога: {ex}", "error")
 
@@ -3303,7 +3494,7 @@ def add_catalog_item(page: Any) -> None:
             return
     else:
         # Записываем в проект новую позицию
-        undo_batch = f"__undo_catalog_add__{datetime.utcnow().isoformat()}"
+        undo_batch = f"__undo_catalog_add__{uuid.uuid4().hex}"
         try:
             page.db.add_items_bulk([
                 {
@@ -3353,6 +3544,36 @@ def add_catalog_item(page: Any) -> None:
     reload_zone_tabs(page)
 
 
+# 19.0 Фоновый запрос каталога для диалога выбора позиции
+class _CatalogQuerySignals(QtCore.QObject):
+    """Сигналы фонового запроса каталога (QRunnable не может их иметь)."""
+    finished = QtCore.Signal(int, object)
+
+
+class _CatalogQueryTask(QtCore.QRunnable):
+    """Выполняет ``catalog_list_readonly`` в пуле потоков.
+
+    Результат (или ``None`` при ошибке) передаётся сигналом ``finished``
+    вместе с порядковым номером запроса, чтобы получатель мог отбросить
+    ответы на устаревшие запросы.
+    """
+
+    def __init__(self, db: Any, filters: Dict[str, Any], seq: int) -> None:
+        super().__init__()
+        self._db = db
+        self._filters = dict(filters)
+        self._seq = seq
+        self.signals = _CatalogQuerySignals()
+
+    def run(self) -> None:
+        rows: Optional[List[Any]] = None
+        try:
+            rows = self._db.catalog_list_readonly(self._filters)
+        except Exception as ex:
+            logging.getLogger(__name__).warning("Фоновый запрос каталога не выполнен: %s", ex)
+        self.signals.finished.emit(self._seq, rows)
+
+
 # 19. Открытие диалога выбора позиции из базы данных
 def show_catalog_dialog(page: Any) -> None:
     """Открывает модальное окно для выбора позиции из каталога базы данных.
@@ -3369,6 +3590,65 @@ def show_catalog_dialog(page: Any) -> None:
         QtWidgets.QMessageBox.information(page, "Внимание", "Сначала откройте проект.")
         return
 
+    class CatalogTableModel(QtCore.QAbstractTableModel):
+        """Модель таблицы каталога поверх списка строк ``catalog_list``.
+
+        Текст ячеек вычисляется лениво в ``data()`` — только для видимых
+        строк, без создания ``QTableWidgetItem`` на каждую ячейку.
+        """
+        def __init__(self, parent=None) -> None:
+            super().__init__(parent)
+            self._rows: List[Any] = []
+            self._headers = ["Наименование", "Класс", "Подрядчик", "Цена", "Потр. (Вт)", "Отдел"]
+
+        def rowCount(self, parent=QtCore.QModelIndex()) -> int:
+            return 0 if parent.isValid() else len(self._rows)
+
+        def columnCount(self, parent=QtCore.QModelIndex()) -> int:
+            return 0 if parent.isValid() else 6
+
+        def data(self, index, role=QtCore.Qt.DisplayRole):
+            if not index.isValid():
+                return None
+            r = self._rows[index.row()]
+            c = index.column()
+            if role == QtCore.Qt.DisplayRole:
+                # Нормализуем строки для отображения без учёта регистра
+                if c == 0:
+                    return _norm_cached(r["name"] or "")
+                if c == 1:
+                    return CLASS_EN2RU.get((r["class"] or "equipment"), "Оборудование")
+                if c == 2:
+                    return _norm_cached(r["vendor"] or "")
+                if c == 3:
+                    return fmt_num(float(r["unit_price"] or 0.0), 2)
+                if c == 4:
+                    return fmt_num(float(r["power_watts"] or 0.0), 0)
+                if c == 5:
+                    return _norm_cached(r["department"] or "")
+            elif role == QtCore.Qt.UserRole and c == 0:
+                # Идентификатор строки каталога; полные данные выбранной
+                # строки возвращает get_row только по запросу
+                return r["id"]
+            return None
+
+        def headerData(self, section, orientation, role=QtCore.Qt.DisplayRole):
+            if role == QtCore.Qt.DisplayRole and orientation == QtCore.Qt.Horizontal:
+                return self._headers[section]
+            return None
+
+        def set_rows(self, rows: List[Any]) -> None:
+            """Заменяет строки модели одним сбросом."""
+            self.beginResetModel()
+            self._rows = list(rows)
+            self.endResetModel()
+
+        def get_row(self, r: int) -> Optional[Dict[str, Any]]:
+            """Возвращает данные строки каталога в виде словаря (только для выбранной)."""
+            if not 0 <= r < len(self._rows):
+                return None
+            return dict(self._rows[r])
+
     class CatalogDialog(QtWidgets.QDialog):
         """Внутренний класс диалога выбора позиции из каталога."""
         def __init__(self, parent_page: Any):  # type: ignore
@@ -3401,14 +3681,23 @@ def show_catalog_dialog(page: Any) -> None:
             filt.addWidget(self.cmb_department)
             filt.addStretch(1)
             v_layout.addLayout(filt)
-            # 19.2 Таблица каталога
-            self.tbl = QtWidgets.QTableWidget(0, 6)
+            # 19.2 Таблица каталога: представление над моделью, ячейки
+            # запрашиваются только для видимых строк
+            self._model = CatalogTableModel(self)
+            self.tbl = QtWidgets.QTableView()
+            self.tbl.setModel(self._model)
             self.tbl.setSelectionBehavior(QtWidgets.QAbstractItemView.SelectRows)
             self.tbl.setSelectionMode(QtWidgets.QAbstractItemView.SingleSelection)
             self.tbl.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
-            headers = ["Наименование", "Класс", "Подрядчик", "Цена", "Потр. (Вт)", "Отдел"]
-            self.tbl.setHorizontalHeaderLabels(headers)
-            self.tbl.horizontalHeader().setSectionResizeMode(QtWidgets.QHeaderView.Stretch)
+            # Ширины колонок задаются один раз: наименование растягивается,
+            # остальные имеют фиксированную начальную ширину и меняются
+            # вручную — при обновлении данных ширины по содержимому не
+            # пересчитываются
+            hdr = self.tbl.horizontalHeader()
+            hdr.setSectionResizeMode(QtWidgets.QHeaderView.Interactive)
+            hdr.setDefaultSectionSize(140)
+            hdr.setSectionResizeMode(0, QtWidgets.QHeaderView.Stretch)
+            hdr.setStretchLastSection(False)
             v_layout.addWidget(self.tbl, 1)
             # 19.3 Панель добавления
             add_panel = QtWidgets.QHBoxLayout()
@@ -3442,8 +3731,14 @@ def show_catalog_dialog(page: Any) -> None:
             # 19.4 Заполняем фильтры и зону
             self._fill_filters()
             self._fill_zones()
-            # 19.5 Подключаем сигналы
-            self.ed_search.textChanged.connect(self._update_table)
+            # 19.5 Подключаем сигналы. Ввод в поле поиска откладывается
+            # таймером: каталог запрашивается один раз после паузы в наборе,
+            # а не на каждый введённый символ
+            self._search_timer = QtCore.QTimer(self)
+            self._search_timer.setSingleShot(True)
+            self._search_timer.setInterval(180)
+            self._search_timer.timeout.connect(self._update_table)
+            self.ed_search.textChanged.connect(self._search_timer.start)
             self.cmb_vendor.currentIndexChanged.connect(self._update_table)
             self.cmb_department.currentIndexChanged.connect(self._update_table)
             self.btn_add.clicked.connect(self._on_add)
@@ -3460,34 +3755,27 @@ def show_catalog_dialog(page: Any) -> None:
                 self.page._log(f"Ошибка загрузки фильтров каталога: {ex}", "error")
                 vendors = []
                 departments = []
-            # Подрядчики
-            self.cmb_vendor.blockSignals(True)
-            self.cmb_vendor.clear()
-            self.cmb_vendor.addItem("<Любой>", None)
-            for v in vendors:
-                if v:
-                    self.cmb_vendor.addItem(normalize_case(v), v)
-            self.cmb_vendor.setCurrentIndex(0)
-            self.cmb_vendor.blockSignals(False)
-            # Отделы
-            self.cmb_department.blockSignals(True)
-            self.cmb_department.clear()
-            self.cmb_department.addItem("<Любой>", None)
-            for d in departments:
-                if d:
-                    self.cmb_department.addItem(normalize_case(d), d)
-            self.cmb_department.setCurrentIndex(0)
-            self.cmb_department.blockSignals(False)
+            # Списки заполняются одной вставкой в модель; сигналы блокируются
+            # на время заполнения и снимаются даже при исключении
+            with QtCore.QSignalBlocker(self.cmb_vendor):
+                fill_combo_batch(
+                    self.cmb_vendor,
+                    [("<Любой>", None)] + [(_norm_cached(v), v) for v in vendors if v],
+                )
+                self.cmb_vendor.setCurrentIndex(0)
+            with QtCore.QSignalBlocker(self.cmb_department):
+                fill_combo_batch(
+                    self.cmb_department,
+                    [("<Любой>", None)] + [(_norm_cached(d), d) for d in departments if d],
+                )
+                self.cmb_department.setCurrentIndex(0)
 
         def _fill_zones(self) -> None:
             """Заполняет список зон из текущего проекта."""
             zones = self.page.db.project_distinct_values(self.page.project_id, "zone") or []
-            self.cmb_zone.clear()
-            self.cmb_zone.addItem("Без зоны", "")
-            for z in zones:
-                if z:
-                    self.cmb_zone.addItem(z, z)
-            self.cmb_zone.setCurrentIndex(0)
+            with QtCore.QSignalBlocker(self.cmb_zone):
+                fill_combo_batch(self.cmb_zone, [("Без зоны", "")] + [(z, z) for z in zones if z])
+                self.cmb_zone.setCurrentIndex(0)
 
         def _update_table(self) -> None:
             """
@@ -3511,47 +3799,45 @@ def show_catalog_dialog(page: Any) -> None:
                 filters["vendor"] = vendor
             if dept:
                 filters["department"] = dept
-            rows: List[Any] = []
-            try:
-                rows = self.page.db.catalog_list(filters)
-            except Exception as ex:
-                # Логируем ошибку запроса каталога
+            # Те же фильтры при неизменном каталоге — таблица уже актуальна
+            # (например, повторное срабатывание таймера поиска)
+            filter_key = (name, vendor, dept, getattr(self.page.db, "_catalog_generation", None))
+            if filter_key == getattr(self, "_last_filter_key", None):
+                return
+            self._last_filter_key = filter_key
+            # Каждый запрос получает номер: ответы на устаревшие запросы
+            # (пользователь успел изменить фильтры) отбрасываются
+            self._query_seq = getattr(self, "_query_seq", 0) + 1
+            self._query_filters = filters
+            if getattr(self.page.db, "db_path", None) is not None and hasattr(self.page.db, "catalog_list_readonly"):
+                # Запрос выполняется в пуле потоков через соединение только
+                # для чтения, интерфейс не блокируется на время выборки
+                task = _CatalogQueryTask(self.page.db, filters, self._query_seq)
+                task.signals.finished.connect(self._apply_rows)
+                self._query_task = task
+                QtCore.QThreadPool.globalInstance().start(task)
+                return
+            self._apply_rows(self._query_seq, None)
+
+        def _apply_rows(self, seq: int, rows: Optional[List[Any]]) -> None:
+            """Показывает результат запроса каталога с номером seq.
+
+            Если фоновый запрос не удался (``rows is None``), выборка
+            выполняется синхронно через основное соединение.
+            """
+            if seq != getattr(self, "_query_seq", 0):
+                return
+            self._query_task = None
+            if rows is None:
                 try:
-                    self.page._log(f"Ошибка запроса каталога: {ex}", "error")
-                except Exception:
-                    pass
-                rows = []
-            # Заполняем таблицу
-            self.tbl.setRowCount(0)
-            for r in rows:
-                row_idx = self.tbl.rowCount()
-                self.tbl.insertRow(row_idx)
-                # Нормализуем строки для отображения без учёта регистра
-                name_norm = normalize_case(r["name"] or "")
-                class_ru = CLASS_EN2RU.get((r["class"] or "equipment"), "Оборудование")
-                vendor_norm = normalize_case(r["vendor"] or "")
-                price = float(r["unit_price"] or 0.0)
-                power = float(r["power_watts"] or 0.0)
-                dept_norm = normalize_case(r["department"] or "")
-                values = [
-                    name_norm,
-                    class_ru,
-                    vendor_norm,
-                    fmt_num(price, 2),
-                    fmt_num(power, 0),
-                    dept_norm,
-                ]
-                for col, val in enumerate(values):
-                    item = QtWidgets.QTableWidgetItem(str(val))
-                    if col == 0:
-                        # Сохраняем оригинальные данные в первом столбце
-                        item.setData(QtCore.Qt.UserRole, dict(r))
-                    self.tbl.setItem(row_idx, col, item)
-            # Подстраиваем ширину колонок под содержимое
-            try:
-                self.tbl.resizeColumnsToContents()
-            except Exception:
-                pass
+                    rows = self.page.db.catalog_list(self._query_filters)
+                except Exception as ex:
+                    # Логируем ошибку запроса каталога
+                    with suppress(Exception):
+                        self.page._log(f"Ошибка запроса каталога: {ex}", "error")
+                    rows = []
+            # Заменяем строки модели; ширины колонок заданы при создании таблицы
+            self._model.set_rows(rows)
 
         def _on_add(self) -> None:
             """Добавляет выбранную строку из каталога в проект.
@@ -3562,15 +3848,12 @@ def show_catalog_dialog(page: Any) -> None:
             сохраняет новую запись через add_items_bulk. В обоих случаях выводит
             информацию в лог и фиксирует действие для UNDO.
             """
-            row_idx = self.tbl.currentRow()
+            row_idx = self.tbl.currentIndex().row()
             if row_idx < 0:
                 QtWidgets.QMessageBox.information(self, "Внимание", "Выберите позицию для добавления.")
                 return
-            item = self.tbl.item(row_idx, 0)
-            if not item:
-                return
             # 19.7 Получаем данные выбранной строки каталога
-            data = item.data(QtCore.Qt.UserRole)
+            data = self._model.get_row(row_idx)
             if not data:
                 return
             try:
@@ -3596,30 +3879,18 @@ def show_catalog_dialog(page: Any) -> None:
             # По умолчанию предполагаем создание новой записи
             duplicate = None
             try:
-                # Получаем существующие позиции в этой зоне и классе
-                existing_rows = self.page.db.list_items_filtered(
+                # Ищем дубликат в этой зоне и классе одним запросом к БД
+                duplicate = self.page.db.find_duplicate_item(
                     project_id=self.page.project_id,
-                    vendor="<ALL>",
-                    department="<ALL>",
                     zone=zone,
                     class_en=class_en,
-                    name_like=name
+                    name=name,
+                    vendor=vendor,
+                    department=department,
+                    unit_price=price,
+                    coeff=coeff,
+                    normalize_fn=_norm_cached,
                 )
-                for r in existing_rows:
-                    try:
-                        # Сравниваем по нормализованным полям. Используем индексированный доступ,
-                        # поскольку sqlite3.Row не поддерживает метод get(). Пустые значения
-                        # приводим к пустой строке или нулю.
-                        if normalize_case(r["name"] or "") == name \
-                           and normalize_case(r["vendor"] or "") == vendor \
-                           and normalize_case(r["department"] or "") == department \
-                           and (r["type"] or "equipment") == class_en \
-                           and abs(float((r["unit_price"] or 0)) - price) < 1e-6 \
-                           and abs(float((r["coeff"] or 0)) - coeff) < 1e-6:
-                            duplicate = r
-                            break
-                    except Exception:
-                        continue
             except Exception as ex:
                 self.page._log(f"Ошибка поиска дубликатов в сводной смете: {ex}", "error")
             if duplicate:
@@ -3654,7 +3925,7 @@ def show_catalog_dialog(page: Any) -> None:
             else:
                 # 19.10 Дубликат не найден — создаём новую запись
                 amount = qty * coeff * price
-                undo_batch = f"__undo_catalog_add__{datetime.utcnow().isoformat()}"
+                undo_batch = f"__undo_catalog_add__{uuid.uuid4().hex}"
                 try:
                     self.page.db.add_items_bulk([
                         {
@@ -3699,7 +3970,7 @@ def show_catalog_dialog(page: Any) -> None:
 
 
 # 20. Мастер добавления LED‑экрана
-def open_screen_master(page: Any) -> None:
+def open_screen_master(page: Any) -> Optional[List[int]]:
     """Открывает мастер создания LED‑экрана.
 
     Диалог позволяет ввести размеры экрана в метрах, выбрать цену за
@@ -3712,6 +3983,9 @@ def open_screen_master(page: Any) -> None:
     После подтверждения создаются записи в проекте и (при необходимости)
     пополняется каталог. Мастер использует :class:`CatalogSelectDialog`
     для выбора позиции экрана из базы, чтобы подставить цену и метаданные.
+
+    Возвращает список id добавленных позиций или None, если ничего
+    не добавлено.
     """
     # 20.1 Проверяем, открыт ли проект
     if getattr(page, "project_id", None) is None:
@@ -3798,6 +4072,10 @@ def open_screen_master(page: Any) -> None:
             for d in departments:
                 if d:
                     self.cmb_department.addItem(normalize_case(d))
+            # Индексы «текст в нижнем регистре → позиция» для поиска значения
+            # из каталога без перебора всех элементов списка
+            self._vendor_index = self._build_combo_index(self.cmb_vendor)
+            self._department_index = self._build_combo_index(self.cmb_department)
             form.addRow("Подрядчик:", self.cmb_vendor)
             form.addRow("Отдел:", self.cmb_department)
 
@@ -3858,6 +4136,14 @@ def open_screen_master(page: Any) -> None:
             # Переменные для выбранного элемента каталога
             self.selected_catalog: Optional[Dict[str, Any]] = None
 
+        @staticmethod
+        def _build_combo_index(combo: QtWidgets.QComboBox) -> Dict[str, int]:
+            """Строит индекс первых вхождений текстов комбобокса без учёта регистра."""
+            index: Dict[str, int] = {}
+            for i in range(combo.count()):
+                index.setdefault(combo.itemText(i).lower(), i)
+            return index
+
         def _update_labels(self) -> None:
             """Пересчитывает и отображает площадь, количество кабинетов, разрешение и пиксели.
 
@@ -3874,23 +4160,30 @@ def open_screen_master(page: Any) -> None:
             """
             w = float(self.ed_width.value() or 0)
             h = float(self.ed_height.value() or 0)
+            # Разрешение модуля (ширина×высота) задаёт разрешение каждого кабинета
+            mod_px_w = int(self.spin_mod_w.value())
+            mod_px_h = int(self.spin_mod_h.value())
+            # Сигнал valueChanged приходит и при программной установке тех же
+            # значений — если входные данные не изменились, пересчёт не нужен
+            inputs = (w, h, mod_px_w, mod_px_h)
+            if getattr(self, "_label_inputs", None) == inputs:
+                return
+            self._label_inputs = inputs
             # Площадь
             area = w * h
-            import math
             # Количество кабинетов: считаем по каждой стороне отдельно
-            # Шаг модуля = 0.5 м (два модуля на метр)
-            cab_w = max(1, math.ceil(w * 2))
-            cab_h = max(1, math.ceil(h * 2))
+            # Шаг модуля = 0.5 м (два модуля на метр). Размеры заданы с точностью
+            # до сантиметра, поэтому ceil(x × 2) считается в целых сантиметрах:
+            # ceil(см / 50) без погрешностей плавающей точки.
+            cab_w = max(1, -(-round(w * 100) // 50))
+            cab_h = max(1, -(-round(h * 100) // 50))
             cabinets = cab_w * cab_h
-            # Разрешение модуля (ширина×высота) задаёт разрешение каждого кабинета
-            mod_px_w = int(self.spin_mod_w.value())
-            mod_px_h = int(self.spin_mod_h.value())
             # Разрешение экрана = количество кабинетов × разрешение модуля
             res_x = cab_w * mod_px_w
             res_y = cab_h * mod_px_h
             total_pixels = res_x * res_y
-            # Количество витых пар (минимум 1)
-            cables = max(1, math.ceil(total_pixels / 650_000))
+            # Количество витых пар (минимум 1), целочисленное деление с округлением вверх
+            cables = max(1, -(-total_pixels // 650_000))
             # Отображаем
             self.lbl_area.setText(f"Площадь: {fmt_num(area, 2)} м²")
             self.lbl_cabinets.setText(f"Кабинетов: {cabinets}")
@@ -3923,57 +4216,37 @@ def open_screen_master(page: Any) -> None:
             vendor = normalize_case(data.get("vendor") or "")
             dept = normalize_case(data.get("department") or "")
             # Устанавливаем текст комбобоксов (добавляем если отсутствует)
-            def set_combo(combo: QtWidgets.QComboBox, text: str) -> None:
+            def set_combo(combo: QtWidgets.QComboBox, index: Dict[str, int], text: str) -> None:
                 if not text:
                     return
                 # Ищем существующий индекс без учёта регистра
-                for i in range(combo.count()):
-                    if combo.itemText(i).lower() == text.lower():
-                        combo.setCurrentIndex(i)
-                        return
-                # Не найдено — добавляем
+                key = text.lower()
+                i = index.get(key)
+                if i is not None:
+                    combo.setCurrentIndex(i)
+                    return
+                # Не найдено — добавляем и запоминаем позицию
                 combo.addItem(text)
+                index[key] = combo.count() - 1
                 combo.setCurrentIndex(combo.count() - 1)
-            set_combo(self.cmb_vendor, vendor)
-            set_combo(self.cmb_department, dept)
+            set_combo(self.cmb_vendor, self._vendor_index, vendor)
+            set_combo(self.cmb_department, self._department_index, dept)
             # Обновляем подписи
-            try:
+            with suppress(Exception):
                 self._update_labels()
-            except Exception:
-                pass
 
-    # Перед созданием диалога вычисляем предложенный номер экрана
+    # Перед созданием диалога вычисляем предложенный номер экрана:
+    # максимальный номер среди «LED экран N…» считается одним запросом в БД
     default_id = 1
     try:
-        import re as _re_id
-        cur_id = page.db._conn.cursor()
-        cur_id.execute(
-            "SELECT name FROM items WHERE project_id=? AND name LIKE 'LED экран%'",
-            (page.project_id,),
-        )
-        rows_id = cur_id.fetchall()
-        max_id_found = 0
-        for r in rows_id:
-            # r может быть sqlite3.Row или tuple
-            nm = r["name"] if isinstance(r, dict) else r[0]
-            m_id = _re_id.match(r"LED экран\s*(\d+)", nm)
-            if m_id:
-                try:
-                    val_id = int(m_id.group(1))
-                    if val_id > max_id_found:
-                        max_id_found = val_id
-                except Exception:
-                    continue
-        default_id = max_id_found + 1 if max_id_found >= 1 else 1
+        default_id = page.db.project_max_name_number(page.project_id, "LED экран") + 1
     except Exception:
         default_id = 1
     # Создаём и отображаем диалог
     dlg = ScreenMasterDialog(page)
     # Устанавливаем предложенный номер экрана
-    try:
+    with suppress(Exception):
         dlg.spin_id.setValue(int(default_id))
-    except Exception:
-        pass
     if dlg.exec() != QtWidgets.QDialog.Accepted:
         return
     # Извлекаем введённые данные
@@ -3990,8 +4263,10 @@ def open_screen_master(page: Any) -> None:
         id_val = int(dlg.spin_id.value())
     except Exception:
         id_val = 1
+    # Общая часть наименований экрана и аксессуаров: номер и размеры
+    dim_suffix = f"{id_val} {fmt_num(width, 2)}×{fmt_num(height, 2)} м"
     screen_name = (
-        f"LED экран {id_val} {fmt_num(width, 2)}×{fmt_num(height, 2)} м "
+        f"LED экран {dim_suffix} "
         f"({dlg._cabinets} кабинетов, {dlg._res_x}×{dlg._res_y} пикселей)"
     )
     screen_unit_price = price_per_m2
@@ -4003,147 +4278,90 @@ def open_screen_master(page: Any) -> None:
     # отображаются вместе. Префикс «LED экран №» выбран по аналогии со
     # сценическим подиумом и не влияет на вычисления.
     group_name_screen = f"LED экран №{id_val}"
+    # Общая метка пакета для экрана и всех аксессуаров: записи вставляются
+    # одним вызовом add_items_bulk и отменяются вместе
+    screen_batch = f"screen-{uuid.uuid4().hex}"
     # Составляем список записей для проекта и каталог
     items_for_db: List[Dict[str, Any]] = []
-    catalog_entries: List[Dict[str, Any]] = []
-    # Запись для экрана
-    items_for_db.append({
+    # Общие поля всех записей мастера; каждая запись дополняет их своими
+    # наименованием, количеством, ценой, подрядчиком и отделом
+    base_item: Dict[str, Any] = {
         "project_id": page.project_id,
         "type": "equipment",
         # Используем единый group_name для экрана и его аксессуаров.  Это поле
         # позволяет группировать связанные позиции в смете (например,
-        # экран, витую пару и видеопроцессор).  Здесь и далее применяем
-        # переменную group_name_screen вместо универсальной
+        # экран, витую пару и видеопроцессор) вместо универсальной
         # «Аренда оборудования».
         "group_name": group_name_screen,
-        "name": screen_name,
-        "qty": area_qty,
         "coeff": 1.0,
-        "amount": screen_amount,
-        "unit_price": screen_unit_price,
         "source_file": "SCREEN_MASTER",
-        "vendor": vendor,
-        "department": department,
         "zone": "",
         "power_watts": 0.0,
-        "import_batch": f"screen-{datetime.utcnow().isoformat()}"
-    })
-    catalog_entries.append({
+        "import_batch": screen_batch,
+    }
+    # Запись для экрана
+    items_for_db.append({
+        **base_item,
         "name": screen_name,
+        "qty": area_qty,
+        "amount": screen_amount,
         "unit_price": screen_unit_price,
-        "class": "equipment",
         "vendor": vendor,
-        "power_watts": 0.0,
         "department": department,
     })
     # Дополнительные аксессуары: витая пара
     if dlg.chk_cable.isChecked():
-        # Пытаемся найти товар по названию "витая пара" в каталоге
-        cable_rows = []
+        # Пытаемся найти товар по названию "витая пара" в каталоге (первая
+        # подходящая строка, кэшируется до изменения каталога)
+        row0 = None
         try:
-            cable_rows = page.db.catalog_list({"name": "витая пара"})
+            row0 = page.db.catalog_first({"name": "витая пара"})
         except Exception:
-            cable_rows = []
-        if cable_rows:
-            # sqlite3.Row поддерживает доступ по ключу, но не имеет метода get
-            row0 = cable_rows[0]
-            try:
-                cable_price = float(row0["unit_price"] or 0.0)
-            except Exception:
-                cable_price = 0.0
-            try:
-                cable_vendor = normalize_case(row0["vendor"] or vendor)
-            except Exception:
-                cable_vendor = vendor
-            try:
-                cable_department = normalize_case(row0["department"] or department)
-            except Exception:
-                cable_department = department
+            row0 = None
+        if row0 is not None:
+            cable_price = _row_get(row0, "unit_price", float, 0.0)
+            cable_vendor = _norm_cached(_row_get(row0, "vendor", str, vendor))
+            cable_department = _norm_cached(_row_get(row0, "department", str, department))
         else:
             cable_price = 0.0
             cable_vendor = vendor
             cable_department = department
         cable_qty = max(1, dlg._cables)
-        cable_name = f"Витая пара для LED {id_val} {fmt_num(width, 2)}×{fmt_num(height, 2)} м"
+        cable_name = f"Витая пара для LED {dim_suffix}"
         items_for_db.append({
-            "project_id": page.project_id,
-            "type": "equipment",
-            # Все аксессуары для LED‑экрана помещаем в ту же группу,
-            # что и сам экран.  Это объединяет витые пары с экраном в
-            # интерфейсе сводной сметы.
-            "group_name": group_name_screen,
+            **base_item,
             "name": cable_name,
             "qty": float(cable_qty),
-            "coeff": 1.0,
             "amount": cable_price * cable_qty,
             "unit_price": cable_price,
-            "source_file": "SCREEN_MASTER",
             "vendor": cable_vendor,
             "department": cable_department,
-            "zone": "",
-            "power_watts": 0.0,
-            "import_batch": f"screen-{datetime.utcnow().isoformat()}"
-        })
-        catalog_entries.append({
-            "name": cable_name,
-            "unit_price": cable_price,
-            "class": "equipment",
-            "vendor": cable_vendor,
-            "power_watts": 0.0,
-            "department": cable_department,
         })
     # Видеопроцессор
     if dlg.chk_vp.isChecked():
-        vp_rows = []
+        row0 = None
         try:
             # ищем позицию по ключевому слову "процессор"
-            vp_rows = page.db.catalog_list({"name": "процессор"})
+            row0 = page.db.catalog_first({"name": "процессор"})
         except Exception:
-            vp_rows = []
-        if vp_rows:
-            row0 = vp_rows[0]
-            try:
-                vp_price = float(row0["unit_price"] or 0.0)
-            except Exception:
-                vp_price = 0.0
-            try:
-                vp_vendor = normalize_case(row0["vendor"] or vendor)
-            except Exception:
-                vp_vendor = vendor
-            try:
-                vp_department = normalize_case(row0["department"] or department)
-            except Exception:
-                vp_department = department
+            row0 = None
+        if row0 is not None:
+            vp_price = _row_get(row0, "unit_price", float, 0.0)
+            vp_vendor = _norm_cached(_row_get(row0, "vendor", str, vendor))
+            vp_department = _norm_cached(_row_get(row0, "department", str, department))
         else:
             vp_price = 0.0
             vp_vendor = vendor
             vp_department = department
-        vp_name = f"Видеопроцессор для LED {id_val} {fmt_num(width, 2)}×{fmt_num(height, 2)} м"
+        vp_name = f"Видеопроцессор для LED {dim_suffix}"
         items_for_db.append({
-            "project_id": page.project_id,
-            "type": "equipment",
-            # Видеопроцессор относится к тому же экрану, поэтому используем
-            # общее имя группы для всего комплекта
-            "group_name": group_name_screen,
+            **base_item,
             "name": vp_name,
             "qty": 1.0,
-            "coeff": 1.0,
             "amount": vp_price,
             "unit_price": vp_price,
-            "source_file": "SCREEN_MASTER",
             "vendor": vp_vendor,
             "department": vp_department,
-            "zone": "",
-            "power_watts": 0.0,
-            "import_batch": f"screen-{datetime.utcnow().isoformat()}"
-        })
-        catalog_entries.append({
-            "name": vp_name,
-            "unit_price": vp_price,
-            "class": "equipment",
-            "vendor": vp_vendor,
-            "power_watts": 0.0,
-            "department": vp_department,
         })
     # Конструктив для установки LED‑экрана (добавляется, если выбран соответствующий флаг)
     # Конструктив представляет собой раму или набор крепежей для монтажа экрана.
@@ -4152,52 +4370,333 @@ def open_screen_master(page: Any) -> None:
             struct_price = float(dlg.spin_structure_price.value() or 0.0)
         except Exception:
             struct_price = 0.0
-        struct_name = f"Конструктив для LED {id_val} {fmt_num(width, 2)}×{fmt_num(height, 2)} м"
+        struct_name = f"Конструктив для LED {dim_suffix}"
         items_for_db.append({
-            "project_id": page.project_id,
-            "type": "equipment",
-            "group_name": group_name_screen,
+            **base_item,
             "name": struct_name,
             "qty": 1.0,
-            "coeff": 1.0,
             "amount": struct_price,
             "unit_price": struct_price,
-            "source_file": "SCREEN_MASTER",
             # Для конструктивов используем те же подрядчика и отдел, что и для экрана
             "vendor": vendor,
             "department": department,
-            "zone": "",
-            "power_watts": 0.0,
-            "import_batch": f"screen-{datetime.utcnow().isoformat()}"
-        })
-        catalog_entries.append({
-            "name": struct_name,
-            "unit_price": struct_price,
-            "class": "equipment",
-            "vendor": vendor,
-            "power_watts": 0.0,
-            "department": department,
         })
 
+    # Записи каталога соответствуют позициям проекта один к одному
+    catalog_entries: List[Dict[str, Any]] = [
+        {
+            "name": it["name"],
+            "unit_price": it["unit_price"],
+            "class": "equipment",
+            "vendor": it["vendor"],
+            "power_watts": it["power_watts"],
+            "department": it["department"],
+        }
+        for it in items_for_db
+    ]
     # Запись в базу
     try:
-        page.db.add_items_bulk(items_for_db)
-        # Обновляем/добавляем в каталог
-        if hasattr(page.db, "catalog_add_or_ignore"):
-            page.db.catalog_add_or_ignore(catalog_entries)
+        # Позиции проекта и пополнение каталога записываются одной
+        # транзакцией: один коммит, при ошибке откатывается всё
+        new_ids = page.db.add_items_with_catalog(items_for_db, catalog_entries, return_ids=True)
+        # Фиксируем действие для UNDO: весь пакет экрана удаляется целиком
+        page._last_action = {
+            "type": "manual_add",
+            "project_id": page.project_id,
+            "batch": screen_batch,
+        }
+        with suppress(Exception):
+            page.btn_undo_summary.setEnabled(True)
         page._log(f"Мастер экрана: добавлено позиций {len(items_for_db)} (площадь {fmt_num(area_qty,2)} м², цена {fmt_num(price_per_m2,2)}).")
         QtWidgets.QMessageBox.information(page, "Готово", f"Экран и аксессуары добавлены ({len(items_for_db)} позиций).")
     except Exception as ex:
         page._log(f"Мастер экрана: ошибка добавления: {ex}", "error")
         QtWidgets.QMessageBox.critical(page, "Ошибка", f"Не удалось добавить экран: {ex}")
-        return
+        return None
     # Обновляем таблицы сметы
-    try:
-        page._reload_zone_tabs()
-    except Exception:
-        pass
+    _schedule_zone_reload(page)
+    return new_ids
 
 # 22. Универсальный мастер добавления
+class MasterAddDialog(QtWidgets.QDialog):
+    """
+    Диалог универсального мастера добавления.
+
+    Отображает название зоны и пять кнопок для добавления различных
+    сущностей: экран, колонки, коммутация, подиум и технический директор.
+    Каждая кнопка вызывает соответствующий метод, который выполняет
+    расчёты и добавляет записи в БД. После успешного добавления
+    происходит перезагрузка таблиц сметы.
+
+    Экземпляр создаётся один раз на страницу проекта и переиспользуется
+    при повторных открытиях; зона задаётся через :meth:`set_zone`.
+    """
+    def __init__(self, parent_page: Any, zone: str) -> None:  # type: ignore
+        super().__init__(parent_page)
+        self.page = parent_page
+        self.zone_name = zone
+        # Курсор БД для запросов обработчиков; диалог переиспользуется между
+        # открытиями, поэтому курсор создаётся один раз на страницу проекта
+        self._cur = parent_page.db._conn.cursor()
+        self.setWindowTitle("Мастер добавления")
+        self.resize(400, 300)
+        # Основная вертикальная компоновка для диалога
+        v = QtWidgets.QVBoxLayout(self)
+        v.setContentsMargins(8, 8, 8, 8)
+        v.setSpacing(6)
+        # Создаём вкладки: первая вкладка содержит основные кнопки, вторая — настройки
+        tabs = QtWidgets.QTabWidget()
+        # ---- Первая вкладка: основные действия ----
+        tab_main = QtWidgets.QWidget(); layout_main = QtWidgets.QVBoxLayout(tab_main)
+        layout_main.setContentsMargins(4, 4, 4, 4)
+        layout_main.setSpacing(6)
+        self.lbl_zone = QtWidgets.QLabel()
+        self.set_zone(zone)
+        layout_main.addWidget(self.lbl_zone)
+        btn_screen = QtWidgets.QPushButton("Добавить экран")
+        btn_column = QtWidgets.QPushButton("Добавить колонки")
+        btn_commut = QtWidgets.QPushButton("Добавить коммутацию")
+        btn_stage = QtWidgets.QPushButton("Добавить подиум")
+        btn_director = QtWidgets.QPushButton("Добавить тех. директора")
+        btn_screen.clicked.connect(self._add_screen)
+        btn_column.clicked.connect(self._add_column)
+        btn_commut.clicked.connect(self._add_commutation)
+        btn_stage.clicked.connect(self._add_stage)
+        btn_director.clicked.connect(self._add_director)
+        for b in (btn_screen, btn_column, btn_commut, btn_stage, btn_director):
+            layout_main.addWidget(b)
+        layout_main.addStretch(1)
+        # ---- Вторая вкладка: настройки ----
+        tab_settings = QtWidgets.QWidget(); layout_settings = QtWidgets.QVBoxLayout(tab_settings)
+        layout_settings.setContentsMargins(4, 4, 4, 4)
+        layout_settings.setSpacing(6)
+        # Пока вторая вкладка содержит заглушку. Здесь в будущем будут преднастройки кнопок мастера.
+        placeholder = QtWidgets.QLabel(
+            "Настройки предустановок для кнопок мастера будут реализованы здесь.\n"
+            "Например, выбор витых пар и процессоров для LED‑экрана,\n"
+            "галочка \"Добавить конструктив\" и другие параметры."
+        )
+        placeholder.setWordWrap(True)
+        layout_settings.addWidget(placeholder)
+        layout_settings.addStretch(1)
+        # Добавляем вкладки в TabWidget
+        tabs.addTab(tab_main, "Добавление")
+        tabs.addTab(tab_settings, "Настройки")
+        # Добавляем TabWidget на основной layout
+        v.addWidget(tabs)
+        # Кнопка закрытия находится под вкладками
+        btn_close = QtWidgets.QPushButton("Закрыть")
+        btn_close.clicked.connect(self.reject)
+        v.addWidget(btn_close, alignment=QtCore.Qt.AlignRight)
+    def set_zone(self, zone: str) -> None:
+        """Задаёт активную зону и обновляет её подпись."""
+        self.zone_name = zone
+        if self.zone_name:
+            self.lbl_zone.setText(f"Текущая зона: {self.zone_name}")
+        else:
+            self.lbl_zone.setText("Текущая зона не выбрана")
+    def _add_screen(self) -> None:
+        # Мастер возвращает id добавленных записей
+        new_ids = open_screen_master(self.page) or []
+        try:
+            # Назначаем зону всем новым записям мастера одним UPDATE
+            updated = self.page.db.update_items_fields_by_ids(
+                new_ids, {"zone": self.zone_name or ""},
+            )
+            if updated:
+                try:
+                    if hasattr(self.page, "_log"):
+                        self.page._log(f"Мастер добавления: экран добавлен в зону '{self.zone_name}'.")
+                except Exception:
+                    pass
+        except Exception as ex:
+            try:
+                if hasattr(self.page, "_log"):
+                    self.page._log(f"Мастер добавления: ошибка при назначении зоны экрана: {ex}", "error")
+            except Exception:
+                pass
+        _schedule_zone_reload(self.page)
+        self.accept()
+    def _add_column(self) -> None:
+        # Перед добавлением колонок запрашиваем подрядчика. Если пользователь
+        # отменил ввод, действие прерываем. Отдел для колонок всегда "звук".
+        vendor_name, ok = QtWidgets.QInputDialog.getText(
+            self, "Подрядчик колонок", "Введите название подрядчика для аудиосистемы:",
+            text=""
+        )
+        if not ok:
+            return
+        vendor_name = normalize_case(vendor_name.strip()) if vendor_name else ""
+        new_ids = open_column_master(self.page) or []
+        try:
+            # Обновляем зону, подрядчика и отдел у всех новых записей
+            # аудиосистемы одним UPDATE
+            updated = self.page.db.update_items_fields_by_ids(
+                new_ids,
+                {
+                    "zone": self.zone_name or "",
+                    "vendor": vendor_name,
+                    "department": _DEPT_SOUND,
+                },
+            )
+            if updated:
+                try:
+                    if hasattr(self.page, "_log"):
+                        self.page._log(
+                            f"Мастер добавления: колонки добавлены в зону '{self.zone_name}'"
+                            f" с подрядчиком '{vendor_name or 'не указан'}' и отделом 'звук'."
+                        )
+                except Exception:
+                    pass
+        except Exception as ex:
+            try:
+                if hasattr(self.page, "_log"):
+                    self.page._log(f"Мастер добавления: ошибка при назначении зоны колонок: {ex}", "error")
+            except Exception:
+                pass
+        _schedule_zone_reload(self.page)
+        self.accept()
+    def _add_commutation(self) -> None:
+        # Запрашиваем подрядчика для коммутации. Если пользователь отменил ввод — выход.
+        vendor_name, ok = QtWidgets.QInputDialog.getText(
+            self, "Подрядчик коммутации", "Введите название подрядчика для коммутации:",
+            text=""
+        )
+        if not ok:
+            return
+        vendor_name = normalize_case(vendor_name.strip()) if vendor_name else ""
+        try:
+            cur = self._cur
+            cur.execute(
+                "SELECT COALESCE(SUM(amount),0) FROM items WHERE project_id=? AND COALESCE(zone,'')=? AND type='equipment'",
+                (self.page.project_id, self.zone_name or ""),
+            )
+            row = cur.fetchone()
+            total_equipment = float(row[0] or 0.0)
+        except Exception as ex:
+            total_equipment = 0.0
+            try:
+                if hasattr(self.page, "_log"):
+                    self.page._log(f"Мастер добавления: ошибка чтения суммы оборудования: {ex}", "error")
+            except Exception:
+                pass
+        comm_sum = total_equipment * 0.015
+        if comm_sum <= 0:
+            QtWidgets.QMessageBox.information(self, "Внимание", "В выбранной зоне нет оборудования класса 'оборудование' для расчёта коммутации.")
+            return
+        batch = f"commutation-{datetime.utcnow().isoformat()}"
+        item = {
+            "project_id": self.page.project_id,
+            "type": "other",
+            "group_name": "Коммутация",
+            "name": "Коммутация",
+            "qty": 1.0,
+            "coeff": 1.0,
+            "amount": comm_sum,
+            "unit_price": comm_sum,
+            "source_file": "COMMUTATION_MASTER",
+            "vendor": vendor_name,
+            "department": "",
+            "zone": self.zone_name or "",
+            "power_watts": 0.0,
+            "import_batch": batch,
+        }
+        try:
+            # Позиция и запись каталога фиксируются одной транзакцией
+            self.page.db.add_items_with_catalog([item], [
+                {
+                    "name": item["name"],
+                    "unit_price": item["unit_price"],
+                    "class": "other",
+                    "vendor": "",
+                    "power_watts": 0.0,
+                    "department": "",
+                }
+            ])
+            if hasattr(self.page, "_log"):
+                self.page._log(
+                    f"Мастер добавления: добавлена коммутация в зону '{self.zone_name}' на сумму {fmt_num(comm_sum,2)}."
+                )
+        except Exception as ex:
+            try:
+                if hasattr(self.page, "_log"):
+                    self.page._log(f"Мастер добавления: ошибка при добавлении коммутации: {ex}", "error")
+            except Exception:
+                pass
+            QtWidgets.QMessageBox.critical(self, "Ошибка", f"Не удалось добавить коммутацию: {ex}")
+            return
+        _schedule_zone_reload(self.page)
+        self.accept()
+    def _add_stage(self) -> None:
+        try:
+            open_stage_master(self.page, self.zone_name or "")
+        except Exception as ex:
+            try:
+                if hasattr(self.page, "_log"):
+                    self.page._log(f"Мастер добавления: ошибка при открытии мастера подиума: {ex}", "error")
+            except Exception:
+                pass
+            QtWidgets.QMessageBox.critical(self, "Ошибка", f"Не удалось открыть мастер подиума: {ex}")
+            return
+        self.accept()
+    def _add_director(self) -> None:
+        try:
+            total = float(self.page.db.project_total(self.page.project_id))
+        except Exception:
+            total = 0.0
+        if total <= 0.0:
+            QtWidgets.QMessageBox.information(self, "Внимание", "Сумма проекта равна нулю, нечего начислять.")
+            return
+        director_amount = total * 0.10
+        batch = f"techdir-{datetime.utcnow().isoformat()}"
+        # При добавлении тех. директора создаём позицию в зоне "Техдирекция" с подрядчиком "техдиректор"
+        default_zone = "Техдирекция"
+        default_vendor = _VENDOR_TECHDIR
+        item = {
+            "project_id": self.page.project_id,
+            # Для тех. директора используем тип 'personnel', чтобы позиция относилась к классу "Персонал"
+            "type": "personnel",
+            "group_name": "Технический директор",
+            "name": "Технический директор",
+            "qty": 1.0,
+            "coeff": 1.0,
+            "amount": director_amount,
+            "unit_price": director_amount,
+            "source_file": "TECHDIR_MASTER",
+            "vendor": default_vendor,
+            "department": "",
+            "zone": default_zone,
+            "power_watts": 0.0,
+            "import_batch": batch,
+        }
+        try:
+            # Позиция и запись каталога фиксируются одной транзакцией
+            self.page.db.add_items_with_catalog([item], [
+                {
+                    "name": item["name"],
+                    "unit_price": item["unit_price"],
+                    # В каталоге класс также должен быть 'personnel'
+                    "class": "personnel",
+                    "vendor": "",
+                    "power_watts": 0.0,
+                    "department": "",
+                }
+            ])
+            if hasattr(self.page, "_log"):
+                self.page._log(
+                    f"Мастер добавления: добавлен технический директор на сумму {fmt_num(director_amount,2)} (10% от {fmt_num(total,2)})."
+                )
+        except Exception as ex:
+            try:
+                if hasattr(self.page, "_log"):
+                    self.page._log(f"Мастер добавления: ошибка при добавлении технического директора: {ex}", "error")
+            except Exception:
+                pass
+            QtWidgets.QMessageBox.critical(self, "Ошибка", f"Не удалось добавить технического директора: {ex}")
+            return
+        _schedule_zone_reload(self.page)
+        self.accept()
+
 def open_master_addition(page: Any) -> None:
     """
     Открывает универсальный мастер добавления различных элементов в смету.
@@ -4234,321 +4733,325 @@ def open_master_addition(page: Any) -> None:
             page._log(f"Универсальный мастер добавления: открыт диалог для зоны '{zone_name}'.")
     except Exception:
         pass
-    class MasterAddDialog(QtWidgets.QDialog):
-        """
-        Внутренний диалог универсального мастера добавления.
+    # 22.4 Диалог создаётся один раз и переиспользуется при повторных открытиях
+    dlg = getattr(page, "_master_add_dialog", None)
+    if dlg is None:
+        dlg = MasterAddDialog(page, zone_name)
+        page._master_add_dialog = dlg
+    else:
+        dlg.set_zone(zone_name)
+    dlg.exec()
 
-        Отображает название зоны и пять кнопок для добавления различных
-        сущностей: экран, колонки, коммутация, подиум и технический директор.
-        Каждая кнопка вызывает соответствующий метод, который выполняет
-        расчёты и добавляет записи в БД. После успешного добавления
-        происходит перезагрузка таблиц сметы.
-        """
-        def __init__(self, parent_page: Any, zone: str) -> None:  # type: ignore
-            super().__init__(parent_page)
-            self.page = parent_page
-            self.zone_name = zone
-            self.setWindowTitle("Мастер добавления")
-            self.resize(400, 300)
-            # Основная вертикальная компоновка для диалога
-            v = QtWidgets.QVBoxLayout(self)
-            v.setContentsMargins(8, 8, 8, 8)
-            v.setSpacing(6)
-            # Создаём вкладки: первая вкладка содержит основные кнопки, вторая — настройки
-            tabs = QtWidgets.QTabWidget()
-            # ---- Первая вкладка: основные действия ----
-            tab_main = QtWidgets.QWidget(); layout_main = QtWidgets.QVBoxLayout(tab_main)
-            layout_main.setContentsMargins(4, 4, 4, 4)
-            layout_main.setSpacing(6)
-            lbl_zone = QtWidgets.QLabel()
-            if self.zone_name:
-                lbl_zone.setText(f"Текущая зона: {self.zone_name}")
-            else:
-                lbl_zone.setText("Текущая зона не выбрана")
-            layout_main.addWidget(lbl_zone)
-            btn_screen = QtWidgets.QPushButton("Добавить экран")
-            btn_column = QtWidgets.QPushButton("Добавить колонки")
-            btn_commut = QtWidgets.QPushButton("Добавить коммутацию")
-            btn_stage = QtWidgets.QPushButton("Добавить подиум")
-            btn_director = QtWidgets.QPushButton("Добавить тех. директора")
-            btn_screen.clicked.connect(self._add_screen)
-            btn_column.clicked.connect(self._add_column)
-            btn_commut.clicked.connect(self._add_commutation)
-            btn_stage.clicked.connect(self._add_stage)
-            btn_director.clicked.connect(self._add_director)
-            for b in (btn_screen, btn_column, btn_commut, btn_stage, btn_director):
-                layout_main.addWidget(b)
-            layout_main.addStretch(1)
-            # ---- Вторая вкладка: настройки ----
-            tab_settings = QtWidgets.QWidget(); layout_settings = QtWidgets.QVBoxLayout(tab_settings)
-            layout_settings.setContentsMargins(4, 4, 4, 4)
-            layout_settings.setSpacing(6)
-            # Пока вторая вкладка содержит заглушку. Здесь в будущем будут преднастройки кнопок мастера.
-            placeholder = QtWidgets.QLabel(
-                "Настройки предустановок для кнопок мастера будут реализованы здесь.\n"
-                "Например, выбор витых пар и процессоров для LED‑экрана,\n"
-                "галочка \"Добавить конструктив\" и другие параметры."
-            )
-            placeholder.setWordWrap(True)
-            layout_settings.addWidget(placeholder)
-            layout_settings.addStretch(1)
-            # Добавляем вкладки в TabWidget
-            tabs.addTab(tab_main, "Добавление")
-            tabs.addTab(tab_settings, "Настройки")
-            # Добавляем TabWidget на основной layout
-            v.addWidget(tabs)
-            # Кнопка закрытия находится под вкладками
-            btn_close = QtWidgets.QPushButton("Закрыть")
-            btn_close.clicked.connect(self.reject)
-            v.addWidget(btn_close, alignment=QtCore.Qt.AlignRight)
-        def _add_screen(self) -> None:
-            # Сохраняем максимальный id перед вызовом мастера
-            try:
-                cur = self.page.db._conn.cursor()
-                row = cur.execute("SELECT COALESCE(MAX(id),0) FROM items").fetchone()
-                max_id_before = int(row[0]) if row and row[0] is not None else 0
-            except Exception:
-                max_id_before = 0
-            open_screen_master(self.page)
-            try:
-                cur = self.page.db._conn.cursor()
-                cur.execute(
-                    "SELECT id FROM items WHERE id>? AND project_id=? AND COALESCE(source_file,'')='SCREEN_MASTER'",
-                    (max_id_before, self.page.project_id),
-                )
-                rows = cur.fetchall()
-                for r in rows:
-                    try:
-                        it_id = int(r[0])
-                        self.page.db.update_item_field(it_id, "zone", self.zone_name or "")
-                    except Exception:
-                        continue
-                if rows:
-                    try:
-                        if hasattr(self.page, "_log"):
-                            self.page._log(f"Мастер добавления: экран добавлен в зону '{self.zone_name}'.")
-                    except Exception:
-                        pass
-            except Exception as ex:
-                try:
-                    if hasattr(self.page, "_log"):
-                        self.page._log(f"Мастер добавления: ошибка при назначении зоны экрана: {ex}", "error")
-                except Exception:
-                    pass
-            try:
-                self.page._reload_zone_tabs()
-            except Exception:
-                pass
-            self.accept()
-        def _add_column(self) -> None:
-            # Перед добавлением колонок запрашиваем подрядчика. Если пользователь
-            # отменил ввод, действие прерываем. Отдел для колонок всегда "звук".
-            vendor_name, ok = QtWidgets.QInputDialog.getText(
-                self, "Подрядчик колонок", "Введите название подрядчика для аудиосистемы:",
-                text=""
-            )
-            if not ok:
-                return
-            vendor_name = normalize_case(vendor_name.strip()) if vendor_name else ""
-            try:
-                cur = self.page.db._conn.cursor()
-                row = cur.execute("SELECT COALESCE(MAX(id),0) FROM items").fetchone()
-                max_id_before = int(row[0]) if row and row[0] is not None else 0
-            except Exception:
-                max_id_before = 0
-            open_column_master(self.page)
-            try:
-                cur = self.page.db._conn.cursor()
-                cur.execute(
-                    "SELECT id FROM items WHERE id>? AND project_id=? AND COALESCE(source_file,'')='COLUMN_MASTER'",
-                    (max_id_before, self.page.project_id),
-                )
-                rows = cur.fetchall()
-                for r in rows:
-                    try:
-                        it_id = int(r[0])
-                        # Обновляем зону, подрядчика и отдел у каждой новой записи аудиосистемы
-                        self.page.db.update_item_fields(it_id, {
-                            "zone": self.zone_name or "",
-                            "vendor": vendor_name,
-                            "department": normalize_case("звук")
-                        })
-                    except Exception:
-                        continue
-                if rows:
-                    try:
-                        if hasattr(self.page, "_log"):
-                            self.page._log(
-                                f"Мастер добавления: колонки добавлены в зону '{self.zone_name}'"
-                                f" с подрядчиком '{vendor_name or 'не указан'}' и отделом 'звук'."
-                            )
-                    except Exception:
-                        pass
-            except Exception as ex:
-                try:
-                    if hasattr(self.page, "_log"):
-                        self.page._log(f"Мастер добавления: ошибка при назначении зоны колонок: {ex}", "error")
-                except Exception:
-                    pass
-            try:
-                self.page._reload_zone_tabs()
-            except Exception:
-                pass
-            self.accept()
-        def _add_commutation(self) -> None:
-            # Запрашиваем подрядчика для коммутации. Если пользователь отменил ввод — выход.
-            vendor_name, ok = QtWidgets.QInputDialog.getText(
-                self, "Подрядчик коммутации", "Введите название подрядчика для коммутации:",
-                text=""
-            )
-            if not ok:
-                return
-            vendor_name = normalize_case(vendor_name.strip()) if vendor_name else ""
-            try:
-                cur = self.page.db._conn.cursor()
-                cur.execute(
-                    "SELECT COALESCE(SUM(amount),0) FROM items WHERE project_id=? AND COALESCE(zone,'')=? AND type='equipment'",
-                    (self.page.project_id, self.zone_name or ""),
-                )
-                row = cur.fetchone()
-                total_equipment = float(row[0] or 0.0)
-            except Exception as ex:
-                total_equipment = 0.0
-                try:
-                    if hasattr(self.page, "_log"):
-                        self.page._log(f"Мастер добавления: ошибка чтения суммы оборудования: {ex}", "error")
-                except Exception:
-                    pass
-            comm_sum = total_equipment * 0.015
-            if comm_sum <= 0:
-                QtWidgets.QMessageBox.information(self, "Внимание", "В выбранной зоне нет оборудования класса 'оборудование' для расчёта коммутации.")
-                return
-            import datetime
-            batch = f"commutation-{datetime.datetime.utcnow().isoformat()}"
-            item = {
-                "project_id": self.page.project_id,
-                "type": "other",
-                "group_name": "Коммутация",
-                "name": "Коммутация",
-                "qty": 1.0,
-                "coeff": 1.0,
-                "amount": comm_sum,
-                "unit_price": comm_sum,
-                "source_file": "COMMUTATION_MASTER",
-                "vendor": vendor_name,
-                "department": "",
-                "zone": self.zone_name or "",
+# 23. Мастер добавления сценического подиума
+def _stage_segment_count(length: float, big: float, small: float) -> int:
+    """
+    Число сегментов при жадном разбиении length на отрезки big, а остатка —
+    на отрезки small (неполный остаток добивается целым small). Считается
+    арифметикой, без построения списка сегментов; допуск 1e-6 м.
+    """
+    eps = 1e-6
+    if length <= eps:
+        return 0
+    n_big = int((length + eps) // big)
+    rest = length - n_big * big
+    if rest <= eps:
+        return n_big
+    return n_big + (1 if rest <= small + eps else 2)
+
+
+class StageMasterDialog(QtWidgets.QDialog):
+    """Диалог мастера сценического подиума (см. open_stage_master)."""
+    def __init__(self, parent_page: Any, zone: str) -> None:  # type: ignore
+        super().__init__(parent_page)
+        self.page = parent_page
+        self.zone_name = zone
+        # Метка пакета подиума: одна на диалог (повторное нажатие OK после
+        # ошибки использует её же), без форматирования даты
+        self._batch = f"stage-{time.time_ns()}"
+        # Возможности страницы и БД не меняются за время жизни диалога —
+        # проверяем их один раз
+        self._log = getattr(parent_page, "_log", None)
+        self._has_distinct = hasattr(parent_page.db, "catalog_distinct_values")
+        self._vendors_generation: Optional[int] = None
+        self.setWindowTitle("Добавление сценического подиума")
+        self.resize(460, 360)
+        layout = QtWidgets.QVBoxLayout(self)
+        layout.setContentsMargins(8, 8, 8, 8)
+        layout.setSpacing(6)
+        form = QtWidgets.QFormLayout()
+        form.setLabelAlignment(QtCore.Qt.AlignmentFlag.AlignRight | QtCore.Qt.AlignmentFlag.AlignVCenter)
+        # Размеры подиума (ширина, глубина, высота)
+        self.ed_width = QtWidgets.QDoubleSpinBox()
+        self.ed_width.setDecimals(2)
+        self.ed_width.setRange(0.5, 100.0)
+        self.ed_width.setValue(2.0)
+        self.ed_width.setSuffix(" м")
+        self.ed_depth = QtWidgets.QDoubleSpinBox()
+        self.ed_depth.setDecimals(2)
+        self.ed_depth.setRange(0.5, 100.0)
+        self.ed_depth.setValue(2.0)
+        self.ed_depth.setSuffix(" м")
+        self.ed_height = QtWidgets.QDoubleSpinBox()
+        self.ed_height.setDecimals(0)
+        self.ed_height.setRange(10.0, 300.0)
+        self.ed_height.setValue(80.0)
+        self.ed_height.setSuffix(" см")
+        form.addRow("Ширина:", self.ed_width)
+        form.addRow("Глубина:", self.ed_depth)
+        form.addRow("Высота:", self.ed_height)
+
+        # Номер подиума. Пользователь может указать любой номер,
+        # по умолчанию предлагается следующий после существующих.
+        self.spin_stage = QtWidgets.QSpinBox()
+        self.spin_stage.setRange(1, 9999)
+        self.spin_stage.setValue(self._default_stage_number())
+        form.addRow("Номер подиума:", self.spin_stage)
+
+        # Параметры ковралина: чекбокс и цена за м²
+        self.chk_carpet = QtWidgets.QCheckBox("Добавить ковралин")
+        self.chk_carpet.setChecked(False)
+        self.price_carpet = self._mk_money(" ₽/м²")
+        carpet_layout = QtWidgets.QHBoxLayout()
+        carpet_layout.addWidget(self.chk_carpet)
+        carpet_layout.addWidget(self.price_carpet)
+        form.addRow("Ковралин:", carpet_layout)
+
+        # Параметры рауса: чекбокс и цена за погонный метр
+        self.chk_raus = QtWidgets.QCheckBox("Добавить раус")
+        self.chk_raus.setChecked(False)
+        self.price_raus = self._mk_money(" ₽/м")
+        raus_layout = QtWidgets.QHBoxLayout()
+        raus_layout.addWidget(self.chk_raus)
+        raus_layout.addWidget(self.price_raus)
+        form.addRow("Раус:", raus_layout)
+        self.spin_steps = QtWidgets.QSpinBox()
+        self.spin_steps.setRange(0, 10)
+        self.spin_steps.setValue(1)
+        form.addRow("Ступенек:", self.spin_steps)
+        self.price_2x1 = self._mk_money()
+        self.price_1x1 = self._mk_money()
+        self.price_1x0_5 = self._mk_money()
+        self.price_step = self._mk_money()
+        self.price_leg = self._mk_money()
+        form.addRow("Цена 2×1 м:", self.price_2x1)
+        form.addRow("Цена 1×1 м:", self.price_1x1)
+        form.addRow("Цена 1×0.5 м:", self.price_1x0_5)
+        form.addRow("Цена ступеньки:", self.price_step)
+        form.addRow("Цена одной ноги:", self.price_leg)
+        self.chk_ship = QtWidgets.QCheckBox("Использовать шип‑паз (общие ноги)")
+        self.chk_ship.setChecked(False)
+        form.addRow("Режим ног:", self.chk_ship)
+
+        # 23.a Выбор подрядчика для подиума
+        # Создаём выпадающий список подрядчиков, чтобы пользователь мог указать,
+        # от какого подрядчика заказывается сценический подиум. Список
+        # формируется на основе уникальных подрядчиков в каталоге. Поле editable,
+        # чтобы была возможность ввести нового подрядчика вручную. Список
+        # заполняется при первом открытии/фокусе, а не при создании диалога.
+        self.cmb_vendor = LazyComboBox(self._load_vendors)
+        self.cmb_vendor.setEditable(True)
+        # По умолчанию подрядчик не выбран
+        form.addRow("Подрядчик:", self.cmb_vendor)
+        layout.addLayout(form)
+        btns = QtWidgets.QDialogButtonBox(QtWidgets.QDialogButtonBox.Ok | QtWidgets.QDialogButtonBox.Cancel)
+        layout.addWidget(btns)
+        btns.accepted.connect(self.accept)
+        btns.rejected.connect(self.reject)
+        # accept method defined below at class level
+
+    def _default_stage_number(self) -> int:
+        """Предлагаемый номер: максимальный номер подиума зоны + 1
+        (номер извлекается и агрегируется в SQLite)."""
+        try:
+            return self.page.db.project_max_name_number(
+                self.page.project_id, "Сценический подиум №", self.zone_name or ""
+            ) + 1
+        except Exception:
+            return 1
+
+    def reset_values(self, zone: str) -> None:
+        """
+        Подготавливает сохранённый диалог к повторному открытию: новая зона,
+        новая метка пакета, следующий номер подиума и значения по умолчанию.
+        Список подрядчиков перечитывается, только если каталог изменился.
+        """
+        self.zone_name = zone
+        self._batch = f"stage-{time.time_ns()}"
+        self.ed_width.setValue(2.0)
+        self.ed_depth.setValue(2.0)
+        self.ed_height.setValue(80.0)
+        self.spin_stage.setValue(self._default_stage_number())
+        self.chk_carpet.setChecked(False)
+        self.chk_raus.setChecked(False)
+        self.spin_steps.setValue(1)
+        for spin in (self.price_carpet, self.price_raus, self.price_2x1, self.price_1x1,
+                     self.price_1x0_5, self.price_step, self.price_leg):
+            spin.setValue(0.0)
+        self.chk_ship.setChecked(False)
+        self.cmb_vendor.setCurrentIndex(-1)
+        self.cmb_vendor.setEditText("")
+        # Каталог изменился после загрузки списка (импорт, другие мастера,
+        # правка базы) — подрядчики перечитываются при следующем открытии
+        # списка; catalog_distinct_values обычно отвечает из кэша
+        if self._vendors_generation != getattr(self.page.db, "_catalog_generation", None):
+            self.cmb_vendor.rearm()
+
+    @staticmethod
+    def _mk_money(suffix: str = " ₽") -> QtWidgets.QDoubleSpinBox:
+        """Создаёт поле цены: 2 знака, диапазон 0…1 000 000, значение 0."""
+        spin = QtWidgets.QDoubleSpinBox()
+        spin.setDecimals(2)
+        spin.setRange(0.0, 1_000_000.0)
+        spin.setSuffix(suffix)
+        return spin
+
+    def _load_vendors(self, combo: QtWidgets.QComboBox) -> None:
+        """Заполняет список подрядчиков уникальными значениями из каталога."""
+        # Поколение каталога, по которому построен список (см. reset_values)
+        self._vendors_generation = getattr(self.page.db, "_catalog_generation", None)
+        vendors: list[str] = []
+        try:
+            if self._has_distinct:
+                vendors = self.page.db.catalog_distinct_values("vendor") or []
+        except Exception:
+            vendors = []
+        # Добавляем непустые имена подрядчиков без повторов без учёта
+        # регистра (как прежняя проверка findText с MatchFixedString):
+        # множество вместо поиска по списку и одна вставка пачкой
+        seen: Set[str] = set()
+        unique: List[str] = []
+        for v in vendors:
+            if v and v.strip():
+                key = v.casefold()
+                if key not in seen:
+                    seen.add(key)
+                    unique.append(v)
+        combo.addItems(unique)
+
+    def accept(self) -> None:  # type: ignore
+        """Собирает параметры подиума, рассчитывает необходимые элементы и добавляет их в смету."""
+        # Сохраняем выбранного подрядчика. Если пользователь оставил поле пустым,
+        # используем пустую строку. Это значение применяется ко всем позициям подиума
+        # и очищается как в add_items_bulk (неразрывные/тонкие пробелы, табы,
+        # управляющие символы), чтобы вставленное из буфера имя не давало
+        # отдельную группу подрядчика.
+        vendor_selected = self.page.db._clean_item_value(self.cmb_vendor.currentText())
+        # Получаем основные размеры и параметры. QDoubleSpinBox/QSpinBox
+        # возвращают float/int, поэтому значения читаются без преобразований
+        w = self.ed_width.value()
+        d = self.ed_depth.value()
+        steps = self.spin_steps.value()
+        price_2x1 = self.price_2x1.value()
+        price_1x1 = self.price_1x1.value()
+        price_1x0_5 = self.price_1x0_5.value()
+        price_step = self.price_step.value()
+        price_leg = self.price_leg.value()
+        use_ship = self.chk_ship.isChecked()
+        # Номер сцены, указанный пользователем
+        stage_id = self.spin_stage.value()
+        # Сохраняем цены ковралина и рауса (если включены)
+        carpet_enabled = self.chk_carpet.isChecked()
+        price_carpet = self.price_carpet.value() if carpet_enabled else 0.0
+        raus_enabled = self.chk_raus.isChecked()
+        price_raus = self.price_raus.value() if raus_enabled else 0.0
+        # Считаем количество модулей каждого типа. Чтобы максимизировать количество модулей 2×1 м,
+        # используем площадь сцены. Однотипные модули считают по правилу:
+        # максимально заполняем площадь экрана модулями 2×1 (или 1×2), затем оставшаяся площадь
+        # покрывается модулями 1×1, а остаток в 0.5 м² закрывается 1×0.5 м. Такой подход
+        # позволяет, например, для сцены 5×3 м получить 7 модулей 2×1 и один модуль 1×1.
+        total_area = w * d
+        # округляем до ближайших 0.5 м², чтобы избежать накопления ошибок
+        area_units = round(total_area * 2) / 2.0
+        count_2x1 = int(area_units // 2.0)
+        remaining_units = area_units - count_2x1 * 2.0
+        count_1x1 = int(remaining_units // 1.0)
+        remaining_units -= count_1x1 * 1.0
+        # оставшуюся площадь переводим в количество модулей 1×0.5
+        if remaining_units > 1e-6:
+            count_1x0_5 = int(round(remaining_units / 0.5))
+        else:
+            count_1x0_5 = 0
+        # Количество ножек: зависит от режима (шип‑паз) и наличия ступенек
+        if use_ship:
+            # Сетка общих ног: число сегментов по ширине (2 и 1 м) и глубине
+            # (1 и 0.5 м) нужно только в этом режиме
+            segments_x_count = _stage_segment_count(w, 2.0, 1.0)
+            segments_y_count = _stage_segment_count(d, 1.0, 0.5)
+            legs_count = (segments_x_count + 1) * (segments_y_count + 1) + steps * 4
+        else:
+            legs_count = 4 * (count_2x1 + count_1x1 + count_1x0_5 + steps)
+        batch = self._batch
+        # Высота ног для наименования
+        try:
+            h_cm = int(float(self.ed_height.value()))
+        except Exception:
+            h_cm = int(self.ed_height.value() or 0)
+        # Таблица позиций подиума: (наименование, количество, цена, тип).
+        # Ковралин и раус — расходные материалы (consumable); периметр рауса —
+        # передняя ширина плюс две боковых глубины.
+        specs: list[Tuple[str, float, float, str]] = [
+            (f"Панель подиума 2×1 м №{stage_id}", count_2x1, price_2x1, "equipment"),
+            (f"Панель подиума 1×1 м №{stage_id}", count_1x1, price_1x1, "equipment"),
+            (f"Панель подиума 1×0.5 м №{stage_id}", count_1x0_5, price_1x0_5, "equipment"),
+            (f"Ступенька подиума №{stage_id}", steps, price_step, "equipment"),
+            (f"Нога подиума {h_cm} см №{stage_id}", legs_count, price_leg, "equipment"),
+        ]
+        if carpet_enabled:
+            specs.append((f"Ковралин подиума №{stage_id}", w * d, price_carpet, "consumable"))
+        if raus_enabled:
+            specs.append((f"Раус подиума №{stage_id}", w + 2.0 * d, price_raus, "consumable"))
+        specs = [sp for sp in specs if sp[1] > 0]
+        # Нечего добавлять — закрываем диалог без обращения к БД и
+        # перезагрузки вкладок зон
+        if not specs:
+            super().accept()
+            return
+        # Строки позиций в порядке _DELETE_UNDO_COLUMNS передаются в executemany
+        # кортежами без нормализации, поэтому введённые пользователем подрядчик
+        # (см. выше) и зона очищаются так же, как в add_items_bulk
+        project_id = self.page.project_id
+        group_name = f"Сценический подиум №{stage_id}"
+        zone = self.page.db._clean_item_value(self.zone_name or "")
+        created_at = datetime.utcnow().isoformat()
+        rows: list[Tuple[Any, ...]] = [
+            (project_id, t, group_name, n, q, 1.0, p * q, p, "STAGE_MASTER",
+             created_at, vendor_selected, "", zone, 0.0, batch)
+            for n, q, p, t in specs
+        ]
+        # В каталоге храним класс как тип на английском языке (equipment, consumable и др.)
+        catalog_entries: list[Dict[str, Any]] = [
+            {
+                "name": n,
+                "unit_price": p,
+                "class": t,
+                "vendor": vendor_selected,
                 "power_watts": 0.0,
-                "import_batch": batch,
-            }
-            try:
-                self.page.db.add_items_bulk([item])
-                if hasattr(self.page.db, "catalog_add_or_ignore"):
-                    self.page.db.catalog_add_or_ignore([
-                        {
-                            "name": item["name"],
-                            "unit_price": item["unit_price"],
-                            "class": "other",
-                            "vendor": "",
-                            "power_watts": 0.0,
-                            "department": "",
-                        }
-                    ])
-                if hasattr(self.page, "_log"):
-                    self.page._log(
-                        f"Мастер добавления: добавлена коммутация в зону '{self.zone_name}' на сумму {fmt_num(comm_sum,2)}."
-                    )
-            except Exception as ex:
-                try:
-                    if hasattr(self.page, "_log"):
-                        self.page._log(f"Мастер добавления: ошибка при добавлении коммутации: {ex}", "error")
-                except Exception:
-                    pass
-                QtWidgets.QMessageBox.critical(self, "Ошибка", f"Не удалось добавить коммутацию: {ex}")
-                return
-            try:
-                self.page._reload_zone_tabs()
-            except Exception:
-                pass
-            self.accept()
-        def _add_stage(self) -> None:
-            try:
-                open_stage_master(self.page, self.zone_name or "")
-            except Exception as ex:
-                try:
-                    if hasattr(self.page, "_log"):
-                        self.page._log(f"Мастер добавления: ошибка при открытии мастера подиума: {ex}", "error")
-                except Exception:
-                    pass
-                QtWidgets.QMessageBox.critical(self, "Ошибка", f"Не удалось открыть мастер подиума: {ex}")
-                return
-            self.accept()
-        def _add_director(self) -> None:
-            try:
-                total = float(self.page.db.project_total(self.page.project_id))
-            except Exception:
-                total = 0.0
-            if total <= 0.0:
-                QtWidgets.QMessageBox.information(self, "Внимание", "Сумма проекта равна нулю, нечего начислять.")
-                return
-            director_amount = total * 0.10
-            import datetime
-            batch = f"techdir-{datetime.datetime.utcnow().isoformat()}"
-            # При добавлении тех. директора создаём позицию в зоне "Техдирекция" с подрядчиком "техдиректор"
-            default_zone = "Техдирекция"
-            default_vendor = normalize_case("техдиректор")
-            item = {
-                "project_id": self.page.project_id,
-                # Для тех. директора используем тип 'personnel', чтобы позиция относилась к классу "Персонал"
-                "type": "personnel",
-                "group_name": "Технический директор",
-                "name": "Технический директор",
-                "qty": 1.0,
-                "coeff": 1.0,
-                "amount": director_amount,
-                "unit_price": director_amount,
-                "source_file": "TECHDIR_MASTER",
-                "vendor": default_vendor,
                 "department": "",
-                "zone": default_zone,
-                "power_watts": 0.0,
-                "import_batch": batch,
             }
+            for n, _q, p, t in specs
+        ]
+        # Запись в базу и логирование
+        try:
+            # Позиции подиума и пополнение каталога — одной транзакцией
+            self.page.db.add_item_rows_with_catalog(_DELETE_UNDO_COLUMNS, rows, catalog_entries)
+            if self._log:
+                self._log(
+                    f"Мастер подиума: добавлено {len(rows)} позиций (2×1={count_2x1}, 1×1={count_1x1}, 1×0.5={count_1x0_5}, ступенек={steps}, ног={legs_count}) в зону '{self.zone_name}'."
+                )
+        except Exception as ex:
             try:
-                self.page.db.add_items_bulk([item])
-                if hasattr(self.page.db, "catalog_add_or_ignore"):
-                    self.page.db.catalog_add_or_ignore([
-                        {
-                            "name": item["name"],
-                            "unit_price": item["unit_price"],
-                            # В каталоге класс также должен быть 'personnel'
-                            "class": "personnel",
-                            "vendor": "",
-                            "power_watts": 0.0,
-                            "department": "",
-                        }
-                    ])
-                if hasattr(self.page, "_log"):
-                    self.page._log(
-                        f"Мастер добавления: добавлен технический директор на сумму {fmt_num(director_amount,2)} (10% от {fmt_num(total,2)})."
-                    )
-            except Exception as ex:
-                try:
-                    if hasattr(self.page, "_log"):
-                        self.page._log(f"Мастер добавления: ошибка при добавлении технического директора: {ex}", "error")
-                except Exception:
-                    pass
-                QtWidgets.QMessageBox.critical(self, "Ошибка", f"Не удалось добавить технического директора: {ex}")
-                return
-            try:
-                self.page._reload_zone_tabs()
+                if self._log:
+                    self._log(f"Мастер подиума: ошибка добавления позиций: {ex}", "error")
             except Exception:
                 pass
-            self.accept()
-    dlg = MasterAddDialog(page, zone_name)
-    dlg.exec()
+            QtWidgets.QMessageBox.critical(self, "Ошибка", f"Не удалось добавить подиум: {ex}")
+            return
+        # Обновляем вкладки зон
+        _schedule_zone_reload(self.page)
+        # Закрываем диалог
+        super().accept()
+
 
-# 23. Мастер добавления сценического подиума
 def open_stage_master(page: Any, zone_name: str) -> None:
     """
     Открывает мастер добавления сценического подиума.
@@ -4572,342 +5075,415 @@ def open_stage_master(page: Any, zone_name: str) -> None:
             page._log(f"Мастер подиума: открыт диалог для зоны '{zone_name}'.")
     except Exception:
         pass
-    class StageMasterDialog(QtWidgets.QDialog):
-        def __init__(self, parent_page: Any, zone: str) -> None:  # type: ignore
-            super().__init__(parent_page)
-            self.page = parent_page
-            self.zone_name = zone
-            self.setWindowTitle("Добавление сценического подиума")
-            self.resize(460, 360)
-            layout = QtWidgets.QVBoxLayout(self)
-            layout.setContentsMargins(8, 8, 8, 8)
-            layout.setSpacing(6)
-            form = QtWidgets.QFormLayout()
-            form.setLabelAlignment(QtCore.Qt.AlignmentFlag.AlignRight | QtCore.Qt.AlignmentFlag.AlignVCenter)
-            # Размеры подиума (ширина, глубина, высота)
-            self.ed_width = QtWidgets.QDoubleSpinBox()
-            self.ed_width.setDecimals(2)
-            self.ed_width.setRange(0.5, 100.0)
-            self.ed_width.setValue(2.0)
-            self.ed_width.setSuffix(" м")
-            self.ed_depth = QtWidgets.QDoubleSpinBox()
-            self.ed_depth.setDecimals(2)
-            self.ed_depth.setRange(0.5, 100.0)
-            self.ed_depth.setValue(2.0)
-            self.ed_depth.setSuffix(" м")
-            self.ed_height = QtWidgets.QDoubleSpinBox()
-            self.ed_height.setDecimals(0)
-            self.ed_height.setRange(10.0, 300.0)
-            self.ed_height.setValue(80.0)
-            self.ed_height.setSuffix(" см")
-            form.addRow("Ширина:", self.ed_width)
-            form.addRow("Глубина:", self.ed_depth)
-            form.addRow("Высота:", self.ed_height)
+    # 23.1 Диалог создаётся один раз и переиспользуется при повторных открытиях
+    dlg = getattr(page, "_stage_master_dialog", None)
+    if dlg is None:
+        dlg = StageMasterDialog(page, zone_name)
+        page._stage_master_dialog = dlg
+    else:
+        dlg.reset_values(zone_name)
+    dlg.exec()
 
-            # Номер подиума. Пользователь может указать любой номер,
-            # по умолчанию предлагается следующий после существующих.
-            self.spin_stage = QtWidgets.QSpinBox()
-            self.spin_stage.setRange(1, 9999)
-            # Определяем предложенный номер: ищем существующие подиумы и берём +1
-            try:
-                cur_id = self.page.db._conn.cursor()
-                cur_id.execute(
-                    "SELECT name FROM items WHERE project_id=? AND COALESCE(zone,'')=? AND name LIKE 'Сценический подиум №%'",
-                    (self.page.project_id, self.zone_name or ""),
-                )
-                rows_id = cur_id.fetchall()
-                import re as _re_stage
-                max_stage = 0
-                for r in rows_id:
-                    nm = r[0] if not isinstance(r, dict) else r.get("name")
-                    m = _re_stage.match(r"Сценический подиум №(\d+)", nm or "")
-                    if m:
-                        try:
-                            val = int(m.group(1))
-                            if val > max_stage:
-                                max_stage = val
-                        except Exception:
-                            continue
-                default_stage = max_stage + 1 if max_stage >= 1 else 1
-            except Exception:
-                default_stage = 1
-            self.spin_stage.setValue(default_stage)
-            form.addRow("Номер подиума:", self.spin_stage)
-
-            # Параметры ковралина: чекбокс и цена за м²
-            self.chk_carpet = QtWidgets.QCheckBox("Добавить ковралин")
-            self.chk_carpet.setChecked(False)
-            self.price_carpet = QtWidgets.QDoubleSpinBox()
-            self.price_carpet.setDecimals(2)
-            self.price_carpet.setRange(0.0, 1_000_000.0)
-            self.price_carpet.setValue(0.0)
-            self.price_carpet.setSuffix(" ₽/м²")
-            carpet_layout = QtWidgets.QHBoxLayout()
-            carpet_layout.addWidget(self.chk_carpet)
-            carpet_layout.addWidget(self.price_carpet)
-            form.addRow("Ковралин:", carpet_layout)
-
-            # Параметры рауса: чекбокс и цена за погонный метр
-            self.chk_raus = QtWidgets.QCheckBox("Добавить раус")
-            self.chk_raus.setChecked(False)
-            self.price_raus = QtWidgets.QDoubleSpinBox()
-            self.price_raus.setDecimals(2)
-            self.price_raus.setRange(0.0, 1_000_000.0)
-            self.price_raus.setValue(0.0)
-            self.price_raus.setSuffix(" ₽/м")
-            raus_layout = QtWidgets.QHBoxLayout()
-            raus_layout.addWidget(self.chk_raus)
-            raus_layout.addWidget(self.price_raus)
-            form.addRow("Раус:", raus_layout)
-            self.spin_steps = QtWidgets.QSpinBox()
-            self.spin_steps.setRange(0, 10)
-            self.spin_steps.setValue(1)
-            form.addRow("Ступенек:", self.spin_steps)
-            self.price_2x1 = QtWidgets.QDoubleSpinBox()
-            self.price_2x1.setDecimals(2)
-            self.price_2x1.setRange(0.0, 1_000_000.0)
-            self.price_2x1.setValue(0.0)
-            self.price_2x1.setSuffix(" ₽")
-            self.price_1x1 = QtWidgets.QDoubleSpinBox()
-            self.price_1x1.setDecimals(2)
-            self.price_1x1.setRange(0.0, 1_000_000.0)
-            self.price_1x1.setValue(0.0)
-            self.price_1x1.setSuffix(" ₽")
-            self.price_1x0_5 = QtWidgets.QDoubleSpinBox()
-            self.price_1x0_5.setDecimals(2)
-            self.price_1x0_5.setRange(0.0, 1_000_000.0)
-            self.price_1x0_5.setValue(0.0)
-            self.price_1x0_5.setSuffix(" ₽")
-            self.price_step = QtWidgets.QDoubleSpinBox()
-            self.price_step.setDecimals(2)
-            self.price_step.setRange(0.0, 1_000_000.0)
-            self.price_step.setValue(0.0)
-            self.price_step.setSuffix(" ₽")
-            self.price_leg = QtWidgets.QDoubleSpinBox()
-            self.price_leg.setDecimals(2)
-            self.price_leg.setRange(0.0, 1_000_000.0)
-            self.price_leg.setValue(0.0)
-            self.price_leg.setSuffix(" ₽")
-            form.addRow("Цена 2×1 м:", self.price_2x1)
-            form.addRow("Цена 1×1 м:", self.price_1x1)
-            form.addRow("Цена 1×0.5 м:", self.price_1x0_5)
-            form.addRow("Цена ступеньки:", self.price_step)
-            form.addRow("Цена одной ноги:", self.price_leg)
-            self.chk_ship = QtWidgets.QCheckBox("Использовать шип‑паз (общие ноги)")
-            self.chk_ship.setChecked(False)
-            form.addRow("Режим ног:", self.chk_ship)
-
-            # 23.a Выбор подрядчика для подиума
-            # Создаём выпадающий список подрядчиков, чтобы пользователь мог указать,
-            # от какого подрядчика заказывается сценический подиум. Список
-            # формируется на основе уникальных подрядчиков в каталоге. Поле editable,
-            # чтобы была возможность ввести нового подрядчика вручную.
-            self.cmb_vendor = QtWidgets.QComboBox()
-            self.cmb_vendor.setEditable(True)
-            # Заполняем существующими подрядчиками из каталога
-            vendors: list[str] = []
-            try:
-                if hasattr(self.page.db, "catalog_distinct_values"):
-                    vendors = self.page.db.catalog_distinct_values("vendor") or []
-            except Exception:
-                vendors = []
-            # Добавляем непустые имена подрядчиков
-            for v in vendors:
-                if v and v.strip():
-                    if self.cmb_vendor.findText(v, QtCore.Qt.MatchFlag.MatchFixedString) < 0:
-                        self.cmb_vendor.addItem(v)
-            # По умолчанию подрядчик не выбран
-            form.addRow("Подрядчик:", self.cmb_vendor)
-            layout.addLayout(form)
-            btns = QtWidgets.QDialogButtonBox(QtWidgets.QDialogButtonBox.Ok | QtWidgets.QDialogButtonBox.Cancel)
-            layout.addWidget(btns)
-            btns.accepted.connect(self.accept)
-            btns.rejected.connect(self.reject)
-            # accept method defined below at class level
 
-        def accept(self) -> None:  # type: ignore
-            """Собирает параметры подиума, рассчитывает необходимые элементы и добавляет их в смету."""
-            # Сохраняем выбранного подрядчика. Если пользователь оставил поле пустым,
-            # используем пустую строку. Это значение применяется ко всем позициям подиума.
-            try:
-                vendor_selected = self.cmb_vendor.currentText().strip()
-            except Exception:
-                vendor_selected = ""
-            # Получаем основные размеры и параметры
-            w = float(self.ed_width.value())
-            d = float(self.ed_depth.value())
-            steps = int(self.spin_steps.value())
-            price_2x1 = float(self.price_2x1.value())
-            price_1x1 = float(self.price_1x1.value())
-            price_1x0_5 = float(self.price_1x0_5.value())
-            price_step = float(self.price_step.value())
-            price_leg = float(self.price_leg.value())
-            use_ship = self.chk_ship.isChecked()
-            # Номер сцены, указанный пользователем
-            try:
-                stage_id = int(self.spin_stage.value())
-            except Exception:
-                stage_id = 1
-            # Сохраняем цены ковралина и рауса (если включены)
-            carpet_enabled = self.chk_carpet.isChecked()
-            try:
-                price_carpet = float(self.price_carpet.value()) if carpet_enabled else 0.0
-            except Exception:
-                price_carpet = 0.0
-            raus_enabled = self.chk_raus.isChecked()
-            try:
-                price_raus = float(self.price_raus.value()) if raus_enabled else 0.0
-            except Exception:
-                price_raus = 0.0
-            # Разбиваем размеры на сегменты по 2, 1 и 0.5 метра
-            segments_x: list[float] = []
-            rem_w = w
-            eps = 1e-6
-            while rem_w > eps:
-                if rem_w >= 2.0 - eps:
-                    segments_x.append(2.0)
-                    rem_w -= 2.0
-                elif rem_w >= 1.0 - eps:
-                    segments_x.append(1.0)
-                    rem_w -= 1.0
-                else:
-                    segments_x.append(1.0)
-                    rem_w = 0.0
-            segments_y: list[float] = []
-            rem_d = d
-            while rem_d > eps:
-                if rem_d >= 1.0 - eps:
-                    segments_y.append(1.0)
-                    rem_d -= 1.0
-                elif rem_d >= 0.5 - eps:
-                    segments_y.append(0.5)
-                    rem_d -= 0.5
-                else:
-                    segments_y.append(0.5)
-                    rem_d = 0.0
-            # Считаем количество модулей каждого типа. Чтобы максимизировать количество модулей 2×1 м,
-            # используем площадь сцены. Однотипные модули считают по правилу:
-            # максимально заполняем площадь экрана модулями 2×1 (или 1×2), затем оставшаяся площадь
-            # покрывается модулями 1×1, а остаток в 0.5 м² закрывается 1×0.5 м. Такой подход
-            # позволяет, например, для сцены 5×3 м получить 7 модулей 2×1 и один модуль 1×1.
-            total_area = w * d
-            # округляем до ближайших 0.5 м², чтобы избежать накопления ошибок
-            area_units = round(total_area * 2) / 2.0
-            count_2x1 = int(area_units // 2.0)
-            remaining_units = area_units - count_2x1 * 2.0
-            count_1x1 = int(remaining_units // 1.0)
-            remaining_units -= count_1x1 * 1.0
-            # оставшуюся площадь переводим в количество модулей 1×0.5
-            if remaining_units > 1e-6:
-                count_1x0_5 = int(round(remaining_units / 0.5))
-            else:
-                count_1x0_5 = 0
-            # Количество ножек: зависит от режима (шип‑паз) и наличия ступенек
-            if use_ship:
-                legs_count = (len(segments_x) + 1) * (len(segments_y) + 1) + steps * 4
+# 21. Мастер добавления аудиосистемы (колонок)
+@lru_cache(maxsize=256)
+def _calc_connectors(n: int) -> Tuple[int, int]:
+    """Возвращает (short, long) кабели SpeakOn для n колонок.
+
+    Колонки распределяются на две стороны: side1 = ceil(n/2), side2 = floor(n/2).
+    На каждой стороне пары формируются только внутри стороны (не перемешиваются).
+    Каждый комплект пары использует 1 короткий (0,5 м) и 1 длинный (15 м). Оставшиеся
+    одиночные колонки используют только 1 длинный кабель. Всегда требуется минимум
+    2 длинных кабеля, если n > 0. Функция чистая, результат кэшируется.
+    """
+    if n <= 0:
+        return (0, 0)
+    # Распределяем на две стороны
+    side1 = (n + 1) // 2  # ceil(n/2)
+    side2 = n - side1  # floor(n/2)
+    # Для каждой стороны считаем пары и одиночки
+    pairs1 = side1 // 2
+    singles1 = side1 % 2
+    pairs2 = side2 // 2
+    singles2 = side2 % 2
+    short = pairs1 + pairs2
+    long = pairs1 + singles1 + pairs2 + singles2
+    # Минимум два длинных кабеля
+    if long < 2:
+        long = 2
+    return (short, long)
+
+
+class ColumnMasterDialog(QtWidgets.QDialog):
+    """
+    Диалог мастера колонок (см. open_column_master).
+
+    Содержит элементы управления для выбора типа колонок, топов, сабов,
+    режима системы (активная/пассивная) и усилителей. Также рассчитывает
+    количество усилителей и SpeakOn-коммутацию.
+    """
+    def __init__(self, parent_page: Any) -> None:  # type: ignore
+        super().__init__(parent_page)
+        self.page = parent_page
+        self.setWindowTitle("Добавление колонок")
+        self.resize(480, 520)
+        v = QtWidgets.QVBoxLayout(self)
+        v.setContentsMargins(8, 8, 8, 8)
+        v.setSpacing(6)
+        # 21.3 Тип колонок
+        form = QtWidgets.QFormLayout()
+        form.setLabelAlignment(QtCore.Qt.AlignmentFlag.AlignRight | QtCore.Qt.AlignmentFlag.AlignVCenter)
+        self.cmb_position = QtWidgets.QComboBox()
+        self.cmb_position.addItems([
+            "Main PA", "FrontFill", "InFill", "OutFill", "SideFill", "Delay", "Custom"
+        ])
+        form.addRow("Тип колонок:", self.cmb_position)
+        # 21.4 Раздел топов
+        self.chk_top = QtWidgets.QCheckBox("Добавить топы")
+        self.chk_top.setChecked(True)
+        form.addRow(self.chk_top)
+        # Имя топов и выбор из базы
+        h_top = QtWidgets.QHBoxLayout()
+        self.ed_top_name = QtWidgets.QLineEdit(); self.ed_top_name.setPlaceholderText("Выберите или введите топ")
+        # Разрешаем ручной ввод названия топов
+        self.ed_top_name.setReadOnly(False)
+        self.btn_top_select = QtWidgets.QPushButton("Из базы…")
+        h_top.addWidget(self.ed_top_name)
+        h_top.addWidget(self.btn_top_select)
+        form.addRow("Топы:", h_top)
+        # Количество и цена топов
+        self.sp_top_qty = SmartDoubleSpinBox(); self.sp_top_qty.setDecimals(2); self.sp_top_qty.setMinimum(0.0); self.sp_top_qty.setValue(0.0)
+        self.sp_top_price = SmartDoubleSpinBox(); self.sp_top_price.setDecimals(2)
+        # Разрешаем широкий диапазон значений цены, чтобы не ограничивать 99,99
+        self.sp_top_price.setRange(0.0, 1_000_000_000.0)
+        self.sp_top_price.setValue(0.0)
+        # Скрываем стрелочки у поля цены топов, ввод только с клавиатуры
+        self.sp_top_price.setButtonSymbols(QtWidgets.QAbstractSpinBox.NoButtons)
+        h_top_params = QtWidgets.QHBoxLayout(); h_top_params.addWidget(QtWidgets.QLabel("Кол-во:")); h_top_params.addWidget(self.sp_top_qty);
+        h_top_params.addWidget(QtWidgets.QLabel("Цена/шт:")); h_top_params.addWidget(self.sp_top_price)
+        form.addRow("Параметры топов:", h_top_params)
+        # 21.5 Раздел сабов
+        self.chk_sub = QtWidgets.QCheckBox("Добавить сабы")
+        self.chk_sub.setChecked(False)
+        form.addRow(self.chk_sub)
+        h_sub = QtWidgets.QHBoxLayout()
+        self.ed_sub_name = QtWidgets.QLineEdit(); self.ed_sub_name.setPlaceholderText("Выберите или введите саб")
+        # Разрешаем ручной ввод названия сабов
+        self.ed_sub_name.setReadOnly(False)
+        self.btn_sub_select = QtWidgets.QPushButton("Из базы…")
+        h_sub.addWidget(self.ed_sub_name)
+        h_sub.addWidget(self.btn_sub_select)
+        form.addRow("Сабы:", h_sub)
+        # Количество и цена сабов
+        self.sp_sub_qty = SmartDoubleSpinBox(); self.sp_sub_qty.setDecimals(2); self.sp_sub_qty.setMinimum(0.0); self.sp_sub_qty.setValue(0.0)
+        self.sp_sub_price = SmartDoubleSpinBox(); self.sp_sub_price.setDecimals(2)
+        # Разрешаем широкий диапазон для цены сабов
+        self.sp_sub_price.setRange(0.0, 1_000_000_000.0)
+        self.sp_sub_price.setValue(0.0)
+        # Скрываем стрелочки у поля цены сабов
+        self.sp_sub_price.setButtonSymbols(QtWidgets.QAbstractSpinBox.NoButtons)
+        h_sub_params = QtWidgets.QHBoxLayout(); h_sub_params.addWidget(QtWidgets.QLabel("Кол-во:")); h_sub_params.addWidget(self.sp_sub_qty);
+        h_sub_params.addWidget(QtWidgets.QLabel("Цена/шт:")); h_sub_params.addWidget(self.sp_sub_price)
+        form.addRow("Параметры сабов:", h_sub_params)
+        # Чекбокс добавления коробочек для сабов
+        self.chk_sub_boxes = QtWidgets.QCheckBox("Добавить коробочки для сабов (2 шт.)")
+        self.chk_sub_boxes.setChecked(False)
+        # Коробочки доступны только если сабы включены
+        self.chk_sub_boxes.setEnabled(False)
+        # Размещаем чекбокс с небольшим отступом справа
+        h_sub_boxes = QtWidgets.QHBoxLayout()
+        h_sub_boxes.addSpacing(20)
+        h_sub_boxes.addWidget(self.chk_sub_boxes)
+        form.addRow("", h_sub_boxes)
+        # 21.6 Выбор системы: активная или пассивная
+        self.grp_system = QtWidgets.QGroupBox("Тип системы")
+        rb_layout = QtWidgets.QHBoxLayout(self.grp_system)
+        self.rb_active = QtWidgets.QRadioButton("Активная")
+        self.rb_passive = QtWidgets.QRadioButton("Пассивная")
+        self.rb_active.setChecked(True)
+        rb_layout.addWidget(self.rb_active); rb_layout.addWidget(self.rb_passive)
+        form.addRow(self.grp_system)
+        # 21.7 Группа настроек пассивной системы
+        self.grp_passive = QtWidgets.QGroupBox("Параметры пассивной системы")
+        self.grp_passive.setCheckable(False)
+        self.grp_passive.setEnabled(False)
+        passive_layout = QtWidgets.QFormLayout(self.grp_passive)
+        # Режим усилителей: Fullrange / Biamp
+        self.rb_fullrange = QtWidgets.QRadioButton("Fullrange")
+        self.rb_biamp = QtWidgets.QRadioButton("Biamp")
+        self.rb_fullrange.setChecked(True)
+        mode_h = QtWidgets.QHBoxLayout(); mode_h.addWidget(self.rb_fullrange); mode_h.addWidget(self.rb_biamp)
+        passive_layout.addRow("Режим усилителей:", mode_h)
+        # Тип сабов: одиночные или сдвоенные
+        self.chk_double_sub = QtWidgets.QCheckBox("Сдвоенные сабы (2x)")
+        self.chk_double_sub.setChecked(False)
+        passive_layout.addRow(self.chk_double_sub)
+        # Усилитель: имя, выбор из базы, количество, цена
+        amp_h_name = QtWidgets.QHBoxLayout()
+        self.ed_amp_name = QtWidgets.QLineEdit(); self.ed_amp_name.setPlaceholderText("Выберите или введите усилитель")
+        # Разрешаем ручной ввод названия усилителя
+        self.ed_amp_name.setReadOnly(False)
+        self.btn_amp_select = QtWidgets.QPushButton("Из базы…")
+        amp_h_name.addWidget(self.ed_amp_name); amp_h_name.addWidget(self.btn_amp_select)
+        passive_layout.addRow("Усилитель:", amp_h_name)
+        amp_h_params = QtWidgets.QHBoxLayout()
+        self.sp_amp_qty = SmartDoubleSpinBox(); self.sp_amp_qty.setDecimals(0); self.sp_amp_qty.setMinimum(0);
+        self.sp_amp_qty.setValue(0)
+        self.sp_amp_price = SmartDoubleSpinBox(); self.sp_amp_price.setDecimals(2)
+        # Разрешаем широкий диапазон для цены усилителя
+        self.sp_amp_price.setRange(0.0, 1_000_000_000.0)
+        self.sp_amp_price.setValue(0.0)
+        # Скрываем стрелочки у поля цены усилителя
+        self.sp_amp_price.setButtonSymbols(QtWidgets.QAbstractSpinBox.NoButtons)
+        amp_h_params.addWidget(QtWidgets.QLabel("Кол-во:")); amp_h_params.addWidget(self.sp_amp_qty);
+        amp_h_params.addWidget(QtWidgets.QLabel("Цена/шт:")); amp_h_params.addWidget(self.sp_amp_price)
+        passive_layout.addRow("Параметры усилителя:", amp_h_params)
+        # Информация о коммутаторах
+        self.lbl_connectors = QtWidgets.QLabel()
+        passive_layout.addRow("Коммутация:", self.lbl_connectors)
+        # Добавляем группы на форму
+        form.addRow(self.grp_passive)
+        # 21.8 Кнопки OK / Cancel
+        btns = QtWidgets.QDialogButtonBox(QtWidgets.QDialogButtonBox.Ok | QtWidgets.QDialogButtonBox.Cancel)
+        # Собираем форму
+        v.addLayout(form)
+        v.addWidget(btns)
+        # 21.9 Сигналы
+        self.btn_top_select.clicked.connect(self._select_top)
+        self.btn_sub_select.clicked.connect(self._select_sub)
+        self.btn_amp_select.clicked.connect(self._select_amp)
+        self.chk_top.toggled.connect(self._top_enable_changed)
+        self.chk_sub.toggled.connect(self._sub_enable_changed)
+        self.rb_active.toggled.connect(self._system_toggle)
+        self.rb_passive.toggled.connect(self._system_toggle)
+        # Режимы и параметры изменяют автоподсчёт. Пересчёт откладывается
+        # однократным таймером: серия изменений (ввод числа по цифрам)
+        # даёт один пересчёт
+        self._calc_timer = QtCore.QTimer(self)
+        self._calc_timer.setSingleShot(True)
+        self._calc_timer.setInterval(50)
+        self._calc_timer.timeout.connect(self._do_passive_calc)
+        self.sp_top_qty.valueChanged.connect(self._update_passive_calc)
+        self.sp_sub_qty.valueChanged.connect(self._update_passive_calc)
+        self.rb_fullrange.toggled.connect(self._update_passive_calc)
+        self.rb_biamp.toggled.connect(self._update_passive_calc)
+        self.chk_double_sub.toggled.connect(self._update_passive_calc)
+        btns.accepted.connect(self.accept)
+        btns.rejected.connect(self.reject)
+        # Инициализируем состояние
+        self._top_vendor = ""
+        self._top_department = ""
+        self._sub_vendor = ""
+        self._sub_department = ""
+        self._amp_vendor = ""
+        self._amp_department = ""
+        # Обновим коммутатор info
+        self._do_passive_calc()
+
+    def reset_values(self) -> None:
+        """
+        Возвращает сохранённый диалог к значениям по умолчанию перед
+        повторным открытием (виджеты и соединения сигналов не пересоздаются).
+        """
+        self.cmb_position.setCurrentIndex(0)
+        self.chk_top.setChecked(True)
+        self.chk_sub.setChecked(False)
+        self.chk_sub_boxes.setChecked(False)
+        self.rb_active.setChecked(True)
+        self.rb_fullrange.setChecked(True)
+        self.chk_double_sub.setChecked(False)
+        for ed in (self.ed_top_name, self.ed_sub_name, self.ed_amp_name):
+            ed.clear()
+        for spin in (self.sp_top_qty, self.sp_top_price, self.sp_sub_qty,
+                     self.sp_sub_price, self.sp_amp_qty, self.sp_amp_price):
+            spin.setValue(0.0)
+        self._top_vendor = ""
+        self._top_department = ""
+        self._sub_vendor = ""
+        self._sub_department = ""
+        self._amp_vendor = ""
+        self._amp_department = ""
+        # Пересчёт сразу, без отложенного таймера
+        self._calc_timer.stop()
+        self._do_passive_calc()
+
+    # 21.9.1 Обработчики
+    def _top_enable_changed(self, state: bool) -> None:
+        # Включаем/отключаем элементы топов
+        enabled = self.chk_top.isChecked()
+        self.ed_top_name.setEnabled(enabled)
+        self.btn_top_select.setEnabled(enabled)
+        self.sp_top_qty.setEnabled(enabled)
+        self.sp_top_price.setEnabled(enabled)
+        # Если отключено — сбрасываем значения
+        if not enabled:
+            self.ed_top_name.clear(); self.sp_top_qty.setValue(0.0); self.sp_top_price.setValue(0.0)
+        self._update_passive_calc()
+
+    def _sub_enable_changed(self, state: bool) -> None:
+        enabled = self.chk_sub.isChecked()
+        self.ed_sub_name.setEnabled(enabled)
+        self.btn_sub_select.setEnabled(enabled)
+        self.sp_sub_qty.setEnabled(enabled)
+        self.sp_sub_price.setEnabled(enabled)
+        # Коробочки для сабов доступны только если сабы выбраны
+        self.chk_sub_boxes.setEnabled(enabled)
+        if not enabled:
+            # Сброс состояния при отключении сабов
+            self.chk_sub_boxes.setChecked(False)
+        if not enabled:
+            self.ed_sub_name.clear(); self.sp_sub_qty.setValue(0.0); self.sp_sub_price.setValue(0.0)
+        self._update_passive_calc()
+
+    def _system_toggle(self) -> None:
+        # Переключение между активной и пассивной системой
+        is_passive = self.rb_passive.isChecked()
+        self.grp_passive.setEnabled(is_passive)
+        self._update_passive_calc()
+
+    def _update_passive_calc(self) -> None:
+        """Планирует пересчёт пассивной системы (см. _do_passive_calc)."""
+        self._calc_timer.start()
+
+    def _do_passive_calc(self) -> None:
+        """Пересчитывает количество усилителей и коммутаторов для пассивной системы."""
+        # Не считаем, если активная система
+        if not self.rb_passive.isChecked():
+            with QtCore.QSignalBlocker(self.sp_amp_qty):
+                self.sp_amp_qty.setValue(0)
+            # Отображаем пустую строку
+            self.lbl_connectors.setText("Н/Д для активной системы")
+            return
+        top_qty = float(self.sp_top_qty.value() or 0.0) if self.chk_top.isChecked() else 0.0
+        sub_qty = float(self.sp_sub_qty.value() or 0.0) if self.chk_sub.isChecked() else 0.0
+        # Определяем ёмкость усилителя для топов
+        if self.rb_fullrange.isChecked():
+            amp_top_cap = 8  # Fullrange: 4 плеча * 2 топа
+        else:
+            amp_top_cap = 4  # Biamp: 2 плеча * 2 топа
+        amps_for_tops = math.ceil(top_qty / amp_top_cap) if top_qty > 0 else 0
+        # Ёмкость усилителя для сабов
+        if self.chk_double_sub.isChecked():
+            amp_sub_cap = 4  # сдвоенные: 4 на усилитель
+        else:
+            amp_sub_cap = 8
+        amps_for_subs = math.ceil(sub_qty / amp_sub_cap) if sub_qty > 0 else 0
+        # Количество усилителей суммируется: топы и сабы обслуживаются отдельно
+        amps_needed = amps_for_tops + amps_for_subs
+        # Обновляем спин количества усилителей, если оно ещё не редактировалось пользователем (<=0).
+        # Запись из пересчёта не должна снова вызывать обработчики спина
+        amp_qty = self.sp_amp_qty.value()
+        if amp_qty <= 0 or amp_qty < amps_needed:
+            # Автоподстановка расчётного значения
+            with QtCore.QSignalBlocker(self.sp_amp_qty):
+                self.sp_amp_qty.setValue(float(amps_needed))
+        # Расчёт коммутации: для топов и сабов используем распределение по двум
+        # сторонам (_calc_connectors)
+        # Топы
+        if top_qty > 0:
+            spk_top_05, spk_top_15 = _calc_connectors(int(top_qty))
+        else:
+            spk_top_05 = spk_top_15 = 0
+        # Сабы
+        if self.chk_sub.isChecked() and sub_qty > 0:
+            if self.chk_double_sub.isChecked():
+                # Для сдвоенных сабов: каждый саб требует 1 длинный кабель
+                spk_sub_05 = 0
+                spk_sub_15 = max(2, int(sub_qty))
             else:
-                legs_count = 4 * (count_2x1 + count_1x1 + count_1x0_5 + steps)
-            import datetime
-            batch = f"stage-{datetime.datetime.utcnow().isoformat()}"
-            items_for_db: list[Dict[str, Any]] = []
-            catalog_entries: list[Dict[str, Any]] = []
-            # Вспомогательная функция для добавления позиции в смету и каталог
-            def add_item(name: str, qty: float, unit_price: float, item_type: str = "equipment") -> None:
-                """
-                Добавляет позицию в списки для записи в БД и каталог.
-
-                :param name: отображаемое наименование позиции
-                :param qty: количество
-                :param unit_price: цена за единицу
-                :param item_type: тип позиции ('equipment', 'consumable', 'personnel', etc.)
-                """
-                amount = unit_price * qty
-                items_for_db.append({
-                    "project_id": self.page.project_id,
-                    "type": item_type,
-                    "group_name": f"Сценический подиум №{stage_id}",
-                    "name": name,
-                    "qty": qty,
-                    "coeff": 1.0,
-                    "amount": amount,
-                    "unit_price": unit_price,
-                    "source_file": "STAGE_MASTER",
-                    # Используем выбранного пользователем подрядчика
-                    "vendor": vendor_selected,
-                    "department": "",
-                    "zone": self.zone_name or "",
-                    "power_watts": 0.0,
-                    "import_batch": batch,
-                })
-                # В каталоге храним класс как тип на английском языке (equipment, consumable и др.)
-                catalog_entries.append({
-                    "name": name,
-                    "unit_price": unit_price,
-                    "class": item_type,
-                    # Также добавляем подрядчика в глобальный каталог
-                    "vendor": vendor_selected,
-                    "power_watts": 0.0,
-                    "department": "",
-                })
-            # Добавляем панели
-            if count_2x1 > 0:
-                add_item(f"Панель подиума 2×1 м №{stage_id}", count_2x1, price_2x1)
-            if count_1x1 > 0:
-                add_item(f"Панель подиума 1×1 м №{stage_id}", count_1x1, price_1x1)
-            if count_1x0_5 > 0:
-                add_item(f"Панель подиума 1×0.5 м №{stage_id}", count_1x0_5, price_1x0_5)
-            # Ступеньки
-            if steps > 0:
-                add_item(f"Ступенька подиума №{stage_id}", steps, price_step)
-            # Ножки подиума
-            if legs_count > 0:
-                try:
-                    h_cm = int(float(self.ed_height.value()))
-                except Exception:
-                    h_cm = int(self.ed_height.value() or 0)
-                add_item(f"Нога подиума {h_cm} см №{stage_id}", legs_count, price_leg)
-            # Ковралин — относится к расходникам, поэтому используем тип consumable
-            if carpet_enabled:
-                area = w * d
-                if area > 0:
-                    add_item(f"Ковралин подиума №{stage_id}", area, price_carpet, item_type="consumable")
-            # Раус — также расходный материал (декор), поэтому тип consumable
-            # Периметр рассчитывается как передняя ширина плюс две боковых глубины.
-            if raus_enabled:
-                perimeter = w + 2.0 * d
-                if perimeter > 0:
-                    add_item(f"Раус подиума №{stage_id}", perimeter, price_raus, item_type="consumable")
-            # Запись в базу и логирование
-            try:
-                if items_for_db:
-                    self.page.db.add_items_bulk(items_for_db)
-                    if hasattr(self.page.db, "catalog_add_or_ignore"):
-                        self.page.db.catalog_add_or_ignore(catalog_entries)
-                    if hasattr(self.page, "_log"):
-                        self.page._log(
-                            f"Мастер подиума: добавлено {len(items_for_db)} позиций (2×1={count_2x1}, 1×1={count_1x1}, 1×0.5={count_1x0_5}, ступенек={steps}, ног={legs_count}) в зону '{self.zone_name}'."
-                        )
-            except Exception as ex:
-                try:
-                    if hasattr(self.page, "_log"):
-                        self.page._log(f"Мастер подиума: ошибка добавления позиций: {ex}", "error")
-                except Exception:
-                    pass
-                QtWidgets.QMessageBox.critical(self, "Ошибка", f"Не удалось добавить подиум: {ex}")
-                return
-            # Обновляем вкладки зон
-            try:
-                self.page._reload_zone_tabs()
-            except Exception:
-                pass
-            # Закрываем диалог
-            super().accept()
-    dlg = StageMasterDialog(page, zone_name)
-    dlg.exec()
+                spk_sub_05, spk_sub_15 = _calc_connectors(int(sub_qty))
+        else:
+            spk_sub_05 = spk_sub_15 = 0
+        # Формируем информационную строку
+        total_short = spk_top_05 + spk_sub_05
+        total_long = spk_top_15 + spk_sub_15
+        # Если выбраны коробочки для сабов, добавляем по одному короткому кабелю на коробку
+        try:
+            if self.chk_sub.isChecked() and self.chk_sub_boxes.isChecked():
+                # Коробочек всегда две, по одному короткому кабелю каждая
+                total_short += 2
+        except Exception:
+            pass
+        if total_short or total_long:
+            self.lbl_connectors.setText(
+                f"Короткий спикон: {int(total_short)}, Длинный спикон: {int(total_long)}"
+            )
+        else:
+            self.lbl_connectors.setText("Нет кабелей")
 
+    # 21.9.2 Выбор топов из базы
+    def _select_top(self) -> None:
+        dlg = CatalogSelectDialog(self.page, parent=self)
+        if dlg.exec() != QtWidgets.QDialog.Accepted:
+            return
+        data = dlg.selected_row
+        if not data:
+            return
+        try:
+            name = normalize_case(data.get("name", ""))
+            price = float(data.get("unit_price", 0.0) or 0.0)
+            self._top_vendor = normalize_case(data.get("vendor", "") or "")
+            self._top_department = normalize_case(data.get("department", "") or "")
+            self.ed_top_name.setText(name)
+            self.sp_top_price.setValue(price)
+            # Устанавливаем количество по умолчанию как 2 или 1 (если пусто)
+            if self.sp_top_qty.value() <= 0.0:
+                self.sp_top_qty.setValue(2.0)
+            self._update_passive_calc()
+        except Exception:
+            pass
 
-# 21. Мастер добавления аудиосистемы (колонок)
-def open_column_master(page: Any) -> None:
+    # 21.9.3 Выбор сабов из базы
+    def _select_sub(self) -> None:
+        dlg = CatalogSelectDialog(self.page, parent=self)
+        if dlg.exec() != QtWidgets.QDialog.Accepted:
+            return
+        data = dlg.selected_row
+        if not data:
+            return
+        try:
+            name = normalize_case(data.get("name", ""))
+            price = float(data.get("unit_price", 0.0) or 0.0)
+            self._sub_vendor = normalize_case(data.get("vendor", "") or "")
+            self._sub_department = normalize_case(data.get("department", "") or "")
+            self.ed_sub_name.setText(name)
+            self.sp_sub_price.setValue(price)
+            if self.sp_sub_qty.value() <= 0.0:
+                self.sp_sub_qty.setValue(2.0)
+            self._update_passive_calc()
+        except Exception:
+            pass
+
+    # 21.9.4 Выбор усилителей из базы
+    def _select_amp(self) -> None:
+        dlg = CatalogSelectDialog(self.page, parent=self)
+        if dlg.exec() != QtWidgets.QDialog.Accepted:
+            return
+        data = dlg.selected_row
+        if not data:
+            return
+        try:
+            name = normalize_case(data.get("name", ""))
+            price = float(data.get("unit_price", 0.0) or 0.0)
+            self._amp_vendor = normalize_case(data.get("vendor", "") or "")
+            self._amp_department = normalize_case(data.get("department", "") or "")
+            self.ed_amp_name.setText(name)
+            self.sp_amp_price.setValue(price)
+            if self.sp_amp_qty.value() <= 0.0:
+                self.sp_amp_qty.setValue(1.0)
+        except Exception:
+            pass
+
+    # 21.9.5 Подтверждение: отложенный пересчёт выполняется до закрытия,
+    # чтобы количество усилителей соответствовало последним изменениям
+    def accept(self) -> None:  # type: ignore
+        if self._calc_timer.isActive():
+            self._calc_timer.stop()
+            self._do_passive_calc()
+        super().accept()
+
+
+def open_column_master(page: Any) -> Optional[List[int]]:
     """
     Открывает мастер добавления комплекта звуковых колонок.
 
@@ -4931,355 +5507,14 @@ def open_column_master(page: Any) -> None:
             page._log("Мастер колонок: открыт диалог.")
     except Exception:
         pass
-
-    class ColumnMasterDialog(QtWidgets.QDialog):
-        """
-        Внутренний диалог мастера колонок.
-
-        Содержит элементы управления для выбора типа колонок, топов, сабов,
-        режима системы (активная/пассивная) и усилителей. Также рассчитывает
-        количество усилителей и SpeakOn-коммутацию.
-        """
-        def __init__(self, parent_page: Any) -> None:  # type: ignore
-            super().__init__(parent_page)
-            self.page = parent_page
-            self.setWindowTitle("Добавление колонок")
-            self.resize(480, 520)
-            v = QtWidgets.QVBoxLayout(self)
-            v.setContentsMargins(8, 8, 8, 8)
-            v.setSpacing(6)
-            # 21.3 Тип колонок
-            form = QtWidgets.QFormLayout()
-            form.setLabelAlignment(QtCore.Qt.AlignmentFlag.AlignRight | QtCore.Qt.AlignmentFlag.AlignVCenter)
-            self.cmb_position = QtWidgets.QComboBox()
-            self.cmb_position.addItems([
-                "Main PA", "FrontFill", "InFill", "OutFill", "SideFill", "Delay", "Custom"
-            ])
-            form.addRow("Тип колонок:", self.cmb_position)
-            # 21.4 Раздел топов
-            self.chk_top = QtWidgets.QCheckBox("Добавить топы")
-            self.chk_top.setChecked(True)
-            form.addRow(self.chk_top)
-            # Имя топов и выбор из базы
-            h_top = QtWidgets.QHBoxLayout()
-            self.ed_top_name = QtWidgets.QLineEdit(); self.ed_top_name.setPlaceholderText("Выберите или введите топ")
-            # Разрешаем ручной ввод названия топов
-            self.ed_top_name.setReadOnly(False)
-            self.btn_top_select = QtWidgets.QPushButton("Из базы…")
-            h_top.addWidget(self.ed_top_name)
-            h_top.addWidget(self.btn_top_select)
-            form.addRow("Топы:", h_top)
-            # Количество и цена топов
-            self.sp_top_qty = SmartDoubleSpinBox(); self.sp_top_qty.setDecimals(2); self.sp_top_qty.setMinimum(0.0); self.sp_top_qty.setValue(0.0)
-            self.sp_top_price = SmartDoubleSpinBox(); self.sp_top_price.setDecimals(2)
-            # Разрешаем широкий диапазон значений цены, чтобы не ограничивать 99,99
-            self.sp_top_price.setRange(0.0, 1_000_000_000.0)
-            self.sp_top_price.setValue(0.0)
-            # Скрываем стрелочки у поля цены топов, ввод только с клавиатуры
-            self.sp_top_price.setButtonSymbols(QtWidgets.QAbstractSpinBox.NoButtons)
-            h_top_params = QtWidgets.QHBoxLayout(); h_top_params.addWidget(QtWidgets.QLabel("Кол-во:")); h_top_params.addWidget(self.sp_top_qty);
-            h_top_params.addWidget(QtWidgets.QLabel("Цена/шт:")); h_top_params.addWidget(self.sp_top_price)
-            form.addRow("Параметры топов:", h_top_params)
-            # 21.5 Раздел сабов
-            self.chk_sub = QtWidgets.QCheckBox("Добавить сабы")
-            self.chk_sub.setChecked(False)
-            form.addRow(self.chk_sub)
-            h_sub = QtWidgets.QHBoxLayout()
-            self.ed_sub_name = QtWidgets.QLineEdit(); self.ed_sub_name.setPlaceholderText("Выберите или введите саб")
-            # Разрешаем ручной ввод названия сабов
-            self.ed_sub_name.setReadOnly(False)
-            self.btn_sub_select = QtWidgets.QPushButton("Из базы…")
-            h_sub.addWidget(self.ed_sub_name)
-            h_sub.addWidget(self.btn_sub_select)
-            form.addRow("Сабы:", h_sub)
-            # Количество и цена сабов
-            self.sp_sub_qty = SmartDoubleSpinBox(); self.sp_sub_qty.setDecimals(2); self.sp_sub_qty.setMinimum(0.0); self.sp_sub_qty.setValue(0.0)
-            self.sp_sub_price = SmartDoubleSpinBox(); self.sp_sub_price.setDecimals(2)
-            # Разрешаем широкий диапазон для цены сабов
-            self.sp_sub_price.setRange(0.0, 1_000_000_000.0)
-            self.sp_sub_price.setValue(0.0)
-            # Скрываем стрелочки у поля цены сабов
-            self.sp_sub_price.setButtonSymbols(QtWidgets.QAbstractSpinBox.NoButtons)
-            h_sub_params = QtWidgets.QHBoxLayout(); h_sub_params.addWidget(QtWidgets.QLabel("Кол-во:")); h_sub_params.addWidget(self.sp_sub_qty);
-            h_sub_params.addWidget(QtWidgets.QLabel("Цена/шт:")); h_sub_params.addWidget(self.sp_sub_price)
-            form.addRow("Параметры сабов:", h_sub_params)
-            # Чекбокс добавления коробочек для сабов
-            self.chk_sub_boxes = QtWidgets.QCheckBox("Добавить коробочки для сабов (2 шт.)")
-            self.chk_sub_boxes.setChecked(False)
-            # Коробочки доступны только если сабы включены
-            self.chk_sub_boxes.setEnabled(False)
-            # Размещаем чекбокс с небольшим отступом справа
-            h_sub_boxes = QtWidgets.QHBoxLayout()
-            h_sub_boxes.addSpacing(20)
-            h_sub_boxes.addWidget(self.chk_sub_boxes)
-            form.addRow("", h_sub_boxes)
-            # 21.6 Выбор системы: активная или пассивная
-            self.grp_system = QtWidgets.QGroupBox("Тип системы")
-            rb_layout = QtWidgets.QHBoxLayout(self.grp_system)
-            self.rb_active = QtWidgets.QRadioButton("Активная")
-            self.rb_passive = QtWidgets.QRadioButton("Пассивная")
-            self.rb_active.setChecked(True)
-            rb_layout.addWidget(self.rb_active); rb_layout.addWidget(self.rb_passive)
-            form.addRow(self.grp_system)
-            # 21.7 Группа настроек пассивной системы
-            self.grp_passive = QtWidgets.QGroupBox("Параметры пассивной системы")
-            self.grp_passive.setCheckable(False)
-            self.grp_passive.setEnabled(False)
-            passive_layout = QtWidgets.QFormLayout(self.grp_passive)
-            # Режим усилителей: Fullrange / Biamp
-            self.rb_fullrange = QtWidgets.QRadioButton("Fullrange")
-            self.rb_biamp = QtWidgets.QRadioButton("Biamp")
-            self.rb_fullrange.setChecked(True)
-            mode_h = QtWidgets.QHBoxLayout(); mode_h.addWidget(self.rb_fullrange); mode_h.addWidget(self.rb_biamp)
-            passive_layout.addRow("Режим усилителей:", mode_h)
-            # Тип сабов: одиночные или сдвоенные
-            self.chk_double_sub = QtWidgets.QCheckBox("Сдвоенные сабы (2x)")
-            self.chk_double_sub.setChecked(False)
-            passive_layout.addRow(self.chk_double_sub)
-            # Усилитель: имя, выбор из базы, количество, цена
-            amp_h_name = QtWidgets.QHBoxLayout()
-            self.ed_amp_name = QtWidgets.QLineEdit(); self.ed_amp_name.setPlaceholderText("Выберите или введите усилитель")
-            # Разрешаем ручной ввод названия усилителя
-            self.ed_amp_name.setReadOnly(False)
-            self.btn_amp_select = QtWidgets.QPushButton("Из базы…")
-            amp_h_name.addWidget(self.ed_amp_name); amp_h_name.addWidget(self.btn_amp_select)
-            passive_layout.addRow("Усилитель:", amp_h_name)
-            amp_h_params = QtWidgets.QHBoxLayout()
-            self.sp_amp_qty = SmartDoubleSpinBox(); self.sp_amp_qty.setDecimals(0); self.sp_amp_qty.setMinimum(0);
-            self.sp_amp_qty.setValue(0)
-            self.sp_amp_price = SmartDoubleSpinBox(); self.sp_amp_price.setDecimals(2)
-            # Разрешаем широкий диапазон для цены усилителя
-            self.sp_amp_price.setRange(0.0, 1_000_000_000.0)
-            self.sp_amp_price.setValue(0.0)
-            # Скрываем стрелочки у поля цены усилителя
-            self.sp_amp_price.setButtonSymbols(QtWidgets.QAbstractSpinBox.NoButtons)
-            amp_h_params.addWidget(QtWidgets.QLabel("Кол-во:")); amp_h_params.addWidget(self.sp_amp_qty);
-            amp_h_params.addWidget(QtWidgets.QLabel("Цена/шт:")); amp_h_params.addWidget(self.sp_amp_price)
-            passive_layout.addRow("Параметры усилителя:", amp_h_params)
-            # Информация о коммутаторах
-            self.lbl_connectors = QtWidgets.QLabel()
-            passive_layout.addRow("Коммутация:", self.lbl_connectors)
-            # Добавляем группы на форму
-            form.addRow(self.grp_passive)
-            # 21.8 Кнопки OK / Cancel
-            btns = QtWidgets.QDialogButtonBox(QtWidgets.QDialogButtonBox.Ok | QtWidgets.QDialogButtonBox.Cancel)
-            # Собираем форму
-            v.addLayout(form)
-            v.addWidget(btns)
-            # 21.9 Сигналы
-            self.btn_top_select.clicked.connect(self._select_top)
-            self.btn_sub_select.clicked.connect(self._select_sub)
-            self.btn_amp_select.clicked.connect(self._select_amp)
-            self.chk_top.toggled.connect(self._top_enable_changed)
-            self.chk_sub.toggled.connect(self._sub_enable_changed)
-            self.rb_active.toggled.connect(self._system_toggle)
-            self.rb_passive.toggled.connect(self._system_toggle)
-            # Режимы и параметры изменяют автоподсчёт
-            self.sp_top_qty.valueChanged.connect(self._update_passive_calc)
-            self.sp_sub_qty.valueChanged.connect(self._update_passive_calc)
-            self.rb_fullrange.toggled.connect(self._update_passive_calc)
-            self.rb_biamp.toggled.connect(self._update_passive_calc)
-            self.chk_double_sub.toggled.connect(self._update_passive_calc)
-            btns.accepted.connect(self.accept)
-            btns.rejected.connect(self.reject)
-            # Инициализируем состояние
-            self._top_vendor = ""
-            self._top_department = ""
-            self._sub_vendor = ""
-            self._sub_department = ""
-            self._amp_vendor = ""
-            self._amp_department = ""
-            # Обновим коммутатор info
-            self._update_passive_calc()
-
-        # 21.9.1 Обработчики
-        def _top_enable_changed(self, state: bool) -> None:
-            # Включаем/отключаем элементы топов
-            enabled = self.chk_top.isChecked()
-            self.ed_top_name.setEnabled(enabled)
-            self.btn_top_select.setEnabled(enabled)
-            self.sp_top_qty.setEnabled(enabled)
-            self.sp_top_price.setEnabled(enabled)
-            # Если отключено — сбрасываем значения
-            if not enabled:
-                self.ed_top_name.clear(); self.sp_top_qty.setValue(0.0); self.sp_top_price.setValue(0.0)
-            self._update_passive_calc()
-
-        def _sub_enable_changed(self, state: bool) -> None:
-            enabled = self.chk_sub.isChecked()
-            self.ed_sub_name.setEnabled(enabled)
-            self.btn_sub_select.setEnabled(enabled)
-            self.sp_sub_qty.setEnabled(enabled)
-            self.sp_sub_price.setEnabled(enabled)
-            # Коробочки для сабов доступны только если сабы выбраны
-            self.chk_sub_boxes.setEnabled(enabled)
-            if not enabled:
-                # Сброс состояния при отключении сабов
-                self.chk_sub_boxes.setChecked(False)
-            if not enabled:
-                self.ed_sub_name.clear(); self.sp_sub_qty.setValue(0.0); self.sp_sub_price.setValue(0.0)
-            self._update_passive_calc()
-
-        def _system_toggle(self) -> None:
-            # Переключение между активной и пассивной системой
-            is_passive = self.rb_passive.isChecked()
-            self.grp_passive.setEnabled(is_passive)
-            self._update_passive_calc()
-
-        def _update_passive_calc(self) -> None:
-            """Пересчитывает количество усилителей и коммутаторов для пассивной системы."""
-            # Не считаем, если активная система
-            if not self.rb_passive.isChecked():
-                self.sp_amp_qty.setValue(0)
-                # Отображаем пустую строку
-                self.lbl_connectors.setText("Н/Д для активной системы")
-                return
-            import math
-            top_qty = float(self.sp_top_qty.value() or 0.0) if self.chk_top.isChecked() else 0.0
-            sub_qty = float(self.sp_sub_qty.value() or 0.0) if self.chk_sub.isChecked() else 0.0
-            # Определяем ёмкость усилителя для топов
-            if self.rb_fullrange.isChecked():
-                amp_top_cap = 8  # Fullrange: 4 плеча * 2 топа
-            else:
-                amp_top_cap = 4  # Biamp: 2 плеча * 2 топа
-            amps_for_tops = math.ceil(top_qty / amp_top_cap) if top_qty > 0 else 0
-            # Ёмкость усилителя для сабов
-            if self.chk_double_sub.isChecked():
-                amp_sub_cap = 4  # сдвоенные: 4 на усилитель
-            else:
-                amp_sub_cap = 8
-            amps_for_subs = math.ceil(sub_qty / amp_sub_cap) if sub_qty > 0 else 0
-            # Количество усилителей суммируется: топы и сабы обслуживаются отдельно
-            amps_needed = amps_for_tops + amps_for_subs
-            # Обновляем спин количества усилителей, если оно ещё не редактировалось пользователем (<=0)
-            if self.sp_amp_qty.value() <= 0 or self.sp_amp_qty.value() < amps_needed:
-                # Автоподстановка расчётного значения
-                self.sp_amp_qty.setValue(float(amps_needed))
-            # Расчёт коммутации: для топов и сабов используем распределение по двум сторонам.
-            def calc_connectors(count: float) -> tuple[int, int]:
-                """Возвращает (short, long) кабели для заданного количества элементов.
-
-                Элементы распределяются на две стороны: side1 = ceil(n/2), side2 = floor(n/2).
-                На каждой стороне пары формируются только внутри стороны (не перемешиваются).
-                Каждый комплект пары использует 1 короткий (0,5 м) и 1 длинный (15 м). Оставшиеся
-                одиночные элементы используют только 1 длинный кабель. Всегда требуется минимум
-                2 длинных кабеля, если count > 0.
-                """
-                n = int(count)
-                if n <= 0:
-                    return (0, 0)
-                # Распределяем на две стороны
-                side1 = (n + 1) // 2  # ceil(n/2)
-                side2 = n - side1  # floor(n/2)
-                # Для каждой стороны считаем пары и одиночки
-                pairs1 = side1 // 2
-                singles1 = side1 % 2
-                pairs2 = side2 // 2
-                singles2 = side2 % 2
-                short = pairs1 + pairs2
-                long = pairs1 + singles1 + pairs2 + singles2
-                # Минимум два длинных кабеля
-                if long < 2:
-                    long = 2
-                return (short, long)
-
-            # Топы
-            if top_qty > 0:
-                spk_top_05, spk_top_15 = calc_connectors(top_qty)
-            else:
-                spk_top_05 = spk_top_15 = 0
-            # Сабы
-            if self.chk_sub.isChecked() and sub_qty > 0:
-                if self.chk_double_sub.isChecked():
-                    # Для сдвоенных сабов: каждый саб требует 1 длинный кабель
-                    spk_sub_05 = 0
-                    spk_sub_15 = max(2, int(sub_qty))
-                else:
-                    spk_sub_05, spk_sub_15 = calc_connectors(sub_qty)
-            else:
-                spk_sub_05 = spk_sub_15 = 0
-            # Формируем информационную строку
-            total_short = spk_top_05 + spk_sub_05
-            total_long = spk_top_15 + spk_sub_15
-            # Если выбраны коробочки для сабов, добавляем по одному короткому кабелю на коробку
-            try:
-                if self.chk_sub.isChecked() and self.chk_sub_boxes.isChecked():
-                    # Коробочек всегда две, по одному короткому кабелю каждая
-                    total_short += 2
-            except Exception:
-                pass
-            if total_short or total_long:
-                self.lbl_connectors.setText(
-                    f"Короткий спикон: {int(total_short)}, Длинный спикон: {int(total_long)}"
-                )
-            else:
-                self.lbl_connectors.setText("Нет кабелей")
-
-        # 21.9.2 Выбор топов из базы
-        def _select_top(self) -> None:
-            dlg = CatalogSelectDialog(self.page, parent=self)
-            if dlg.exec() != QtWidgets.QDialog.Accepted:
-                return
-            data = dlg.selected_row
-            if not data:
-                return
-            try:
-                name = normalize_case(data.get("name", ""))
-                price = float(data.get("unit_price", 0.0) or 0.0)
-                self._top_vendor = normalize_case(data.get("vendor", "") or "")
-                self._top_department = normalize_case(data.get("department", "") or "")
-                self.ed_top_name.setText(name)
-                self.sp_top_price.setValue(price)
-                # Устанавливаем количество по умолчанию как 2 или 1 (если пусто)
-                if self.sp_top_qty.value() <= 0.0:
-                    self.sp_top_qty.setValue(2.0)
-                self._update_passive_calc()
-            except Exception:
-                pass
-
-        # 21.9.3 Выбор сабов из базы
-        def _select_sub(self) -> None:
-            dlg = CatalogSelectDialog(self.page, parent=self)
-            if dlg.exec() != QtWidgets.QDialog.Accepted:
-                return
-            data = dlg.selected_row
-            if not data:
-                return
-            try:
-                name = normalize_case(data.get("name", ""))
-                price = float(data.get("unit_price", 0.0) or 0.0)
-                self._sub_vendor = normalize_case(data.get("vendor", "") or "")
-                self._sub_department = normalize_case(data.get("department", "") or "")
-                self.ed_sub_name.setText(name)
-                self.sp_sub_price.setValue(price)
-                if self.sp_sub_qty.value() <= 0.0:
-                    self.sp_sub_qty.setValue(2.0)
-                self._update_passive_calc()
-            except Exception:
-                pass
-
-        # 21.9.4 Выбор усилителей из базы
-        def _select_amp(self) -> None:
-            dlg = CatalogSelectDialog(self.page, parent=self)
-            if dlg.exec() != QtWidgets.QDialog.Accepted:
-                return
-            data = dlg.selected_row
-            if not data:
-                return
-            try:
-                name = normalize_case(data.get("name", ""))
-                price = float(data.get("unit_price", 0.0) or 0.0)
-                self._amp_vendor = normalize_case(data.get("vendor", "") or "")
-                self._amp_department = normalize_case(data.get("department", "") or "")
-                self.ed_amp_name.setText(name)
-                self.sp_amp_price.setValue(price)
-                if self.sp_amp_qty.value() <= 0.0:
-                    self.sp_amp_qty.setValue(1.0)
-            except Exception:
-                pass
-
-    # 21.10 Создаём и отображаем диалог
-    dlg = ColumnMasterDialog(page)
+    # 21.10 Создаём и отображаем диалог (создаётся один раз и переиспользуется
+    # при повторных открытиях)
+    dlg = getattr(page, "_column_master_dialog", None)
+    if dlg is None:
+        dlg = ColumnMasterDialog(page)
+        page._column_master_dialog = dlg
+    else:
+        dlg.reset_values()
     if dlg.exec() != QtWidgets.QDialog.Accepted:
         return
     # 21.11 Собираем данные из диалога
@@ -5287,6 +5522,9 @@ def open_column_master(page: Any) -> None:
     # Готовим списки для добавления
     items_for_db: List[Dict[str, Any]] = []
     catalog_entries: List[Dict[str, Any]] = []
+    # Метка пакета вычисляется один раз: все позиции мастера относятся к
+    # одному добавлению
+    columns_batch = f"columns-{datetime.utcnow().isoformat()}"
     # 21.12 Обработка топов
     if dlg.chk_top.isChecked() and dlg.ed_top_name.text().strip():
         try:
@@ -5312,7 +5550,7 @@ def open_column_master(page: Any) -> None:
                     "department": dept,
                     "zone": "",
                     "power_watts": 0.0,
-                    "import_batch": f"columns-{datetime.utcnow().isoformat()}"
+                    "import_batch": columns_batch
                 })
                 catalog_entries.append({
                     "name": full_name,
@@ -5349,7 +5587,7 @@ def open_column_master(page: Any) -> None:
                     "department": dept,
                     "zone": "",
                     "power_watts": 0.0,
-                    "import_batch": f"columns-{datetime.utcnow().isoformat()}"
+                    "import_batch": columns_batch
                 })
                 catalog_entries.append({
                     "name": full_name,
@@ -5384,7 +5622,7 @@ def open_column_master(page: Any) -> None:
                     "department": dept,
                     "zone": "",
                     "power_watts": 0.0,
-                    "import_batch": f"columns-{datetime.utcnow().isoformat()}"
+                    "import_batch": columns_batch
                 })
                 catalog_entries.append({
                     "name": box_name,
@@ -5398,7 +5636,6 @@ def open_column_master(page: Any) -> None:
             page._log(f"Мастер колонок: ошибка добавления коробочек: {ex}", "error")
     # 21.14 Пассивная система: усилители и кабели
     if dlg.rb_passive.isChecked():
-        import math
         top_qty = float(dlg.sp_top_qty.value() or 0.0) if dlg.chk_top.isChecked() else 0.0
         sub_qty = float(dlg.sp_sub_qty.value() or 0.0) if dlg.chk_sub.isChecked() else 0.0
         # Усилители
@@ -5423,7 +5660,7 @@ def open_column_master(page: Any) -> None:
                     "department": dlg._amp_department or "",
                     "zone": "",
                     "power_watts": 0.0,
-                    "import_batch": f"columns-{datetime.utcnow().isoformat()}"
+                    "import_batch": columns_batch
                 })
             catalog_entries.append({
                 "name": amp_name,
@@ -5434,25 +5671,10 @@ def open_column_master(page: Any) -> None:
                 "department": dlg._amp_department or "",
             })
         # Кабели SpeakOn
-        # Используем ту же логику, что и в методе _update_passive_calc
-        def calc_connectors(count: float) -> tuple[int, int]:
-            n = int(count)
-            if n <= 0:
-                return (0, 0)
-            side1 = (n + 1) // 2
-            side2 = n - side1
-            pairs1 = side1 // 2
-            singles1 = side1 % 2
-            pairs2 = side2 // 2
-            singles2 = side2 % 2
-            short = pairs1 + pairs2
-            long = pairs1 + singles1 + pairs2 + singles2
-            if long < 2:
-                long = 2
-            return (short, long)
+        # Используем ту же функцию _calc_connectors, что и _do_passive_calc
         # Топы
         if top_qty > 0:
-            spk_top_05, spk_top_15 = calc_connectors(top_qty)
+            spk_top_05, spk_top_15 = _calc_connectors(int(top_qty))
         else:
             spk_top_05 = spk_top_15 = 0
         # Сабы
@@ -5461,7 +5683,7 @@ def open_column_master(page: Any) -> None:
                 spk_sub_05 = 0
                 spk_sub_15 = max(2, int(sub_qty))
             else:
-                spk_sub_05, spk_sub_15 = calc_connectors(sub_qty)
+                spk_sub_05, spk_sub_15 = _calc_connectors(int(sub_qty))
         else:
             spk_sub_05 = spk_sub_15 = 0
         # Функция для добавления кабелей из базы или вручную. Используем имена по умолчанию.
@@ -5478,12 +5700,11 @@ def open_column_master(page: Any) -> None:
             if qty <= 0:
                 return
             try:
-                # Ищем в каталоге позицию по имени, без учёта регистра
-                rows = page.db.catalog_list({"name": name_contains})
+                # Ищем в каталоге первую позицию по имени, без учёта регистра
+                row0 = page.db.catalog_first({"name": name_contains})
             except Exception:
-                rows = []
-            if rows:
-                row0 = rows[0]
+                row0 = None
+            if row0 is not None:
                 unit_price = float(row0["unit_price"] or 0.0)
                 vendor = normalize_case(row0["vendor"] or "")
                 dept = normalize_case(row0["department"] or "")
@@ -5509,7 +5730,7 @@ def open_column_master(page: Any) -> None:
                 "department": dept,
                 "zone": "",
                 "power_watts": 0.0,
-                "import_batch": f"columns-{datetime.utcnow().isoformat()}"
+                "import_batch": columns_batch
             })
             catalog_entries.append({
                 "name": item_name,
@@ -5535,20 +5756,17 @@ def open_column_master(page: Any) -> None:
         return
     # 21.16 Запись позиций в базу
     try:
-        page.db.add_items_bulk(items_for_db)
-        if hasattr(page.db, "catalog_add_or_ignore"):
-            page.db.catalog_add_or_ignore(catalog_entries)
+        # Позиции и пополнение каталога — одной транзакцией
+        new_ids = page.db.add_items_with_catalog(items_for_db, catalog_entries, return_ids=True)
         page._log(f"Мастер колонок: добавлено позиций {len(items_for_db)}.")
         QtWidgets.QMessageBox.information(page, "Готово", f"Добавлено позиций: {len(items_for_db)}.")
     except Exception as ex:
         page._log(f"Мастер колонок: ошибка добавления: {ex}", "error")
         QtWidgets.QMessageBox.critical(page, "Ошибка", f"Не удалось добавить колонки: {ex}")
-        return
+        return None
     # 21.17 Перезагружаем таблицы сметы
-    try:
-        page._reload_zone_tabs()
-    except Exception:
-        pass
+    _schedule_zone_reload(page)
+    return new_ids
 
 
 def edit_selected_screen(page: Any) -> None:
@@ -5593,11 +5811,8 @@ def edit_selected_screen(page: Any) -> None:
     if not name.lower().startswith("led экран"):
         QtWidgets.QMessageBox.information(page, "Редактирование", "Выбранная позиция не является экраном.")
         return
-    import re
-    import math
     # 21.4 Извлекаем размеры и разрешение из имени
-    pattern = r"LED экран ([0-9]+(?:\.[0-9]+)?)×([0-9]+(?:\.[0-9]+)?) м \((\d+) кабинетов, (\d+)×(\d+) пикселей\)"
-    m = re.match(pattern, name)
+    m = _SCREEN_NAME_RE.match(name)
     if not m:
         QtWidgets.QMessageBox.information(page, "Редактирование", "Не удалось распарсить параметры экрана.")
         return
@@ -5660,10 +5875,8 @@ def edit_selected_screen(page: Any) -> None:
     dlg.chk_cable.setChecked(has_cable)
     dlg.chk_vp.setChecked(has_vp)
     # Обновляем расчёты
-    try:
+    with suppress(Exception):
         dlg._update_labels()
-    except Exception:
-        pass
     # Показываем диалог
     if dlg.exec() != QtWidgets.QDialog.Accepted:
         return
@@ -5692,6 +5905,8 @@ def edit_selected_screen(page: Any) -> None:
     new_cable_name = f"Витая пара для LED {fmt_num(width_new, 2)}×{fmt_num(height_new, 2)} м"
     new_vp_name = f"Видеопроцессор для LED {fmt_num(width_new, 2)}×{fmt_num(height_new, 2)} м"
     import_batch = None
+    # Метка для новых записей, если у экрана её нет (одна на всё редактирование)
+    edit_batch = f"screen-edit-{datetime.utcnow().isoformat()}"
     # 21.10 Обновляем записи в таблице items
     try:
         cur = page.db._conn.cursor()
@@ -5749,7 +5964,7 @@ def edit_selected_screen(page: Any) -> None:
                         "department": dept_new,
                         "zone": zone_old or "",
                         "power_watts": 0.0,
-                        "import_batch": import_batch or f"screen-edit-{datetime.utcnow().isoformat()}"
+                        "import_batch": import_batch or edit_batch
                     }
                 ])
         else:
@@ -5790,7 +6005,7 @@ def edit_selected_screen(page: Any) -> None:
                         "department": dept_new,
                         "zone": zone_old or "",
                         "power_watts": 0.0,
-                        "import_batch": import_batch or f"screen-edit-{datetime.utcnow().isoformat()}"
+                        "import_batch": import_batch or edit_batch
                     }
                 ])
         else:
@@ -5832,19 +6047,14 @@ def edit_selected_screen(page: Any) -> None:
         except Exception:
             pass
         # Логирование
-        try:
+        with suppress(Exception):
             page._log(
                 f"Редактирование экрана: обновлено. Размеры {width_new}×{height_new} м, рез. модуля {mod_w_new}×{mod_h_new}, кабелей {cables_new}.",
             )
-        except Exception:
-            pass
     except Exception as ex:
         # Ошибка обновления
         page._log(f"Ошибка редактирования экрана: {ex}", "error")
         QtWidgets.QMessageBox.critical(page, "Ошибка", f"Не удалось обновить экран: {ex}")
         return
     # 21.11 Обновляем интерфейс
-    try:
-        page._reload_zone_tabs()
-    except Exception:
-        pass
+    _schedule_zone_reload(page)
@@ -51,7 +51,7 @@ from PySide6 import QtWidgets, QtCore, QtGui
 from openpyxl import load_workbook
 
 # 3. Импорт внутренних модулей
-from .common import to_float, normalize_case, fmt_num, CLASS_EN2RU, CLASS_RU2EN
+from .common import to_float, normalize_case, fmt_num, CLASS_EN2RU, CLASS_RU2EN, fill_combo_batch
 from .widgets import FileDropLabel
 
 logger = logging.getLogger(__name__)
@@ -235,24 +235,20 @@ class CatalogSelectDialog(QtWidgets.QDialog):
         except Exception as ex:
             self.page._log(f"Ошибка загрузки фильтров каталога: {ex}", "error")
             vendors, departments = [], []
-        # Подрядчики
-        self.cmb_vendor.blockSignals(True)
-        self.cmb_vendor.clear()
-        self.cmb_vendor.addItem("<Любой>", None)
-        for vitem in vendors:
-            if vitem:
-                self.cmb_vendor.addItem(normalize_case(vitem), vitem)
-        self.cmb_vendor.setCurrentIndex(0)
-        self.cmb_vendor.blockSignals(False)
-        # Отделы
-        self.cmb_department.blockSignals(True)
-        self.cmb_department.clear()
-        self.cmb_department.addItem("<Любой>", None)
-        for ditem in departments:
-            if ditem:
-                self.cmb_department.addItem(normalize_case(ditem), ditem)
-        self.cmb_department.setCurrentIndex(0)
-        self.cmb_department.blockSignals(False)
+        # Подрядчики и отделы: список готовится целиком и вставляется в модель
+        # комбобокса одной операцией; сигналы блокируются на время заполнения
+        with QtCore.QSignalBlocker(self.cmb_vendor):
+            fill_combo_batch(
+                self.cmb_vendor,
+                [("<Любой>", None)] + [(normalize_case(v), v) for v in vendors if v],
+            )
+            self.cmb_vendor.setCurrentIndex(0)
+        with QtCore.QSignalBlocker(self.cmb_department):
+            fill_combo_batch(
+                self.cmb_department,
+                [("<Любой>", None)] + [(normalize_case(d), d) for d in departments if d],
+            )
+            self.cmb_department.setCurrentIndex(0)
 
     def _update_table(self) -> None:
         """
@@ -7,6 +7,8 @@
     - ImageDropLabel — drag&drop изображения, хранит обложку проекта.
     - LogDock — док-панель лога с управлением высотой/сохранением.
     - FileDropLabel — упрощённый drop для файлов.
+    - LazyComboBox — выпадающий список, заполняемый при первом обращении
+      (и повторно после rearm()).
 
 Стиль:
     - Нумерованные секции и краткие комментарии.
@@ -15,6 +17,7 @@
 # 1. Импорт
 from PySide6 import QtWidgets, QtGui, QtCore
 from pathlib import Path
+from typing import Callable, Optional
 import shutil
 from .common import ASSETS_DIR, to_float
 
@@ -166,3 +169,42 @@ class FileDropLabel(QtWidgets.QLabel):
                 if callable(self.on_file): self.on_file(src)
                 e.acceptProposedAction(); return
         e.ignore()
+
+# 6. LazyComboBox
+class LazyComboBox(QtWidgets.QComboBox):
+    """
+    Выпадающий список, элементы которого запрашиваются у loader только при
+    первом открытии списка или получении фокуса (для автодополнения в
+    редактируемом режиме). Создание виджета не обращается к данным.
+    loader(combo) заполняет переданный список сам. rearm() откладывает
+    повторное заполнение (например, после изменения источника данных).
+    """
+    def __init__(self, loader: Callable[["LazyComboBox"], None], parent=None):
+        super().__init__(parent)
+        self._source_loader = loader
+        self._loader: Optional[Callable[["LazyComboBox"], None]] = loader
+    def rearm(self) -> None:
+        """Список будет заново запрошен у loader при следующем открытии/фокусе."""
+        self._loader = self._source_loader
+    def ensure_loaded(self) -> None:
+        if self._loader is None:
+            return
+        loader, self._loader = self._loader, None
+        # Заполнение не должно менять текущий выбор/введённый текст
+        text = self.currentText()
+        with QtCore.QSignalBlocker(self):
+            # При повторном заполнении прежние элементы заменяются
+            self.clear()
+            try:
+                loader(self)
+            except Exception:
+                pass
+            if self.isEditable():
+                self.setCurrentIndex(-1)
+                self.setEditText(text)
+    def showPopup(self) -> None:
+        self.ensure_loaded()
+        super().showPopup()
+    def focusInEvent(self, e: QtGui.QFocusEvent) -> None:
+        self.ensure_loaded()
+        super().focusInEvent(e)